@@ -1,13 +1,30 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 import os
 from orders_handler import process_orders_csv
 from logs_handler import process_logs_zip
 from invoice_handler import process_invoice_pdf
 from diff_handler import process_image_diff
 from rate_handler import calculate_rate_limit_answer
-from sqlite_handler import process_sqlite_quiz
-from pdf_handler import process_pdf_quiz
-from table_handler import process_table_quiz
+from sqlite_handler import sqlite_quiz_steps
+from pdf_handler import pdf_quiz_steps
+from table_handler import table_quiz_steps
+from artifact_store import ArtifactStore
+from quiz_context import QuizContext
+from cpu_pool import run_cpu, CpuTaskTimeout
+from http_client import get_session
+from llm_client import get_client
+from llm_cache import stats as llm_cache_stats
+from sqlite_cache import get_seeded_cache
+from steps import llm, run_steps
+from data_profile import (profile_dataframe, profile_sqlite_bytes, read_frames, describe_zip_member,
+                          describe_zip_members, PROFILE_TOKEN_BUDGET)
+from zip_parallel import use_parallel, map_members
+from remote_zip import open_remote_zip, HttpRangeFile
+from model_router import choose_model, escalation_model, record_outcome, report as router_report
+from program_solver import program_steps, forget_program, PROGRAM_MODE
+from sandbox import sandbox_available
+import metrics
+from jobs import submit_job, get_job, stream_events
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -16,7 +33,6 @@ API_VERSION = "v4.0-reevaluation"
 
 import requests
 from bs4 import BeautifulSoup
-from openai import OpenAI
 import pandas as pd
 from io import StringIO, BytesIO
 from urllib.parse import urljoin
@@ -32,31 +48,30 @@ YOUR_EMAIL = os.getenv('YOUR_EMAIL')
 YOUR_SECRET = os.getenv('YOUR_SECRET')
 AIPIPE_API_KEY = os.getenv('AIPIPE_API_KEY')  # AIpipe.org API key
 
-# Initialize OpenAI client with AIpipe.org endpoint
-# AIpipe proxies OpenAI requests through /openai/* path
-client = OpenAI(
-    api_key=AIPIPE_API_KEY,
-    base_url="https://aipipe.org/openai/v1"  # AIpipe.org OpenAI proxy endpoint
-)
+# Parallel downloads per quiz page
+PREFETCH_WORKERS = int(os.getenv('PREFETCH_WORKERS', '8'))
 
-# Submission endpoint - will be extracted from quiz page
-SUBMIT_ENDPOINT = None  # Don't hardcode - extract from page
+# Dominant-colour counting: 'exact' or 'approx' (downsampled)
+IMAGE_HISTOGRAM_MODE = os.getenv('IMAGE_HISTOGRAM_MODE', 'exact')
 
 
-def scrape_quiz_page(url):
+def page_soup(artifact):
+    return BeautifulSoup(artifact.text, 'html.parser')
+
+
+def scrape_quiz_page(url, ctx=None):
     """Fetch the quiz page and extract the question using requests library"""
+    ctx = ctx or QuizContext(YOUR_EMAIL, YOUR_SECRET)
+    artifacts = ctx.artifacts
     try:
         print(f"Scraping: {url}")
         
         # Use requests library directly (Playwright browsers don't install on Render)
         # This avoids 30-second timeout trying to launch Playwright for each quiz
+        # The page bytes stay in the chain's artifact store for the table handler
         print("📡 Using requests library (Playwright disabled for speed)")
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        content = response.text
-        
-        # Parse with BeautifulSoup
-        soup = BeautifulSoup(content, 'html.parser')
+        # Parse with BeautifulSoup (kept on the artifact store: the table handler reuses it)
+        soup = artifacts.parsed(url, 'soup', page_soup)
         
         # Try to find result div
         result_div = soup.find('div', id='result')
@@ -126,16 +141,15 @@ def scrape_quiz_page(url):
         
         print(f"✅ Extracted content ({len(question_text)} chars) [v4.0-fixed]")
         
-        # Look for submit URL in the page
-        global SUBMIT_ENDPOINT
+        # Look for submit URL in the page (kept on the chain's context, not a global)
         for text in soup.stripped_strings:
             if 'submit' in text.lower() and ('http://' in text or 'https://' in text):
                 # Try to extract URL
                 import re
                 urls = re.findall(r'https?://[^\s<>"]+', text)
                 if urls:
-                    SUBMIT_ENDPOINT = urls[0]
-                    print(f"📤 Submit endpoint found: {SUBMIT_ENDPOINT}")
+                    ctx.submit_endpoint = urls[0]
+                    print(f"📤 Submit endpoint found: {ctx.submit_endpoint}")
                     break
         
         # Look for downloadable files
@@ -184,27 +198,27 @@ def scrape_quiz_page(url):
         return None
 
 
-def transcribe_audio(audio_url):
+def transcribe_audio(audio_url, artifacts=None):
     """Transcribe audio file using Whisper API"""
+    artifacts = artifacts or ArtifactStore()
     # Try to transcribe with Whisper, fallback if it fails
     try:
         print(f"🎧 Transcribing audio with Whisper: {audio_url}")
-        import requests
         import tempfile
         import os
         
-        response = requests.get(audio_url, timeout=10)
-        response.raise_for_status()
+        # Reuse the bytes download_file already fetched
+        audio_bytes = artifacts.content(audio_url)
         
         # Save to temp file
         with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as tmp:
-            tmp.write(response.content)
+            tmp.write(audio_bytes)
             audio_file_path = tmp.name
             
         try:
-            # Use the global client
+            # Use the shared client
             with open(audio_file_path, 'rb') as audio_file:
-                transcript = client.audio.transcriptions.create(
+                transcript = get_client().audio.transcriptions.create(
                     model="whisper-1",
                     file=audio_file
                 )
@@ -304,32 +318,19 @@ def count_github_tree_files(tree_json, prefix, extension, email):
         return None
 
 
-def analyze_image_with_gpt(image_url, question):
+def analyze_image_with_gpt(image_url, question, artifacts=None):
     """Analyze an image using PIL to find most frequent color"""
+    artifacts = artifacts or ArtifactStore()
     try:
         print(f"🖼️  Analyzing image with PIL: {image_url}")
         
-        # Download image
-        response = requests.get(image_url, timeout=10)
-        response.raise_for_status()
-        
-        # Use PIL to analyze pixels
-        from PIL import Image
-        from collections import Counter
-        from io import BytesIO
-        
-        img = Image.open(BytesIO(response.content))
-        pixels = list(img.getdata())
+        # Image bytes come from the chain's artifact store (fetched once)
+        image_bytes = artifacts.content(image_url)
         
-        # Count colors
-        color_counts = Counter(pixels)
-        most_common = color_counts.most_common(1)[0]
+        # Pixel counting runs in the CPU pool for large images
+        hex_color, count = run_cpu(most_frequent_color, image_bytes, size=len(image_bytes))
         
-        # Convert to hex
-        r, g, b = most_common[0][:3]  # Handle RGBA
-        hex_color = f"#{r:02x}{g:02x}{b:02x}"
-        
-        print(f"✅ Most frequent color: {hex_color} ({most_common[1]} pixels)")
+        print(f"✅ Most frequent color: {hex_color} ({count} pixels)")
         
         return hex_color
         
@@ -340,123 +341,27 @@ def analyze_image_with_gpt(image_url, question):
         return None
 
 
-def download_file(url):
+def most_frequent_color(image_bytes):
+    """Return (hex colour, pixel count) of the most common colour in an encoded image"""
+    from PIL import Image
+    from io import BytesIO
+    from color_histogram import top_colors, to_hex
+    
+    img = Image.open(BytesIO(image_bytes))
+    
+    # Count colors in C (getcolors) or NumPy - no per-pixel Python tuples
+    color, count = top_colors(img, k=1, mode=IMAGE_HISTOGRAM_MODE)[0]
+    return to_hex(color), count
+
+
+def download_file(url, artifacts=None):
     """Download a file and process it based on type"""
+    artifacts = artifacts or ArtifactStore()
     print(f"Downloading file: {url}")
     
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        
-        # Check if it's an audio file
-        if url.endswith(('.mp3', '.wav', '.m4a', '.ogg', '.opus')) or 'audio' in response.headers.get('content-type', '').lower():
-            print(f"🎧 Audio file detected: {url}")
-            # Return marker for later processing with Whisper
-            return f"AUDIO:{url}"
-        
-        # Check if it's an image file
-        if url.endswith(('.png', '.jpg', '.jpeg', '.gif')) or 'image' in response.headers.get('content-type', '').lower():
-            print(f"🖼️  Image file detected: {url}")
-            # Return marker for later processing with vision
-            return f"IMAGE:{url}"
-        
-        # Check if it's a CSV file - use for normalization quiz
-        if url.endswith('.csv') or 'csv' in response.headers.get('content-type', '').lower():
-            print(f"📊 CSV file detected for normalization")
-            # Return marker with CSV text for special handling
-            return f"CSV:{response.text}"
-        
-        # Check if it's a JSON file - might need special handling
-        if url.endswith('.json') or 'json' in response.headers.get('content-type', '').lower():
-            print(f"📋 JSON file detected")
-            # Return marker with JSON text for special handling  
-            return f"JSON:{response.text}"
-        
-        # Check if it's Excel
-        elif url.endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(BytesIO(response.content))
-            print(f"✅ Excel loaded: {df.shape[0]} rows, {df.shape[1]} columns")
-            return df.to_string()
-        
-        # Check if it's a SQLite database
-        elif url.endswith('.db') or url.endswith('.sqlite'):
-            import sqlite3
-            import tempfile
-            
-            # Save to temp file
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.db') as tmp:
-                tmp.write(response.content)
-                tmp_path = tmp.name
-            
-            # Connect and extract data
-            conn = sqlite3.connect(tmp_path)
-            cursor = conn.cursor()
-            
-            # Get all tables
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-            tables = cursor.fetchall()
-            
-            result = f"SQLite Database with {len(tables)} tables:\n\n"
-            
-            # Extract data from each table
-            for table in tables:
-                table_name = table[0]
-                df = pd.read_sql_query(f"SELECT * FROM {table_name}", conn)
-                result += f"\n=== Table: {table_name} ({df.shape[0]} rows, {df.shape[1]} columns) ===\n"
-                result += df.to_string() + "\n"
-            
-            conn.close()
-            os.unlink(tmp_path)  # Clean up temp file
-            
-            print(f"✅ SQLite DB loaded: {len(tables)} tables")
-            return result
-        
-        # Check if it's a ZIP file
-        elif url.endswith('.zip'):
-            import zipfile
-            import tempfile
-            
-            result = "ZIP Archive Contents:\n\n"
-            
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as tmp:
-                tmp.write(response.content)
-                tmp_path = tmp.name
-            
-            with zipfile.ZipFile(tmp_path, 'r') as zip_ref:
-                file_list = zip_ref.namelist()
-                result += f"Files in archive: {', '.join(file_list)}\n\n"
-                
-                # Extract and process each file
-                for filename in file_list:
-                    file_data = zip_ref.read(filename)
-                    
-                    # Try to process based on file extension
-                    if filename.endswith('.csv'):
-                        df = pd.read_csv(BytesIO(file_data))
-                        result += f"\n=== {filename} ({df.shape[0]} rows, {df.shape[1]} columns) ===\n"
-                        result += df.to_string() + "\n"
-                    elif filename.endswith(('.xlsx', '.xls')):
-                        df = pd.read_excel(BytesIO(file_data))
-                        result += f"\n=== {filename} ({df.shape[0]} rows, {df.shape[1]} columns) ===\n"
-                        result += df.to_string() + "\n"
-                    elif filename.endswith('.txt') or filename.endswith('.json'):
-                        result += f"\n=== {filename} ===\n"
-                        result += file_data.decode('utf-8', errors='ignore') + "\n"
-                    else:
-                        result += f"\n=== {filename} ({len(file_data)} bytes) ===\n"
-            
-            os.unlink(tmp_path)  # Clean up temp file
-            print(f"✅ ZIP loaded: {len(file_list)} files")
-            return result
-        
-        # PDF handling (basic)
-        elif url.endswith('.pdf'):
-            print(f"✅ PDF downloaded: {len(response.content)} bytes")
-            return f"PDF file with {len(response.content)} bytes"
-        
-        else:
-            print(f"✅ Text file loaded: {len(response.text)} characters")
-            return response.text
+        # The processed form is memoised per URL, so a second call is free
+        return artifacts.parsed(url, 'download_file', lambda response: _process_download(response, artifacts))
             
     except Exception as e:
         print(f"❌ File download error: {str(e)}")
@@ -465,48 +370,171 @@ def download_file(url):
         return None
 
 
-def solve_with_gpt(question, data_context=None, quiz_url=None):
-    """Use GPT to solve the question with enhanced context"""
-    try:
-        # Build the prompt
-        prompt = f"""You are solving a data analysis quiz question. 
+def load_frames(url, artifacts):
+    """{name: DataFrame} for a downloaded table file, parsed once per chain"""
+    return artifacts.parsed(url, 'frames', read_frames)
 
-Question: {question}
-"""
-        
-        if data_context:
-            # Limit context size to avoid token limits
-            if len(data_context) > 8000:
-                prompt += f"\n\nData provided (truncated):\n{data_context[:8000]}...\n"
-            else:
-                prompt += f"\n\nData provided:\n{data_context}\n"
-        
-        # Add context hints based on question type
-        prompt += "\n"
+
+def page_frames(quiz_data, artifacts):
+    """All tables in the page's files as {name: DataFrame}"""
+    frames = {}
+    for url in quiz_data['files'].values():
+        frames.update(load_frames(url, artifacts))
+    return frames
+
+
+def _process_download(response, artifacts=None):
+    """Turn a fetched Artifact into the context string (or marker) for the solver"""
+    url = response.url
+    frames = (lambda: load_frames(url, artifacts)) if artifacts else (lambda: read_frames(response))
+    
+    # Check if it's an audio file
+    if url.endswith(('.mp3', '.wav', '.m4a', '.ogg', '.opus')) or 'audio' in response.headers.get('content-type', '').lower():
+        print(f"🎧 Audio file detected: {url}")
+        # Return marker for later processing with Whisper
+        return f"AUDIO:{url}"
+    
+    # Check if it's an image file
+    if url.endswith(('.png', '.jpg', '.jpeg', '.gif')) or 'image' in response.headers.get('content-type', '').lower():
+        print(f"🖼️  Image file detected: {url}")
+        # Return marker for later processing with vision
+        return f"IMAGE:{url}"
+    
+    # Check if it's a CSV file - use for normalization quiz
+    if url.endswith('.csv') or 'csv' in response.headers.get('content-type', '').lower():
+        print(f"📊 CSV file detected for normalization")
+        # Return marker with CSV text for special handling
+        return f"CSV:{response.text}"
+    
+    # Check if it's a JSON file - might need special handling
+    if url.endswith('.json') or 'json' in response.headers.get('content-type', '').lower():
+        print(f"📋 JSON file detected")
+        # Return marker with JSON text for special handling  
+        return f"JSON:{response.text}"
+    
+    # Check if it's Excel
+    elif url.endswith(('.xlsx', '.xls')):
+        df = next(iter(frames().values()))
+        print(f"✅ Excel loaded: {df.shape[0]} rows, {df.shape[1]} columns")
+        return profile_dataframe(df)
+    
+    # Check if it's a SQLite database
+    elif url.endswith('.db') or url.endswith('.sqlite'):
+        # Opened from the downloaded bytes and summarised in SQL (no full table loads)
+        result, table_count = profile_sqlite_bytes(response.content)
+        print(f"✅ SQLite DB loaded: {table_count} tables")
+        return result
+    
+    # Check if it's a ZIP file
+    elif url.endswith('.zip'):
+        import zipfile
         
-        # URL/Command context
-        if any(keyword in question.lower() for keyword in ["http get", "curl", "command string", "uv http"]):
-            prompt += "IMPORTANT: When constructing URLs, use ABSOLUTE URLs starting with https://tds-llm-analysis.s-anand.net (not relative paths).\n"
+        result = "ZIP Archive Contents:\n\n"
         
-        # JSON formatting context
-        if "json" in question.lower():
-            if "normalize" in question.lower() or "snake_case" in question.lower():
-                prompt += "IMPORTANT: Return ONLY valid JSON array. Convert ALL column names to snake_case (lowercase with underscores). Sort data as specified. No markdown code blocks.\n"
+        with zipfile.ZipFile(BytesIO(response.content)) as zip_ref:
+            file_list = zip_ref.namelist()
+            result += f"Files in archive: {', '.join(file_list)}\n\n"
+            
+            # Extract and process each file (tables share the context budget)
+            budget = PROFILE_TOKEN_BUDGET // max(1, len(file_list))
+            sections = None
+            if use_parallel(len(file_list)):
+                # Many members: describe them in the CPU pool, batches in archive order
+                try:
+                    sections = {}
+                    for batch, texts in map_members(describe_zip_members, response.content, file_list, budget):
+                        sections.update(zip(batch, texts))
+                except OSError as e:
+                    print(f"⚠️ Parallel ZIP scan unavailable ({e}), describing members serially")
+                    sections = None
+            if sections is not None:
+                result += "".join(sections[name] for name in file_list)
             else:
-                prompt += "IMPORTANT: Return ONLY valid JSON. No markdown code blocks, no backticks, no explanations.\n"
-        
-        # Email length context for personalized quizzes
-        if "email" in question.lower() and ("length" in question.lower() or "mod" in question.lower()):
-            email = YOUR_EMAIL
-            prompt += f"Your email address: {email}\n"
-            prompt += f"Email length: {len(email)}\n"
-            prompt += "Show calculation: count the items first, then add (email_length mod 2).\n"
-        
-        # Color/hex code context
-        if "color" in question.lower() or "hex" in question.lower() or "heatmap" in question.lower():
-            prompt += "IMPORTANT: Return color as lowercase hex code (#rrggbb format).\n"
+                tables = frames()
+                for filename in file_list:
+                    result += describe_zip_member(zip_ref, filename, budget, tables.get(filename))
         
-        prompt += """
+        print(f"✅ ZIP loaded: {len(file_list)} files")
+        return result
+    
+    # SQL dumps are loaded from the raw bytes by the sqlite route; decoding
+    # them here would keep a second full-size copy in the artifact store
+    elif url.endswith('.sql'):
+        print(f"✅ SQL dump downloaded: {len(response.content)} bytes")
+        return f"SQL dump with {len(response.content)} bytes"
+    
+    # PDF handling (basic)
+    elif url.endswith('.pdf'):
+        print(f"✅ PDF downloaded: {len(response.content)} bytes")
+        return f"PDF file with {len(response.content)} bytes"
+    
+    else:
+        print(f"✅ Text file loaded: {len(response.text)} characters")
+        return response.text
+
+
+def download_files(files, artifacts):
+    """
+    Download and classify every file of a quiz page in parallel.
+    Returns {name: download_file result} in page order, so wall time is
+    the slowest single download rather than the sum.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    
+    if not files:
+        return {}
+    
+    names = list(files.keys())
+    workers = min(PREFETCH_WORKERS, len(names))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(lambda name: download_file(files[name], artifacts), names)
+        return dict(zip(names, results))
+
+
+GPT_SYSTEM_PROMPT = "You are a precise data analyst. Always provide exact, concise answers with no explanations."
+
+
+def build_gpt_messages(question, data_context=None, ctx=None):
+    """Chat messages for gpt_steps"""
+    # Build the prompt
+    prompt = f"""You are solving a data analysis quiz question. 
+
+Question: {question}
+"""
+    
+    if data_context:
+        # Limit context size to avoid token limits
+        if len(data_context) > 8000:
+            prompt += f"\n\nData provided (truncated):\n{data_context[:8000]}...\n"
+        else:
+            prompt += f"\n\nData provided:\n{data_context}\n"
+    
+    # Add context hints based on question type
+    prompt += "\n"
+    
+    # URL/Command context
+    if any(keyword in question.lower() for keyword in ["http get", "curl", "command string", "uv http"]):
+        prompt += "IMPORTANT: When constructing URLs, use ABSOLUTE URLs starting with https://tds-llm-analysis.s-anand.net (not relative paths).\n"
+    
+    # JSON formatting context
+    if "json" in question.lower():
+        if "normalize" in question.lower() or "snake_case" in question.lower():
+            prompt += "IMPORTANT: Return ONLY valid JSON array. Convert ALL column names to snake_case (lowercase with underscores). Sort data as specified. No markdown code blocks.\n"
+        else:
+            prompt += "IMPORTANT: Return ONLY valid JSON. No markdown code blocks, no backticks, no explanations.\n"
+    
+    # Email length context for personalized quizzes
+    if "email" in question.lower() and ("length" in question.lower() or "mod" in question.lower()):
+        email = ctx.email if ctx else YOUR_EMAIL
+        prompt += f"Your email address: {email}\n"
+        prompt += f"Email length: {len(email)}\n"
+        prompt += "Show calculation: count the items first, then add (email_length mod 2).\n"
+    
+    # Color/hex code context
+    if "color" in question.lower() or "hex" in question.lower() or "heatmap" in question.lower():
+        prompt += "IMPORTANT: Return color as lowercase hex code (#rrggbb format).\n"
+    
+    prompt += """
 Important instructions:
 - Provide ONLY the final answer
 - If it's a number, give just the number (no units, no commas, no formatting)
@@ -519,39 +547,59 @@ Important instructions:
 
 Answer:"""
 
-        print("🤖 Calling GPT...")
-        
-        # Call OpenAI API
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a precise data analyst. Always provide exact, concise answers with no explanations."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
+    return [
+        {
+            "role": "system",
+            "content": GPT_SYSTEM_PROMPT
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+
+
+def allows_early_stop(messages):
+    """False when the prompt asks GPT to show its working before the answer"""
+    return "Show calculation" not in messages[-1]['content']
+
+
+def clean_gpt_answer(answer):
+    """Strip boilerplate and code fences from a raw completion, then parse it"""
+    answer = answer.strip()
+    
+    # Clean up the answer
+    answer = answer.replace('Answer:', '').strip()
+    answer = answer.replace('The answer is', '').strip()
+    answer = answer.replace('The result is', '').strip()
+    
+    # Remove markdown code blocks
+    import re
+    answer = re.sub(r'```\w*\n?', '', answer).strip()
+    answer = re.sub(r'```$', '', answer).strip()
+    
+    return parse_answer(answer)
+
+
+def gpt_steps(question, data_context=None, ctx=None, model="gpt-4o"):
+    """Use GPT to solve the question with enhanced context (step generator)"""
+    try:
+        messages = build_gpt_messages(question, data_context, ctx)
+
+        print(f"🤖 Calling GPT ({model})...")
+        
+        # Streamed call that stops once the answer is complete (identical
+        # deterministic prompts are served from the LLM cache)
+        answer = (yield llm(
+            early_stop=allows_early_stop(messages),
+            model=model,
+            messages=messages,
             temperature=0,
             max_tokens=1000
-        )
-        
-        answer = response.choices[0].message.content.strip()
+        )).strip()
         print(f"✅ GPT raw answer: {answer}")
         
-        # Clean up the answer
-        answer = answer.replace('Answer:', '').strip()
-        answer = answer.replace('The answer is', '').strip()
-        answer = answer.replace('The result is', '').strip()
-        
-        # Remove markdown code blocks
-        import re
-        answer = re.sub(r'```\w*\n?', '', answer).strip()
-        answer = re.sub(r'```$', '', answer).strip()
-        
-        return parse_answer(answer)
+        return clean_gpt_answer(answer)
             
     except Exception as e:
         print(f"❌ GPT error: {str(e)}")
@@ -606,29 +654,29 @@ def parse_answer(answer_text):
     return answer
 
 
-def submit_answer(quiz_url, answer):
+def submit_answer(quiz_url, answer, ctx=None):
     """Submit the answer back to the evaluation system"""
-    global SUBMIT_ENDPOINT
+    ctx = ctx or QuizContext(YOUR_EMAIL, YOUR_SECRET)
     
-    # Use extracted submit endpoint or default
-    submit_url = SUBMIT_ENDPOINT or "https://tds-llm-analysis.s-anand.net/submit"
+    # Use the submit endpoint extracted for this chain, or the default
+    submit_url = ctx.submit_url
     
     try:
         # CRITICAL: Use YOUR actual credentials, not template text
         payload = {
-            "email": YOUR_EMAIL,  # Your actual email
-            "secret": YOUR_SECRET,  # Your actual secret (NOT "your secret")
+            "email": ctx.email,  # Your actual email
+            "secret": ctx.secret,  # Your actual secret (NOT "your secret")
             "url": quiz_url,  # The actual quiz URL (NOT "this page's URL")
             "answer": answer  # Your computed answer
         }
         
         print(f"📤 Submitting to: {submit_url}")
-        print(f"📤 Email: {YOUR_EMAIL}")
-        print(f"📤 Secret: {'*' * len(YOUR_SECRET)}")  # Don't print actual secret
+        print(f"📤 Email: {ctx.email}")
+        print(f"📤 Secret: {'*' * len(ctx.secret or '')}")  # Don't print actual secret
         print(f"📤 URL: {quiz_url}")
         print(f"📤 Answer: {answer} (type: {type(answer).__name__})")
         
-        response = requests.post(submit_url, json=payload, timeout=30)
+        response = get_session().post(submit_url, json=payload, timeout=30)
         
         # Parse response
         try:
@@ -645,6 +693,490 @@ def submit_answer(quiz_url, answer):
         print(f"❌ Submission error: {str(e)}")
         return {"error": str(e), "correct": False}
 
+# Hard-coded asset locations used by some quiz handlers
+ORDERS_URL = 'https://tds-llm-analysis.s-anand.net/project2/orders.csv'
+LOGS_URL = 'https://tds-llm-analysis.s-anand.net/project2/logs.zip'
+INVOICE_URL = 'https://tds-llm-analysis.s-anand.net/project2/invoice.pdf'
+
+
+def classify_files(file_results):
+    """
+    Sort download_file results into the inputs the solvers use.
+    The first file of each kind wins.
+    """
+    files = {
+        'data_context': None,
+        'image_url': None,
+        'audio_url': None,
+        'csv_text': None,
+        'json_text': None,
+    }
+    
+    for file_name, file_data in file_results.items():
+        if file_data:
+            # Check file type markers
+            if isinstance(file_data, str):
+                if file_data.startswith('AUDIO:'):
+                    if not files['audio_url']:
+                        files['audio_url'] = file_data[6:]  # Remove 'AUDIO:' prefix
+                        print(f"🎧 Audio file will be transcribed with Whisper")
+                elif file_data.startswith('IMAGE:'):
+                    if not files['image_url']:
+                        files['image_url'] = file_data[6:]  # Remove 'IMAGE:' prefix
+                        print(f"🖼️  Image file will be analyzed with Vision API")
+                elif file_data.startswith('CSV:'):
+                    if files['csv_text'] is None:
+                        files['csv_text'] = file_data[4:]  # Remove 'CSV:' prefix
+                        print(f"📊 CSV file will be normalized to JSON")
+                elif file_data.startswith('JSON:'):
+                    if files['json_text'] is None:
+                        files['json_text'] = file_data[5:]  # Remove 'JSON:' prefix
+                        print(f"📋 JSON file loaded for processing")
+                elif files['data_context'] is None:
+                    files['data_context'] = file_data
+            elif files['data_context'] is None:
+                files['data_context'] = file_data
+    
+    return files
+
+
+# Question words that ask for the audio / image routes ahead of the data-file routes
+AUDIO_WORDS = ('audio', 'transcri', 'listen', 'spoken', 'speech', 'recording', 'sound')
+IMAGE_WORDS = ('image', 'picture', 'photo', 'color', 'colour', 'pixel', '.png', '.jpg', '.jpeg', '.gif')
+
+
+def detect_quiz_route(question, quiz_data, files):
+    """Pick the solver for a quiz (checked in priority order)"""
+    q = question.lower()
+    page_files = quiz_data.get('files', {})
+    
+    # Orders (Q11) detection
+    is_orders_quiz = 'orders' in q
+    if not is_orders_quiz and page_files:
+        for furl in page_files.values():
+            if 'orders.csv' in furl:
+                is_orders_quiz = True
+                break
+    
+    # Every file on the page is classified, so an incidental logo or jingle
+    # only picks the media routes here when the question is about it
+    asks_audio = any(w in q for w in AUDIO_WORDS)
+    asks_image = any(w in q for w in IMAGE_WORDS)
+    
+    # Audio transcription (Q5)
+    if files['audio_url'] and asks_audio:
+        return 'audio'
+    # Image Diff (Q17) - Check BEFORE generic image analysis
+    if 'diff' in q and 'pixels' in q:
+        return 'image_diff'
+    # Generic Image analysis (Q6)
+    if files['image_url'] and asks_image:
+        return 'image'
+    # Orders CSV processing (Q11)
+    if is_orders_quiz and 'total' in q:
+        return 'orders'
+    # CSV normalization (Q7) - ignore if orders
+    if files['csv_text'] and ('normalize' in q or 'json' in q) and 'orders' not in q:
+        return 'csv_normalize'
+    # Logs.zip processing (Q9)
+    if 'logs' in q and 'download' in q and 'bytes' in q:
+        return 'logs'
+    # Invoice.pdf processing (Q10)
+    if 'invoice' in q and ('quantity' in q or 'unitprice' in q):
+        return 'invoice'
+    # GitHub tree counting
+    if files['json_text'] and 'gh-tree' in q and 'count' in q:
+        return 'gh_tree'
+    # Rate Limit (Q18)
+    if files['json_text'] and 'rate' in q and 'limits' in q:
+        return 'rate'
+    # SQLite (Q5) - check for .sql file
+    if any(f.endswith('.sql') for f in page_files.keys()):
+        return 'sqlite'
+    # Table Analysis (Q6)
+    if 'table' in q and ('sum' in q or 'cost' in q):
+        return 'table'
+    # Generic PDF (Q19) - covers financial-report.pdf, but NOT invoice
+    if any(f.endswith('.pdf') for f in page_files.keys()) and 'invoice' not in q:
+        return 'pdf'
+    # Media the question did not name, when no data-file route applies
+    if files['audio_url']:
+        return 'audio'
+    if files['image_url']:
+        return 'image'
+    # Regular GPT solving
+    return 'gpt'
+
+
+def route_urls(route, quiz_data, current_url):
+    """URLs a route's solver will read, so they can be fetched ahead of time"""
+    page_files = quiz_data.get('files', {})
+    if route == 'orders':
+        return [ORDERS_URL]
+    if route == 'logs':
+        return []  # read with Range requests, see open_remote_zip
+    if route == 'invoice':
+        return [INVOICE_URL]
+    if route == 'sqlite':
+        return [u for n, u in page_files.items() if n.endswith('.sql')][:1]
+    if route == 'pdf':
+        return [u for n, u in page_files.items() if n.endswith('.pdf')][:1]
+    if route == 'table':
+        return [current_url]
+    return []
+
+
+def clean_chart_answer(question, answer):
+    """Q12 (Chart) Cleanup: expects single letter"""
+    if isinstance(answer, str) and 'chart' in question.lower() and 'single letter' in question.lower():
+        import re
+        match = re.search(r'\b([A-C])\b', answer)
+        if match:
+            print(f"🧹 Q12 Cleaned: {answer} -> {match.group(1)}")
+            answer = match.group(1)
+        elif 'answer=' in answer:
+            answer = answer.split('answer=')[1].split('&')[0]
+            print(f"🧹 Q12 Cleaned (URL param): {answer}")
+    return answer
+
+
+def run_handler(fn, *args, size=None):
+    """Run a CPU-bound handler through the process pool; None if it hit the pool's limits"""
+    try:
+        return run_cpu(fn, *args, size=size)
+    except (CpuTaskTimeout, MemoryError) as e:
+        print(f"❌ {fn.__name__} failed in CPU pool: {e}")
+        return None
+
+
+def pick_model(route, prompt_chars, ctx):
+    """Model for this step's LLM call (the router's pick unless a retry forces a larger one)"""
+    model, ctx.step_class = choose_model(route, prompt_chars)
+    ctx.step_model = ctx.model_override or model
+    print(f"🧠 Model: {ctx.step_model} ({ctx.step_class})")
+    return ctx.step_model
+
+
+def larger_model_for_retry(ctx, reason):
+    """Model to retry a failed LLM step with (None = don't retry); records the failure if retrying"""
+    if not ctx.step_model:
+        return None
+    larger = escalation_model(ctx.step_model, ctx.time_left())
+    if larger:
+        record_outcome(ctx.step_class, ctx.step_model, False)
+        print(f"⬆️ Escalating from {ctx.step_model} to {larger}: {reason}")
+    return larger
+
+
+def retry_steps(route, question, quiz_data, files, current_url, ctx, reason):
+    """Re-solve an LLM step on the next larger model; None if there is none or no time left"""
+    larger = larger_model_for_retry(ctx, reason)
+    if not larger:
+        return None
+    ctx.model_override = larger
+    try:
+        return (yield from solve_quiz_steps(route, question, quiz_data, files, current_url, ctx))
+    finally:
+        ctx.model_override = None
+
+
+def program_mode_steps(question, quiz_data, ctx):
+    """
+    Answer a data question with a generated pandas program over the full tables
+    (step generator). None if program mode is off, the sandbox is unavailable,
+    the page has no tables or the program failed.
+    """
+    ctx.step_program = None
+    # Without OS isolation no program would run: skip before paying for the LLM call
+    if not PROGRAM_MODE or not sandbox_available():
+        return None
+    frames = page_frames(quiz_data, ctx.artifacts)
+    if not frames:
+        return None
+    print(f"🧪 Program mode over {len(frames)} table(s): {', '.join(frames)}")
+    # A cached program makes no LLM call, so the model is only picked when one is generated
+    return (yield from program_steps(question, frames, ctx.email,
+                                     lambda: pick_model('program', len(question), ctx), ctx))
+
+
+def solve_quiz_steps(route, question, quiz_data, files, current_url, ctx):
+    """Run the solver for route and return the answer (None if it failed); a step generator"""
+    artifacts = ctx.artifacts
+    answer = None
+    ctx.step_model = ctx.step_class = ctx.step_program = None
+    data_context = files['data_context']
+    json_text = files['json_text']
+    
+    if route == 'audio':
+        answer = yield ('transcribe', files['audio_url'])
+    
+    elif route == 'image_diff':
+        # Find before/after images in files
+        before_url = None
+        after_url = None
+        for name, url in quiz_data['files'].items():
+            if 'before' in name or 'before' in url:
+                before_url = url
+            if 'after' in name or 'after' in url:
+                after_url = url
+        
+        if before_url and after_url:
+            answer = process_image_diff(before_url, after_url, artifacts)
+        else:
+            print("❌ Missing before/after images for diff quiz")
+    
+    elif route == 'image':
+        answer = analyze_image_with_gpt(files['image_url'], question, artifacts) # Q6 Handler
+
+    elif route == 'orders':
+        # Download and process orders.csv
+        print(f"📊 Downloading orders.csv from: {ORDERS_URL}")
+        orders_bytes = artifacts.content(ORDERS_URL)
+        answer = run_handler(process_orders_csv, orders_bytes, size=len(orders_bytes))
+
+    elif route == 'csv_normalize':
+        answer = run_handler(normalize_csv_to_json, files['csv_text'], size=len(files['csv_text']))
+    
+    elif route == 'logs':
+        # Construct logs.zip URL directly
+        # Range requests fetch only the members that are read (whole file if unsupported)
+        print(f"📦 Reading logs.zip from: {LOGS_URL}")
+        logs_zip = open_remote_zip(LOGS_URL, artifacts)
+        answer = process_logs_zip(logs_zip, ctx.email)
+        if isinstance(logs_zip, HttpRangeFile):
+            print(f"📡 Fetched {logs_zip.fetched} of {logs_zip.size} bytes in {logs_zip.requests} requests")
+    
+    elif route == 'invoice':
+        # Construct invoice.pdf URL directly
+        print(f"📄 Downloading invoice.pdf from: {INVOICE_URL}")
+        invoice_bytes = artifacts.content(INVOICE_URL)
+        answer = run_handler(process_invoice_pdf, invoice_bytes, size=len(invoice_bytes))
+    
+    elif route == 'gh_tree':
+        # The gh-tree.json file contains pathPrefix and extension fields!
+        # Parse those from the JSON instead of the question
+        import json
+        try:
+            params = json.loads(json_text)
+            prefix = params.get('pathPrefix', '')
+            extension = params.get('extension', '.md')
+            
+            print(f"🔍 Read from JSON - Prefix: '{prefix}', Extension: '{extension}'")
+            
+            # Now fetch the actual tree data
+            owner = params.get('owner', '')
+            repo = params.get('repo', '')
+            sha = params.get('sha', '')
+            
+            if owner and repo and sha:
+                tree_url = f"https://api.github.com/repos/{owner}/{repo}/git/trees/{sha}?recursive=1"
+                print(f"🌳 Fetching GitHub tree: {tree_url[:80]}...")
+                try:
+                    # Via the artifact store: the disk cache revalidates with the ETag,
+                    # and GitHub doesn't count 304s against the rate limit
+                    yield ('fetch', [tree_url])
+                    tree_data_str = artifacts.text(tree_url)
+                    answer = count_github_tree_files(tree_data_str, prefix, extension, ctx.email)
+                except requests.exceptions.HTTPError as e:
+                    if '403' in str(e) or 'rate limit' in str(e).lower():
+                        print(f"⚠️  GitHub API rate limit hit, using fallback answer")
+                        # For project-1/ with .md, answer is 1 (known from testing)
+                        answer = 1  # 1 file + 0 offset (email length 30 % 2 = 0)
+                    else:
+                        raise
+            else:
+                print("❌ Missing GitHub API params")
+                answer = None
+        except Exception as e:
+            print(f"❌ GitHub tree parsing error: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            answer = None
+    
+    elif route == 'rate':
+        # rate.json is the JSON file on the page
+        if json_text:
+            answer = calculate_rate_limit_answer(json_text, ctx.email)
+        else:
+            print("❌ rate.json not found for Q18")
+
+    elif route == 'sqlite':
+        print(f"🗄️ Handling SQLite Quiz")
+        sql_url = None
+        for n, u in quiz_data['files'].items():
+            if n.endswith('.sql'):
+                sql_url = u
+                break
+        if sql_url:
+            # Raw bytes: the loader decodes the dump as it reads it
+            sql_bytes = artifacts.content(sql_url)
+            answer = yield from sqlite_quiz_steps(sql_bytes, question,
+                                                  model=pick_model('sqlite', len(sql_bytes), ctx),
+                                                  deadline=ctx.deadline)
+
+    elif route == 'table':
+        print(f"📊 Handling Table Quiz")
+        # The page was already fetched and parsed by scrape_quiz_page
+        soup = artifacts.parsed(current_url, 'soup', page_soup)
+        prompt_chars = len(artifacts.text(current_url))
+        # The model is picked (and its outcome recorded) only if the local parser defers to the LLM
+        answer = yield from table_quiz_steps(soup, question, model=lambda: pick_model('table', prompt_chars, ctx))
+
+    elif route == 'pdf':
+        print(f"📄 Handling Generic PDF Quiz")
+        pdf_url = None
+        for n, u in quiz_data['files'].items():
+            if n.endswith('.pdf'):
+                pdf_url = u
+                break
+        if pdf_url:
+            pdf_bytes = artifacts.content(pdf_url)
+            answer = yield from pdf_quiz_steps(pdf_bytes, question, model=pick_model('pdf', len(pdf_bytes), ctx))
+
+    else:
+        answer = yield from program_mode_steps(question, quiz_data, ctx)
+        if answer is None:
+            context = data_context or json_text
+            model = pick_model('gpt', len(question) + len(context or ''), ctx)
+            answer = yield from gpt_steps(question, context, ctx=ctx, model=model)
+            answer = clean_chart_answer(question, answer)
+    
+    return answer
+
+
+def blocking_effects(ctx):
+    """run_steps effects for a chain solved on the calling thread"""
+    return {
+        'transcribe': lambda audio_url: transcribe_audio(audio_url, ctx.artifacts),
+        'submit': lambda quiz_url, answer: submit_answer(quiz_url, answer, ctx),
+    }
+
+
+def run_quiz_chain(start_url, start_time=None, progress=None):
+    """
+    Solve the quiz chain starting at start_url: scrape -> download -> solve -> submit,
+    following the next URL until the chain ends or the time budget runs out.
+    progress(step) is called after every submission.
+    """
+    # Submit endpoint, deadline, artifacts and step history for this chain only
+    ctx = QuizContext(YOUR_EMAIL, YOUR_SECRET, start_time=start_time)
+    return run_steps(quiz_chain_steps(ctx, start_url, progress), **blocking_effects(ctx))
+
+
+def quiz_chain_steps(ctx, start_url, progress=None, max_quizzes=20):
+    """
+    The chain loop as a step generator, shared by run_quiz_chain and the
+    asyncio engine (async_engine.run_quiz_chain_async).
+    """
+    # Everything fetched during this chain is kept here and shared by all handlers
+    artifacts = ctx.artifacts
+    
+    # Process quizzes in sequence
+    current_url = start_url
+    quiz_count = 0
+    
+    while current_url and quiz_count < max_quizzes:
+        quiz_count += 1
+        elapsed = ctx.elapsed()
+        
+        print(f"\n{'='*60}")
+        print(f"📋 QUIZ {quiz_count} | Elapsed: {elapsed:.1f}s")
+        print(f"{'='*60}")
+        print(f"🔗 URL: {current_url}")
+        
+        # Check 3-minute timeout
+        if ctx.time_left() <= 0:  # 170 seconds = 2:50, leave buffer
+            print("⚠️ Approaching 3-minute limit, stopping")
+            break
+        
+        # Step 1: Scrape
+        yield ('fetch', [current_url])
+        quiz_data = scrape_quiz_page(current_url, ctx)
+        if not quiz_data:
+            print("❌ Failed to scrape, moving on")
+            break
+        
+        question = quiz_data['question']
+        print(f"❓ Question: {question[:250]}...")  # Show more text to see full filenames
+        
+        # Step 2: Download files and detect special types
+        # All files are downloaded concurrently; the first file of each kind is used
+        yield ('fetch', list(quiz_data['files'].values()))
+        files = classify_files(download_files(quiz_data['files'], artifacts))
+        
+        # Step 3: Solve with appropriate method
+        route = detect_quiz_route(question, quiz_data, files)
+        print(f"🧭 Route: {route}")
+        yield ('fetch', route_urls(route, quiz_data, current_url))
+        answer = yield from solve_quiz_steps(route, question, quiz_data, files, current_url, ctx)
+        if answer is None:
+            # The LLM's reply didn't parse: try the larger model while there is time
+            answer = yield from retry_steps(route, question, quiz_data, files, current_url, ctx,
+                                            "no parseable answer")
+        
+        # Always submit answer (even if None) to get next URL and avoid infinite loop
+        if answer is None:
+            print("⚠️  No answer generated, submitting placeholder to continue...")
+            answer = "unable to solve"
+        
+        # Step 4: Submit
+        result = yield ('submit', current_url, answer)
+        if not result.get('correct'):
+            if ctx.step_program:
+                forget_program(ctx.step_program)
+            retry_answer = yield from retry_steps(route, question, quiz_data, files, current_url, ctx,
+                                                  "incorrect submission")
+            if retry_answer is not None:
+                answer = retry_answer
+                result = yield ('submit', current_url, answer)
+        if ctx.step_model:
+            record_outcome(ctx.step_class, ctx.step_model, result.get('correct'))
+        
+        step = ctx.record_step({
+            "quiz": quiz_count,
+            "url": current_url,
+            "answer": answer,
+            "model": ctx.step_model,
+            "correct": bool(result.get('correct')),
+            "reason": result.get('reason'),
+            "elapsed": round(ctx.elapsed(), 2)
+        })
+        if progress:
+            progress(step)
+        
+        # Check result
+        if result.get('correct'):
+            print(f"✅ CORRECT!")
+            if result.get('url'):
+                current_url = result['url']
+                print(f"➡️  Next quiz: {current_url}")
+            else:
+                print(f"🎉 Quiz chain complete!")
+                break
+        else:
+            print(f"❌ INCORRECT: {result.get('reason', 'Unknown error')}")
+            # Could retry here, but moving on for now
+            if result.get('url'):
+                current_url = result['url']
+            else:
+                break
+    
+    total_time = ctx.elapsed()
+    print(f"\n{'='*60}")
+    print(f"✅ SESSION COMPLETE")
+    print(f"Quizzes attempted: {quiz_count}")
+    print(f"Artifacts: {artifacts.stats()}")
+    print(f"LLM cache: {llm_cache_stats()}")
+    print(f"Total time: {total_time:.1f}s")
+    print(f"{'='*60}\n")
+    
+    return {
+        "status": "complete",
+        "quizzes_attempted": quiz_count,
+        "total_time": total_time
+    }
+
+
 @app.route('/')
 def home():
     """Health check endpoint"""
@@ -654,13 +1186,27 @@ def home():
         "message": "LLM Quiz Solver API",
         "endpoints": {
             "/": "Health check",
-            "/quiz": "POST - Solve quiz"
+            "/quiz": "POST - Solve quiz (add \"async\": true for a 202 + job id)",
+            "/quiz/<job_id>": "GET - Async job status and steps",
+            "/quiz/<job_id>/events": "GET - Async job progress (Server-Sent Events)",
+            "/metrics": "GET - LLM latency percentiles and cache stats"
         },
         "aipipe_configured": AIPIPE_API_KEY is not None,
         "credentials_configured": YOUR_EMAIL is not None and YOUR_SECRET is not None
     })
 
 
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """LLM latency percentiles (per model), router history and cache counters"""
+    return jsonify({
+        "latency": metrics.snapshot(),
+        "router": router_report(),
+        "llm_cache": llm_cache_stats(),
+        "sqlite_cache": get_seeded_cache().stats() if get_seeded_cache() else None
+    }), 200
+
+
 @app.route('/quiz', methods=['POST'])
 def handle_quiz():
     """Main endpoint that receives quiz tasks"""
@@ -687,288 +1233,18 @@ def handle_quiz():
             print("❌ Invalid email!")
             return jsonify({"error": "Invalid email"}), 403
         
-        # Process quizzes in sequence
-        current_url = data.get('url')
-        quiz_count = 0
-        max_quizzes = 20  # Safety limit
-        
-        while current_url and quiz_count < max_quizzes:
-            quiz_count += 1
-            elapsed = time.time() - start_time
-            
-            print(f"\n{'='*60}")
-            print(f"📋 QUIZ {quiz_count} | Elapsed: {elapsed:.1f}s")
-            print(f"{'='*60}")
-            print(f"🔗 URL: {current_url}")
-            
-            # Check 3-minute timeout
-            if elapsed > 170:  # 170 seconds = 2:50, leave buffer
-                print("⚠️ Approaching 3-minute limit, stopping")
-                break
-            
-            # Step 1: Scrape
-            quiz_data = scrape_quiz_page(current_url)
-            if not quiz_data:
-                print("❌ Failed to scrape, moving on")
-                break
-            
-            question = quiz_data['question']
-            print(f"❓ Question: {question[:250]}...")  # Show more text to see full filenames
-            
-            # Step 2: Download files and detect special types
-            data_context = None
-            image_url = None
-            audio_url = None
-            csv_text = None
-            json_text = None
-            
-            if quiz_data['files']:
-                for file_name, file_url in quiz_data['files'].items():
-                    file_data = download_file(file_url)
-                    if file_data:
-                        # Check file type markers
-                        if isinstance(file_data, str):
-                            if file_data.startswith('AUDIO:'):
-                                audio_url = file_data[6:]  # Remove 'AUDIO:' prefix
-                                print(f"🎧 Audio file will be transcribed with Whisper")
-                            elif file_data.startswith('IMAGE:'):
-                                image_url = file_data[6:]  # Remove 'IMAGE:' prefix
-                                print(f"🖼️  Image file will be analyzed with Vision API")
-                            elif file_data.startswith('CSV:'):
-                                csv_text = file_data[4:]  # Remove 'CSV:' prefix
-                                print(f"📊 CSV file will be normalized to JSON")
-                            elif file_data.startswith('JSON:'):
-                                json_text = file_data[5:]  # Remove 'JSON:' prefix
-                                print(f"📋 JSON file loaded for processing")
-                            else:
-                                data_context = file_data
-                        else:
-                            data_context = file_data
-                        break
-            
-            # Step 3: Solve with appropriate method
-            answer = None
-            
-            # Determine if this is the Orders quiz (Q11)
-            is_orders_quiz = 'orders' in question.lower()
-            if not is_orders_quiz and quiz_data.get('files'):
-                for furl in quiz_data['files'].values():
-                    if 'orders.csv' in furl:
-                        is_orders_quiz = True
-                        break
-
-            # Step 3: Solve with appropriate method
-            answer = None
-            
-            # Orders (Q11) detection
-            is_orders_quiz = 'orders' in question.lower()
-            if not is_orders_quiz and quiz_data.get('files'):
-                for furl in quiz_data['files'].values():
-                    if 'orders.csv' in furl:
-                        is_orders_quiz = True
-                        break
-
-            # Audio transcription (Q5)
-            if audio_url:
-                answer = transcribe_audio(audio_url)
-            
-            # Image Diff (Q17) - Check BEFORE generic image analysis
-            elif 'diff' in question.lower() and 'pixels' in question.lower():
-                # Find before/after images in files
-                before_url = None
-                after_url = None
-                for name, url in quiz_data['files'].items():
-                    if 'before' in name or 'before' in url:
-                        before_url = url
-                    if 'after' in name or 'after' in url:
-                        after_url = url
-                
-                if before_url and after_url:
-                    answer = process_image_diff(before_url, after_url)
-                else:
-                    print("❌ Missing before/after images for diff quiz")
-            
-            # Generic Image analysis (Q6)
-            elif image_url:
-                answer = analyze_image_with_gpt(image_url, question) # Q6 Handler
-
-            # Orders CSV processing (Q11)
-            elif is_orders_quiz and 'total' in question.lower():
-                # Download and process orders.csv
-                orders_url = 'https://tds-llm-analysis.s-anand.net/project2/orders.csv'
-                print(f"📊 Downloading orders.csv from: {orders_url}")
-                import requests
-                response = requests.get(orders_url, timeout=10)
-                response.raise_for_status()
-                answer = process_orders_csv(response.content)
-
-            # CSV normalization (Q7) - ignore if orders
-            elif csv_text and ('normalize' in question.lower() or 'json' in question.lower()) and 'orders' not in question.lower():
-                answer = normalize_csv_to_json(csv_text)
-            
-            # Logs.zip processing (Q9)
-            elif 'logs' in question.lower() and 'download' in question.lower() and 'bytes' in question.lower():
-                # Construct logs.zip URL directly
-                logs_url = 'https://tds-llm-analysis.s-anand.net/project2/logs.zip'
-                print(f"📦 Downloading logs.zip from: {logs_url}")
-                import requests
-                response = requests.get(logs_url, timeout=10)
-                response.raise_for_status()
-                answer = process_logs_zip(response.content, YOUR_EMAIL)
-            
-            # Invoice.pdf processing (Q10)
-            elif 'invoice' in question.lower() and ('quantity' in question.lower() or 'unitprice' in question.lower()):
-                # Construct invoice.pdf URL directly
-                invoice_url = 'https://tds-llm-analysis.s-anand.net/project2/invoice.pdf'
-                print(f"📄 Downloading invoice.pdf from: {invoice_url}")
-                import requests
-                response = requests.get(invoice_url, timeout=10)
-                response.raise_for_status()
-                answer = process_invoice_pdf(response.content)
-            
-            # GitHub tree counting
-            elif json_text and 'gh-tree' in question.lower() and 'count' in question.lower():
-                # The gh-tree.json file contains pathPrefix and extension fields!
-                # Parse those from the JSON instead of the question
-                import json
-                try:
-                    params = json.loads(json_text)
-                    prefix = params.get('pathPrefix', '')
-                    extension = params.get('extension', '.md')
-                    
-                    print(f"🔍 Read from JSON - Prefix: '{prefix}', Extension: '{extension}'")
-                    
-                    # Now fetch the actual tree data
-                    owner = params.get('owner', '')
-                    repo = params.get('repo', '')
-                    sha = params.get('sha', '')
-                    
-                    if owner and repo and sha:
-                        tree_url = f"https://api.github.com/repos/{owner}/{repo}/git/trees/{sha}?recursive=1"
-                        print(f"🌳 Fetching GitHub tree: {tree_url[:80]}...")
-                        import requests
-                        try:
-                            tree_response = requests.get(tree_url, timeout=10)
-                            tree_response.raise_for_status()
-                            tree_data = tree_response.json()  # Parse as JSON, not text!
-                            # Convert back to JSON string for count_github_tree_files
-                            import json
-                            tree_data_str = json.dumps(tree_data)
-                            answer = count_github_tree_files(tree_data_str, prefix, extension, YOUR_EMAIL)
-                        except requests.exceptions.HTTPError as e:
-                            if '403' in str(e) or 'rate limit' in str(e).lower():
-                                print(f"⚠️  GitHub API rate limit hit, using fallback answer")
-                                # For project-1/ with .md, answer is 1 (known from testing)
-                                answer = 1  # 1 file + 0 offset (email length 30 % 2 = 0)
-                            else:
-                                raise
-                    else:
-                        print("❌ Missing GitHub API params")
-                        answer = None
-                except Exception as e:
-                    print(f"❌ GitHub tree parsing error: {str(e)}")
-                    import traceback
-                    traceback.print_exc()
-                    answer = None
-            
-            # Rate Limit (Q18)
-            elif json_text and 'rate' in question.lower() and 'limits' in question.lower():
-                # ... existing logic ...
-                if rate_json_content:
-                    answer = calculate_rate_limit_answer(rate_json_content, YOUR_EMAIL)
-                else:
-                    print("❌ rate.json not found for Q18")
-
-            # SQLite (Q5)
-            # Check for .sql file
-            elif any(f.endswith('.sql') for f in quiz_data.get('files', {}).keys()):
-                print(f"🗄️ Handling SQLite Quiz")
-                sql_url = None
-                for n, u in quiz_data['files'].items():
-                    if n.endswith('.sql'):
-                        sql_url = u
-                        break
-                if sql_url:
-                    import requests
-                    r = requests.get(sql_url, timeout=10)
-                    r.raise_for_status()
-                    answer = process_sqlite_quiz(r.text, question)
-
-            # Table Analysis (Q6)
-            elif 'table' in question.lower() and ('sum' in question.lower() or 'cost' in question.lower()):
-                print(f"📊 Handling Table Quiz")
-                # Need HTML content of the page
-                import requests
-                r = requests.get(current_url, timeout=10) # quiz_url passed as current_url
-                answer = process_table_quiz(r.text, question)
-
-            # Generic PDF (Q19) - covers financial-report.pdf
-            # Check for .pdf but NOT invoice
-            elif any(f.endswith('.pdf') for f in quiz_data.get('files', {}).keys()) and 'invoice' not in question.lower():
-                print(f"📄 Handling Generic PDF Quiz")
-                pdf_url = None
-                for n, u in quiz_data['files'].items():
-                    if n.endswith('.pdf'):
-                        pdf_url = u
-                        break
-                if pdf_url:
-                    import requests
-                    r = requests.get(pdf_url, timeout=10)
-                    r.raise_for_status()
-                    answer = process_pdf_quiz(r.content, question)
-
-            # Regular GPT solving
-            else:
-                answer = solve_with_gpt(question, data_context or json_text, quiz_url=current_url)
-                
-                # Q12 (Chart) Cleanup: expects single letter
-                if 'chart' in question.lower() and 'single letter' in question.lower():
-                    import re
-                    match = re.search(r'\b([A-C])\b', answer)
-                    if match:
-                        print(f"🧹 Q12 Cleaned: {answer} -> {match.group(1)}")
-                        answer = match.group(1)
-                    elif 'answer=' in answer:
-                        answer = answer.split('answer=')[1].split('&')[0]
-                        print(f"🧹 Q12 Cleaned (URL param): {answer}")
-            
-            # Always submit answer (even if None) to get next URL and avoid infinite loop
-            if answer is None:
-                print("⚠️  No answer generated, submitting placeholder to continue...")
-                answer = "unable to solve"
-            
-            # Step 4: Submit
-            result = submit_answer(current_url, answer)
-            
-            # Check result
-            if result.get('correct'):
-                print(f"✅ CORRECT!")
-                if result.get('url'):
-                    current_url = result['url']
-                    print(f"➡️  Next quiz: {current_url}")
-                else:
-                    print(f"🎉 Quiz chain complete!")
-                    break
-            else:
-                print(f"❌ INCORRECT: {result.get('reason', 'Unknown error')}")
-                # Could retry here, but moving on for now
-                if result.get('url'):
-                    current_url = result['url']
-                else:
-                    break
-        
-        total_time = time.time() - start_time
-        print(f"\n{'='*60}")
-        print(f"✅ SESSION COMPLETE")
-        print(f"Quizzes attempted: {quiz_count}")
-        print(f"Total time: {total_time:.1f}s")
-        print(f"{'='*60}\n")
+        # Async mode: enqueue the chain and return a job id right away
+        if data.get('async') or request.args.get('mode') == 'async':
+            job_id = submit_job(run_quiz_chain, data.get('url'), start_time, url=data.get('url'))
+            print(f"🧵 Chain queued as job {job_id}")
+            return jsonify({
+                "status": "accepted",
+                "job_id": job_id,
+                "status_url": f"/quiz/{job_id}",
+                "events_url": f"/quiz/{job_id}/events"
+            }), 202
         
-        return jsonify({
-            "status": "complete",
-            "quizzes_attempted": quiz_count,
-            "total_time": total_time
-        }), 200
+        return jsonify(run_quiz_chain(data.get('url'), start_time)), 200
         
     except Exception as e:
         print(f"\n❌ ERROR: {str(e)}")
@@ -977,6 +1253,27 @@ def handle_quiz():
         return jsonify({"error": str(e)}), 400
 
 
+@app.route('/quiz/<job_id>', methods=['GET'])
+def quiz_status(job_id):
+    """Status and per-step progress of an async quiz chain"""
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job), 200
+
+
+@app.route('/quiz/<job_id>/events', methods=['GET'])
+def quiz_events(job_id):
+    """Server-Sent Events stream of an async quiz chain's progress"""
+    if get_job(job_id) is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return Response(
+        stream_with_context(stream_events(job_id)),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 if __name__ == '__main__':
     print("\n" + "="*60)
     print("🚀 Starting LLM Quiz API with OpenAI")
@@ -988,156 +1285,3 @@ if __name__ == '__main__':
     print("="*60 + "\n")
     
     app.run(debug=True, host='0.0.0.0', port=5000)
-
-
-def process_logs_zip(zip_content, email):
-    """Process logs.zip and sum download bytes with offset"""
-    try:
-        import zipfile
-        from io import BytesIO
-        import json
-        
-        # Extract ZIP content
-        zip_file = zipfile.ZipFile(BytesIO(zip_content))
-        
-        # Read logs.jsonl
-        logs_data = zip_file.read('logs.jsonl').decode('utf-8')
-        
-        # Sum bytes where event=="download"
-        total_bytes = 0
-        for line in logs_data.strip().split('\n'):
-            entry = json.loads(line)
-            if entry.get('event') == 'download':
-                total_bytes += entry.get('bytes', 0)
-        
-        # Add offset (email length mod 5)
-        offset = len(email) % 5
-        result = total_bytes + offset
-        
-        print(f"📊 Logs processing:")
-        print(f"  Download bytes sum: {total_bytes}")
-        print(f"  Email length: {len(email)}, Offset (mod 5): {offset}")
-        print(f"  Final answer: {result}")
-        
-        return result
-        
-    except Exception as e:
-        print(f"❌ Logs processing error: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return None
-
-
-def process_invoice_pdf(pdf_content):
-    """Process invoice.pdf and calculate sum(Quantity * UnitPrice)"""
-    try:
-        from PyPDF2 import PdfReader
-        from io import BytesIO
-        import re
-        
-        # Read PDF
-        pdf = PdfReader(BytesIO(pdf_content))
-        text = ""
-        for page in pdf.pages:
-            text += page.extract_text()
-        
-        print(f"📄 PDF text extracted:\n{text[:500]}...")
-        
-        # Parse line items - based on logs, format is vertical:
-        # Item Name
-        # Quantity
-        # UnitPrice
-        
-        lines = text.split('\n')
-        total = 0.0
-        
-        # Strategy: Look for pattern of Int followed by Float/Int
-        # Collect all numeric values in order
-        numbers = []
-        for line in lines:
-            # Check if line is a number
-            clean_line = line.strip()
-            # Regex for number (int or float)
-            if re.match(r'^\d+(\.\d+)?$', clean_line):
-                numbers.append(float(clean_line))
-        
-        print(f"  Found {len(numbers)} numbers: {numbers}")
-        
-        # Process pairs. In the sample: 3, 19.99, 2, 5.5, 1, 100.0
-        # It seems numbers appear in Qty, Price pairs
-        # But verify no other numbers interfere (like IDs)
-        # Based on logs, it was just Item, Qty, Price. Item names are strings.
-        
-        if len(numbers) >= 2:
-            # We assume even number of numeric values, representing (Qty, Price) parsing
-            # Or if odd, the first might be something else? 
-            # Let's iterate and try to find logical pairs
-            for i in range(0, len(numbers) - 1, 2):
-                qty = numbers[i]
-                price = numbers[i+1]
-                # Qty is usually an integer-like value
-                line_total = qty * price
-                total += line_total
-                print(f"  Line item: {qty} * {price} = {line_total}")
-                
-        # Round to 2 decimals
-        result = round(total, 2)
-        print(f"💰 Invoice total: {result}")
-        
-        return result
-        
-    except Exception as e:
-        print(f"❌ Invoice processing error: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return None
-def process_orders_csv(csv_content):
-    """Process orders.csv: Sum amounts by customer, return top 3 by total"""
-    try:
-        import pandas as pd
-        from io import StringIO
-        import json
-        
-        # Read CSV
-        csv_text = csv_content.decode('utf-8')
-        df = pd.read_csv(StringIO(csv_text))
-        
-        # Ensure numeric amount
-        df['amount'] = pd.to_numeric(df['amount'])
-        
-        # Group by customer_id and sum amount
-        # Question says "Compute running totals by customer_id in order of order_date"
-        # This implies we should be careful about order, but for *total* per customer,
-        # usually just summing is enough unless "running total" means something specific
-        # about the output format (e.g. time series).
-        # But "take the top 3 customers by total" implies we just want the final ranking.
-        
-        # Question asks for "customer_id" and "total" (see logs)
-        customer_totals = df.groupby('customer_id')['amount'].sum().reset_index()
-        customer_totals.rename(columns={'amount': 'total'}, inplace=True)
-        
-        # Sort by total descending
-        top_3 = customer_totals.sort_values(by='total', ascending=False).head(3)
-        
-        # Convert to simple dictionary list
-        # Format: [{"customer_id": "AID", "total": 123}, ...]
-        result_data = top_3.to_dict(orient='records')
-        
-        # Question asks for "JSON array".
-        # Let's try returning just the customer_ids first? Or the objects?
-        # Usually "top 3 customers" might just mean IDs. 
-        # But let's stick to objects as it's safer (contains more info).
-        # Actually, let's try just the dictionary with customer_id and total.
-        
-        result = json.dumps(result_data)
-        
-        print(f"📊 Orders analysis:")
-        print(f"  Top 3 customers: {result}")
-        
-        return result
-        
-    except Exception as e:
-        print(f"❌ Orders processing error: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return None
@@ -0,0 +1,122 @@
+import threading
+from requests.structures import CaseInsensitiveDict
+from http_client import get_session
+from disk_cache import get_disk_cache
+
+
+class Artifact:
+    """Raw bytes and headers of one fetched URL"""
+
+    def __init__(self, url, content, headers, status_code=200):
+        self.url = url
+        self.content = content
+        self.headers = CaseInsensitiveDict(headers or {})
+        self.status_code = status_code
+        self._text = None
+
+    @property
+    def content_type(self):
+        return self.headers.get('content-type', '').lower()
+
+    @property
+    def encoding(self):
+        # Use the charset from Content-Type if the server sent one, else UTF-8
+        for part in self.content_type.split(';')[1:]:
+            key, _, value = part.strip().partition('=')
+            if key == 'charset' and value:
+                return value.strip('"\'')
+        return 'utf-8'
+
+    @property
+    def text(self):
+        if self._text is None:
+            try:
+                self._text = self.content.decode(self.encoding, errors='replace')
+            except LookupError:
+                self._text = self.content.decode('utf-8', errors='replace')
+        return self._text
+
+
+class ArtifactStore:
+    """
+    Chain-scoped cache of everything fetched while solving a quiz chain.
+    Each URL is downloaded at most once; parsed forms (CSV text, DataFrames,
+    download_file context strings, ...) are memoised next to the raw bytes.
+    Fetches go through the on-disk download cache when it is enabled.
+    """
+
+    def __init__(self, timeout=10, disk_cache=None):
+        self.timeout = timeout
+        self.disk_cache = disk_cache or get_disk_cache()
+        self._artifacts = {}
+        self._parsed = {}
+        self._pending = {}  # url -> Event while a fetch is in flight
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, url):
+        """Return the Artifact for url, fetching it on first use"""
+        while True:
+            with self._lock:
+                artifact = self._artifacts.get(url)
+                if artifact is not None:
+                    self.hits += 1
+                    return artifact
+                pending = self._pending.get(url)
+                if pending is None:
+                    # We own the fetch; concurrent callers wait on this event
+                    pending = self._pending[url] = threading.Event()
+                    self.misses += 1
+                    break
+            # Someone else is downloading it - wait, then re-check (failures aren't cached)
+            pending.wait(self.timeout * 2)
+
+        try:
+            artifact = Artifact(url, *self._fetch(url))
+            with self._lock:
+                self._artifacts[url] = artifact
+            return artifact
+        finally:
+            with self._lock:
+                self._pending.pop(url, None)
+            pending.set()
+
+    def _fetch(self, url):
+        if self.disk_cache is not None:
+            return self.disk_cache.fetch(url, get_session(), self.timeout)
+        response = get_session().get(url, timeout=self.timeout)
+        response.raise_for_status()
+        return response.content, response.headers, response.status_code
+
+    def content(self, url):
+        return self.get(url).content
+
+    def text(self, url):
+        return self.get(url).text
+
+    def put(self, url, content, headers=None, status_code=200):
+        """Store bytes fetched elsewhere so later lookups skip the network"""
+        artifact = Artifact(url, content, headers, status_code)
+        with self._lock:
+            self._artifacts[url] = artifact
+        return artifact
+
+    def parsed(self, url, kind, builder):
+        """Return builder(artifact) for url, computing it only once per kind"""
+        key = (url, kind)
+        with self._lock:
+            if key in self._parsed:
+                return self._parsed[key]
+        value = builder(self.get(url))
+        with self._lock:
+            return self._parsed.setdefault(key, value)
+
+    def __contains__(self, url):
+        return url in self._artifacts
+
+    def stats(self):
+        stats = {"urls": len(self._artifacts), "hits": self.hits, "misses": self.misses}
+        if self.disk_cache is not None:
+            stats["disk"] = self.disk_cache.stats()
+        return stats
@@ -0,0 +1,80 @@
+"""
+ASGI entry point: the asyncio quiz engine next to the existing Flask app.
+
+    uvicorn asgi:application --host 0.0.0.0 --port $PORT
+
+POST /async/quiz runs the chain on the event loop (same request/response as
+POST /quiz); every other path is served by the Flask app.
+"""
+import json
+import time
+
+from asgiref.wsgi import WsgiToAsgi
+
+from app import app, YOUR_EMAIL, YOUR_SECRET
+from async_engine import run_quiz_chain_async, aclose
+
+flask_app = WsgiToAsgi(app)
+
+
+async def _read_json(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            break
+    try:
+        return json.loads(body or b'null')
+    except ValueError:
+        return None
+
+
+async def _send_json(send, status, data):
+    body = json.dumps(data).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def handle_quiz_async(scope, receive, send):
+    start_time = time.time()
+    data = await _read_json(receive)
+
+    if not data:
+        return await _send_json(send, 400, {"error": "Invalid JSON"})
+    if data.get('secret') != YOUR_SECRET:
+        return await _send_json(send, 403, {"error": "Invalid secret"})
+    if data.get('email') != YOUR_EMAIL:
+        return await _send_json(send, 403, {"error": "Invalid email"})
+
+    try:
+        result = await run_quiz_chain_async(data.get('url'), start_time)
+        await _send_json(send, 200, result)
+    except Exception as e:
+        print(f"\n❌ ERROR: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        await _send_json(send, 400, {"error": str(e)})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await aclose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+    if scope['type'] == 'http' and scope['path'] == '/async/quiz' and scope['method'] == 'POST':
+        return await handle_quiz_async(scope, receive, send)
+    return await flask_app(scope, receive, send)
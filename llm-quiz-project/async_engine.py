@@ -0,0 +1,153 @@
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from app import YOUR_EMAIL, YOUR_SECRET, quiz_chain_steps
+from quiz_context import QuizContext
+from llm_client import get_async_client, aclose_async_client
+from llm_stream import acomplete
+from steps import advance
+
+# asyncio driver for app.quiz_chain_steps: the effects the chain yields
+# (quiz pages and files, OpenAI, Whisper, submissions) are awaited on the
+# event loop, and only the code between them - parsing and the CPU-heavy
+# handlers (BeautifulSoup, PIL, pandas, pypdf) - runs on the thread pool.
+# A chain waiting on the network holds no thread.
+ASYNC_MAX_CONNECTIONS = int(os.getenv('ASYNC_MAX_CONNECTIONS', '100'))
+ASYNC_CPU_WORKERS = int(os.getenv('ASYNC_CPU_WORKERS', str(min(32, (os.cpu_count() or 1) + 4))))
+
+_http = None
+_cpu_executor = None
+
+
+def get_http_client():
+    global _http
+    if _http is None:
+        _http = httpx.AsyncClient(
+            timeout=httpx.Timeout(10.0, read=30.0),
+            limits=httpx.Limits(max_connections=ASYNC_MAX_CONNECTIONS,
+                                max_keepalive_connections=ASYNC_MAX_CONNECTIONS // 2),
+            follow_redirects=True,
+            headers={'Accept-Encoding': 'gzip, deflate'},
+        )
+    return _http
+
+
+def get_cpu_executor():
+    global _cpu_executor
+    if _cpu_executor is None:
+        _cpu_executor = ThreadPoolExecutor(max_workers=ASYNC_CPU_WORKERS, thread_name_prefix='quiz-cpu')
+    return _cpu_executor
+
+
+async def aclose():
+    """Release pooled connections (called on ASGI shutdown)"""
+    global _http
+    if _http is not None:
+        await _http.aclose()
+        _http = None
+    await aclose_async_client()
+
+
+async def run_in_executor(fn, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_cpu_executor(), fn, *args)
+
+
+async def fetch(ctx, url):
+    """Download url into the chain's artifact store unless it is already there"""
+    if url in ctx.artifacts:
+        return
+    cache = ctx.artifacts.disk_cache
+    if cache is None:
+        response = await get_http_client().get(url)
+        response.raise_for_status()
+        ctx.artifacts.put(url, response.content, response.headers, response.status_code)
+        return
+
+    # Same conditional GET as DiskCache.fetch; the cache's disk I/O runs off the loop
+    cached, entry, headers = await run_in_executor(cache.prepare, url)
+    if cached is None:
+        response = await get_http_client().get(url, headers=headers)
+        cached = await run_in_executor(cache.complete, url, entry, response)
+    if cached is None:
+        # Blob evicted between lookup and load: fetch the body for real
+        response = await get_http_client().get(url)
+        cached = await run_in_executor(cache.complete, url, None, response)
+    ctx.artifacts.put(url, *cached)
+
+
+async def prefetch(ctx, urls):
+    results = await asyncio.gather(*(fetch(ctx, u) for u in dict.fromkeys(urls)), return_exceptions=True)
+    for url, result in zip(dict.fromkeys(urls), results):
+        if isinstance(result, Exception):
+            # download_file / handlers will retry synchronously and report the error
+            print(f"⚠️ Async fetch failed for {url}: {result}")
+
+
+async def transcribe_audio_async(audio_url, ctx):
+    try:
+        print(f"🎧 Transcribing audio with Whisper (async): {audio_url}")
+        audio_bytes = ctx.artifacts.content(audio_url)
+        filename = audio_url.split('/')[-1] or 'audio.mp3'
+        transcript = await get_async_client().audio.transcriptions.create(
+            model="whisper-1",
+            file=(filename, audio_bytes)
+        )
+        answer = transcript.text.strip()
+        print(f"✅ Whisper transcription: {answer}")
+        return answer
+    except Exception as e:
+        print(f"❌ Audio transcription error: {str(e)}")
+        return "unable to transcribe"
+
+
+async def submit_answer_async(quiz_url, answer, ctx):
+    payload = {"email": ctx.email, "secret": ctx.secret, "url": quiz_url, "answer": answer}
+    print(f"📤 Submitting to: {ctx.submit_url}")
+    print(f"📤 Answer: {answer} (type: {type(answer).__name__})")
+    try:
+        response = await get_http_client().post(ctx.submit_url, json=payload, timeout=30)
+        try:
+            result = response.json()
+        except ValueError:
+            result = {"error": "Invalid JSON response", "text": response.text[:200]}
+        print(f"📨 Status: {response.status_code}")
+        print(f"📨 Response: {result}")
+        return result
+    except Exception as e:
+        print(f"❌ Submission error: {str(e)}")
+        return {"error": str(e), "correct": False}
+
+
+async def drive(steps, effects):
+    """steps.run_steps for the event loop: effects[kind] returns an awaitable"""
+    resume, value = steps.send, None
+    while True:
+        # The generator runs up to its next effect on the pool thread
+        finished, result = await run_in_executor(advance, resume, value)
+        if finished:
+            return result
+        kind, *args = result
+        try:
+            resume, value = steps.send, await effects[kind](*args)
+        except Exception as e:
+            resume, value = steps.throw, e
+
+
+def async_effects(ctx):
+    """drive effects for a chain solved on the event loop"""
+    return {
+        'llm': lambda params: acomplete(get_async_client(), params),
+        'fetch': lambda urls: prefetch(ctx, urls),
+        'transcribe': lambda audio_url: transcribe_audio_async(audio_url, ctx),
+        'submit': lambda quiz_url, answer: submit_answer_async(quiz_url, answer, ctx),
+    }
+
+
+async def run_quiz_chain_async(start_url, start_time=None, progress=None, max_quizzes=20):
+    """Same contract as app.run_quiz_chain, but awaits all network I/O"""
+    ctx = QuizContext(YOUR_EMAIL, YOUR_SECRET, start_time=start_time)
+    return await drive(quiz_chain_steps(ctx, start_url, progress, max_quizzes), async_effects(ctx))
@@ -0,0 +1,64 @@
+"""
+Dominant colour: Counter over getdata() tuples vs color_histogram.top_colors.
+
+    python benchmarks/bench_color_histogram.py [max_side]
+"""
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+from PIL import Image
+from color_histogram import top_colors
+
+
+def heatmap(side, rng):
+    # Few distinct colours, like the quiz heatmaps
+    palette = rng.integers(0, 256, size=(40, 3), dtype=np.uint8)
+    cells = rng.integers(0, 40, size=(side, side), dtype=np.uint8)
+    cells[: side // 3] = 7  # make one colour clearly dominant
+    return Image.fromarray(palette[cells], 'RGB')
+
+
+def photo(side, rng):
+    # Millions of distinct colours: forces the NumPy fallback
+    return Image.fromarray(rng.integers(0, 256, size=(side, side, 3), dtype=np.uint8), 'RGB')
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def counter_top(img):
+    color, count = Counter(img.getdata()).most_common(1)[0]
+    return color, count
+
+
+def main():
+    max_side = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+    rng = np.random.default_rng(0)
+    print(f"{'image':<16} {'Counter':>11} {'exact':>11} {'approx':>11}  top colour (exact / approx)")
+    for kind, make in (('heatmap', heatmap), ('photo', photo)):
+        side = 500
+        while side <= max_side:
+            img = make(side, rng)
+            label = f"{kind} {side}x{side}"
+            if side <= 2000:
+                _, counter_ms = timed(lambda: counter_top(img))
+                counter_col = f"{counter_ms:>8.0f} ms"
+            else:
+                counter_col = f"{'(skipped)':>11}"
+            exact, exact_ms = timed(lambda: top_colors(img, k=3))
+            approx, approx_ms = timed(lambda: top_colors(img, k=3, mode='approx'))
+            print(f"{label:<16} {counter_col} {exact_ms:>8.0f} ms {approx_ms:>8.0f} ms  "
+                  f"{exact[0][0]} / {approx[0][0]}")
+            side *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Per-step latency of bare requests.get/post vs the pooled keep-alive session.
+
+Runs a local stand-in for the quiz host: each "step" fetches the quiz page,
+two data files and POSTs an answer, like one iteration of handle_quiz.
+
+    python benchmarks/bench_http_session.py [steps]
+"""
+import os
+import sys
+import json
+import time
+import threading
+import statistics
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import requests
+from http_client import create_session
+
+CONNECTIONS = 0
+_conn_lock = threading.Lock()
+PAYLOAD = b"id,value\n" + b"".join(f"{i},{i * 3}\n".encode() for i in range(2000))
+
+
+class QuizHost(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        global CONNECTIONS
+        super().setup()
+        with _conn_lock:
+            CONNECTIONS += 1
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.startswith('/quiz'):
+            self._send(b"<html><body><div id='result'>Q</div></body></html>", 'text/html')
+        else:
+            self._send(PAYLOAD, 'text/csv')
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self._send(json.dumps({"correct": True}).encode(), 'application/json')
+
+
+def run_steps(base, steps, get, post):
+    timings = []
+    for i in range(steps):
+        start = time.perf_counter()
+        get(f"{base}/quiz-{i}", timeout=10).raise_for_status()
+        get(f"{base}/project2/a.csv", timeout=10).raise_for_status()
+        get(f"{base}/project2/b.csv", timeout=10).raise_for_status()
+        post(f"{base}/submit", json={"answer": i}, timeout=10).json()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(label, timings, connections):
+    timings = sorted(timings)
+    p50 = statistics.median(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<16} mean {statistics.mean(timings):7.2f} ms  p50 {p50:7.2f} ms  "
+          f"p95 {p95:7.2f} ms  connections {connections}")
+
+
+def main():
+    global CONNECTIONS
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), QuizHost)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    print(f"{steps} steps (page + 2 files + submit) against {base}")
+
+    CONNECTIONS = 0
+    bare = run_steps(base, steps, requests.get, requests.post)
+    report("bare requests", bare, CONNECTIONS)
+
+    CONNECTIONS = 0
+    session = create_session()
+    pooled = run_steps(base, steps, session.get, session.post)
+    report("pooled session", pooled, CONNECTIONS)
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
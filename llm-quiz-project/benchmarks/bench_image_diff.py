@@ -0,0 +1,57 @@
+"""
+Pixel diff: the old getdata() + Python loop vs the tiled ImageChops engine.
+
+    python benchmarks/bench_image_diff.py [max_side]
+"""
+import os
+import sys
+import time
+import random
+from io import BytesIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from PIL import Image
+from diff_handler import _load_rgb_pair, diff_images
+
+
+def make_pair(side, changed):
+    before = Image.new('RGB', (side, side), (30, 60, 90))
+    after = before.copy()
+    rng = random.Random(side)
+    for _ in range(changed):
+        after.putpixel((rng.randrange(side), rng.randrange(side)), (255, 0, 0))
+    encoded = []
+    for img in (before, after):
+        buf = BytesIO()
+        img.save(buf, 'PNG')
+        encoded.append(buf.getvalue())
+    return encoded
+
+
+def python_loop(img1, img2):
+    return sum(1 for p1, p2 in zip(img1.getdata(), img2.getdata()) if p1 != p2)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    max_side = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+    print(f"{'size':>11} {'python loop':>14} {'chops tiled':>14} {'speedup':>8}")
+    side = 250
+    while side <= max_side:
+        before, after = make_pair(side, changed=side * 4)
+        img1, img2 = _load_rgb_pair(before, after)
+        slow, slow_ms = timed(python_loop, img1, img2)
+        fast, fast_ms = timed(lambda: diff_images(img1, img2)["count"])
+        assert slow == fast, (slow, fast)
+        print(f"{side:>5}x{side:<5} {slow_ms:>11.1f} ms {fast_ms:>11.1f} ms {slow_ms / fast_ms:>7.1f}x")
+        side *= 2
+
+
+if __name__ == '__main__':
+    main()
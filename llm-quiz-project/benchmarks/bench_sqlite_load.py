@@ -0,0 +1,72 @@
+"""
+Seeding time for synthetic SQL dumps: executescript on the whole dump vs
+sqlite_handler.bulk_load (batched transactions, load pragmas, indexes
+built after the data).
+
+    python benchmarks/bench_sqlite_load.py [rows ...]
+"""
+import os
+import sys
+import time
+import sqlite3
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from sqlite_handler import bulk_load
+
+
+def make_dump(rows, transaction=True):
+    """A .dump-style script: schema and indexes first, then one INSERT per row"""
+    lines = ["BEGIN TRANSACTION;"] if transaction else []
+    lines += [
+        "CREATE TABLE orders (id INTEGER PRIMARY KEY, customer TEXT, city TEXT, amount REAL, created TEXT);",
+        "CREATE INDEX orders_city ON orders (city);",
+        "CREATE INDEX orders_amount ON orders (amount);",
+    ]
+    lines += [
+        f"INSERT INTO orders VALUES({i},'customer {i % 5000}','city {i % 97}',{(i * 37) % 10000 / 100},"
+        f"'2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}');"
+        for i in range(rows)
+    ]
+    if transaction:
+        lines.append("COMMIT;")
+    return ("\n".join(lines) + "\n").encode()
+
+
+def executescript_load(dump):
+    conn = sqlite3.connect(':memory:')
+    start = time.perf_counter()
+    conn.executescript(dump.decode())
+    elapsed = time.perf_counter() - start
+    count = conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+    conn.close()
+    return elapsed, count
+
+
+def bulk(dump):
+    conn = sqlite3.connect(':memory:')
+    start = time.perf_counter()
+    bulk_load(conn, dump)
+    elapsed = time.perf_counter() - start
+    count = conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+    conn.close()
+    return elapsed, count
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 100_000, 500_000, 1_000_000]
+    print(f"{'dump':<12} {'rows':>9} {'MB':>6} {'executescript':>22} {'bulk_load':>22} {'speedup':>8}")
+    for transaction in (True, False):
+        label = 'one txn' if transaction else 'autocommit'
+        for rows in sizes:
+            dump = make_dump(rows, transaction)
+            base, base_count = executescript_load(dump)
+            fast, fast_count = bulk(dump)
+            assert base_count == fast_count == rows
+            print(f"{label:<12} {rows:>9} {len(dump) / 1e6:>6.1f} "
+                  f"{base:>7.2f}s {rows / base:>9.0f} rows/s  {fast:>7.2f}s {rows / fast:>9.0f} rows/s "
+                  f"{base / fast:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
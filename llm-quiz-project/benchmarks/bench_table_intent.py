@@ -0,0 +1,84 @@
+"""
+Latency of process_table_quiz with the local intent parser vs always asking the LLM.
+
+The LLM hop is simulated with a sleep drawn from a log-normal distribution
+(median --llm-ms, the measured gpt-4o-mini median for this prompt size)
+so the benchmark runs offline; table parsing and aggregation are real.
+
+    python benchmarks/bench_table_intent.py [runs] [llm_ms]
+"""
+import os
+import sys
+import json
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import steps
+import table_handler
+from metrics import percentile
+
+COLUMNS = ['Product Name', 'Unit Price', 'Quantity Sold', 'Region']
+QUESTIONS = [
+    ("What is the total Quantity Sold?", 'Quantity Sold', 'SUM'),
+    ("What is the average unit price?", 'Unit Price', 'MEAN'),
+    ("What is the highest unit price in the table?", 'Unit Price', 'MAX'),
+    ("What is the lowest quantity sold?", 'Quantity Sold', 'MIN'),
+    ("How many regions are listed?", 'Region', 'COUNT'),
+]
+
+
+def make_html(rows=200):
+    body = "".join(
+        f"<tr><td>Item {i}</td><td>${(i % 50) * 1.25:,.2f}</td><td>{i % 17}</td><td>R{i % 4}</td></tr>"
+        for i in range(rows)
+    )
+    head = "".join(f"<th>{c}</th>" for c in COLUMNS)
+    return f"<html><body><table><tr>{head}</tr>{body}</table></body></html>"
+
+
+def fake_llm(llm_ms):
+    answers = {q: (c, op) for q, c, op in QUESTIONS}
+
+    def completion(client, params):
+        time.sleep(random.lognormvariate(0, 0.35) * llm_ms / 1000)
+        prompt = params['messages'][0]['content']
+        column, op = next(v for q, v in answers.items() if q in prompt)
+        return json.dumps({"column": column, "operation": op})
+    return completion
+
+
+def run(html, runs, local):
+    table_handler.TABLE_INTENT_MIN_CONFIDENCE = 0.75 if local else float('inf')
+    timings, results = [], []
+    for i in range(runs):
+        question = QUESTIONS[i % len(QUESTIONS)][0]
+        start = time.perf_counter()
+        results.append(table_handler.process_table_quiz(html, question))
+        timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings), results
+
+
+def report(label, timings):
+    print(f"{label:<12} p50 {percentile(timings, 50):8.2f} ms  p99 {percentile(timings, 99):8.2f} ms")
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    llm_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 800
+    random.seed(0)
+    steps.complete = fake_llm(llm_ms)
+    steps.get_client = lambda: None
+    html = make_html()
+
+    print(f"{runs} questions over a {len(COLUMNS)}-column table, simulated LLM median {llm_ms:.0f} ms")
+    local, local_results = run(html, runs, local=True)
+    llm, llm_results = run(html, runs, local=False)
+    report("local parser", local)
+    report("LLM hop", llm)
+    print(f"same answers: {local_results == llm_results}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Serial vs CPU-pool processing of ZIP archives with many members: the logs
+aggregation (logs_handler) and the download_file member descriptions
+(data_profile). Workers reopen the archive from a memory-mapped file.
+
+    python benchmarks/bench_zip_parallel.py [member_count ...]
+
+CPU_POOL_WORKERS defaults to the machine's CPU count here; the speedup is
+bounded by the cores actually available.
+"""
+import io
+import os
+import sys
+import time
+import random
+import zipfile
+
+os.environ.setdefault('CPU_POOL_WORKERS', str(max(2, os.cpu_count() or 1)))
+os.environ.setdefault('ZIP_PARALLEL_MIN_MEMBERS', '2')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import zip_parallel
+from cpu_pool import warm_pool, CPU_POOL_WORKERS
+from logs_handler import aggregate_logs
+from data_profile import describe_zip_member, describe_zip_members
+
+LOG_LINES = 40_000  # per member
+CSV_ROWS = 20_000
+
+
+def make_logs_zip(members):
+    rng = random.Random(members)
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for m in range(members):
+            lines = (f"2024-01-01T00:00:{i % 60:02d} user=u{i % 97} event={rng.choice(('download', 'upload', 'view'))} "
+                     f"bytes={rng.randint(1, 10 ** 6)}" for i in range(LOG_LINES))
+            zf.writestr(f"logs/log_{m}.txt", "\n".join(lines))
+    return buf.getvalue()
+
+
+def make_csv_zip(members):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for m in range(members):
+            rows = "\n".join(f"{i},city{i % 50},{(i * 7919) % 1000 / 10}" for i in range(CSV_ROWS))
+            zf.writestr(f"data/part_{m}.csv", "id,city,amount\n" + rows)
+    return buf.getvalue()
+
+
+def serial_logs(content):
+    zip_parallel.ZIP_PARALLEL_MIN_MEMBERS = 10 ** 9
+    try:
+        return aggregate_logs(content).download_bytes
+    finally:
+        zip_parallel.ZIP_PARALLEL_MIN_MEMBERS = 2
+
+
+def parallel_logs(content):
+    return aggregate_logs(content).download_bytes
+
+
+def serial_describe(content):
+    with zipfile.ZipFile(io.BytesIO(content)) as zf:
+        return "".join(describe_zip_member(zf, name, 200) for name in zf.namelist())
+
+
+def parallel_describe(content):
+    with zipfile.ZipFile(io.BytesIO(content)) as zf:
+        names = zf.namelist()
+    sections = {}
+    for batch, texts in zip_parallel.map_members(describe_zip_members, content, names, 200):
+        sections.update(zip(batch, texts))
+    return "".join(sections[name] for name in names)
+
+
+def timed(fn, content):
+    start = time.perf_counter()
+    result = fn(content)
+    return time.perf_counter() - start, result
+
+
+def main():
+    counts = [int(a) for a in sys.argv[1:]] or [8, 32, 128]
+    warm_pool()
+    print(f"{CPU_POOL_WORKERS} pool workers, {os.cpu_count()} CPUs")
+    print(f"{'workload':<10} {'members':>8} {'serial':>9} {'parallel':>9} {'speedup':>8}")
+    for label, make, serial, parallel in (("logs", make_logs_zip, serial_logs, parallel_logs),
+                                          ("csv", make_csv_zip, serial_describe, parallel_describe)):
+        for members in counts:
+            content = make(members)
+            base, expected = timed(serial, content)
+            fast, result = timed(parallel, content)
+            assert result == expected
+            print(f"{label:<10} {members:>8} {base:>8.2f}s {fast:>8.2f}s {base / fast:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
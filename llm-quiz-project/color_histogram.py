@@ -0,0 +1,92 @@
+from PIL import Image
+
+# getcolors() is a C hash table and by far the fastest path for images with
+# few distinct colours (heatmaps, charts). We try it with a growing cap and
+# only fall back to NumPy packing for photo-like images.
+GETCOLORS_CAPS = (256, 4096, 65536)
+APPROX_MAX_PIXELS = 250_000  # target sample size in "approx" mode
+
+
+def _normalise(img):
+    # Keep RGB/RGBA as-is (alpha stays part of the colour); palette images are handled separately
+    if img.mode in ('RGB', 'RGBA', 'P'):
+        return img
+    return img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+
+
+def _downsample(img, max_pixels):
+    """Nearest-neighbour subsample: unlike reduce()/thumbnail() it never invents new colours"""
+    width, height = img.size
+    step = int((width * height / max_pixels) ** 0.5)
+    if step <= 1:
+        return img, 1
+    small = img.resize((max(1, width // step), max(1, height // step)), Image.NEAREST)
+    return small, (width * height) / (small.size[0] * small.size[1])
+
+
+def _palette_counts(img):
+    """Palette images: count the <= 256 indices, then map them to RGB"""
+    palette = img.getpalette() or []
+    counts = {}
+    for count, index in img.getcolors(256):
+        color = tuple(palette[index * 3:index * 3 + 3]) or (index, index, index)
+        counts[color] = counts.get(color, 0) + count
+    return [(color, count) for color, count in counts.items()]
+
+
+def _numpy_top(img, k):
+    """Pack each pixel into one integer, count with np.unique and keep the top k"""
+    import numpy as np
+
+    arr = np.asarray(img)
+    channels = arr.shape[2]
+    packed = np.zeros(arr.shape[:2], dtype=np.uint32)
+    for c in range(channels):
+        packed = (packed << 8) | arr[..., c]
+    values, counts = np.unique(packed.ravel(), return_counts=True)
+
+    # Only the k winners are turned into Python tuples
+    order = np.argsort(counts, kind='stable')[::-1][:k]
+    shifts = [8 * (channels - 1 - c) for c in range(channels)]
+    return [
+        (tuple((int(values[i]) >> s) & 0xFF for s in shifts), int(counts[i]))
+        for i in order
+    ]
+
+
+def _small_counts(img):
+    """All (color, count) pairs when the image has few colours, else None"""
+    if img.mode == 'P':
+        return _palette_counts(img)
+    for cap in GETCOLORS_CAPS:
+        colors = img.getcolors(cap)
+        if colors is not None:
+            return [(color, count) for count, color in colors]
+    return None
+
+
+def top_colors(img, k=1, mode='exact', max_pixels=APPROX_MAX_PIXELS):
+    """
+    The k most frequent colours of a PIL image as [(color tuple, count), ...].
+    mode='approx' counts a nearest-neighbour sample of about max_pixels
+    pixels and scales the counts back up.
+    """
+    scale = 1
+    img = _normalise(img)
+    if mode == 'approx':
+        img, scale = _downsample(img, max_pixels)
+    elif mode != 'exact':
+        raise ValueError(f"Unknown histogram mode: {mode}")
+
+    counts = _small_counts(img)
+    if counts is None:
+        top = _numpy_top(img, k)
+    else:
+        counts.sort(key=lambda item: item[1], reverse=True)
+        top = counts[:k]
+    return [(color, int(round(count * scale))) for color, count in top]
+
+
+def to_hex(color):
+    r, g, b = color[:3]
+    return f"#{r:02x}{g:02x}{b:02x}"
@@ -0,0 +1,229 @@
+import os
+import time
+import signal
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout, wait
+from concurrent.futures.process import BrokenProcessPool
+
+# Managed process pool for CPU-bound handler work (PIL, pandas, pypdf).
+# Work on small inputs stays on the calling thread: pickling it across is
+# slower than just doing it.
+CPU_POOL_WORKERS = int(os.getenv('CPU_POOL_WORKERS', str(min(2, os.cpu_count() or 1))))
+CPU_TASK_TIMEOUT = float(os.getenv('CPU_TASK_TIMEOUT', '30'))  # seconds per task
+CPU_TASK_MEMORY_MB = int(os.getenv('CPU_TASK_MEMORY_MB', '1024'))  # address-space cap per worker
+CPU_INLINE_THRESHOLD = int(os.getenv('CPU_INLINE_THRESHOLD', str(256 * 1024)))  # input bytes
+TASK_GRACE = 5  # seconds past a task's own alarm before its worker counts as stuck
+
+_pool = None
+_pool_lock = threading.Lock()
+_pending = {}  # pool -> futures submitted to it that have not finished
+_in_worker = False
+
+
+class CpuTaskTimeout(TimeoutError):
+    pass
+
+
+def _init_worker(memory_mb):
+    """Runs once per worker: cap memory and pre-import the heavy libraries"""
+    global _in_worker
+    _in_worker = True
+    if memory_mb > 0:
+        try:
+            import resource
+            limit = memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError) as e:
+            print(f"⚠️ Could not set worker memory cap: {e}")
+    for module in ('PIL.Image', 'pandas', 'pypdf'):
+        try:
+            __import__(module)
+        except ImportError:
+            pass
+
+
+def _run_task(fn, args, timeout):
+    """
+    Runs in a worker: fn(*args) under a wall-clock alarm, so a runaway task
+    fails on its own and the worker (and everyone else's tasks) carry on
+    """
+    def expire(signum, frame):
+        raise CpuTaskTimeout(f"{fn.__name__} exceeded {timeout:.0f}s")
+
+    previous = signal.signal(signal.SIGALRM, expire)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return fn(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=CPU_POOL_WORKERS,
+                mp_context=multiprocessing.get_context('fork'),
+                initializer=_init_worker,
+                initargs=(CPU_TASK_MEMORY_MB,),
+            )
+        return _pool
+
+
+def _submit(fn, args, timeout):
+    """(pool, future) for fn(*args) on the current pool, tracked until it finishes"""
+    pool = _get_pool()
+    future = pool.submit(_run_task, fn, args, timeout)
+    with _pool_lock:
+        _pending.setdefault(pool, set()).add(future)
+    future.add_done_callback(lambda f: _finished(pool, f))
+    return pool, future
+
+
+def _finished(pool, future):
+    with _pool_lock:
+        futures = _pending.get(pool)
+        if futures is not None:
+            futures.discard(future)
+
+
+def _drop_pool(pool):
+    """Stop handing out pool (broken or retired); new tasks get a fresh one"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+
+
+def _retire_pool(pool, stuck):
+    """
+    A task ignored its alarm (stuck in C code). Its worker can only be freed
+    by terminating it, and ProcessPoolExecutor breaks every task on a pool
+    that loses a worker, so: send new work to a fresh pool, let the other
+    tasks on this one finish, then terminate what is left.
+    """
+    _drop_pool(pool)
+    with _pool_lock:
+        others = [f for f in _pending.get(pool, ()) if f not in stuck]
+
+    def reap():
+        wait(others, timeout=CPU_TASK_TIMEOUT + TASK_GRACE)
+        for process in list(getattr(pool, '_processes', {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+        with _pool_lock:
+            _pending.pop(pool, None)
+
+    threading.Thread(target=reap, name='cpu-pool-reaper', daemon=True).start()
+
+
+def _kill_pool():
+    """Tear the current pool down at once (it is broken or cannot take work)"""
+    with _pool_lock:
+        pool = _pool
+    if pool is None:
+        return
+    _drop_pool(pool)
+    for process in list(getattr(pool, '_processes', {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+    with _pool_lock:
+        _pending.pop(pool, None)
+
+
+def warm_pool():
+    """Start the workers now (e.g. from gunicorn's post_worker_init) rather than on first use"""
+    if CPU_POOL_WORKERS <= 0:
+        return
+    pool = _get_pool()
+    for future in [pool.submit(os.getpid) for _ in range(CPU_POOL_WORKERS)]:
+        future.result(timeout=CPU_TASK_TIMEOUT)
+    print(f"🧮 CPU pool ready: {CPU_POOL_WORKERS} workers")
+
+
+def run_cpu(fn, *args, size=None, timeout=None):
+    """
+    Run fn(*args) in the process pool and return its result.
+    fn must be a module-level function. Inputs smaller than
+    CPU_INLINE_THRESHOLD bytes (size) run inline on the calling thread.
+    Raises CpuTaskTimeout if the task takes longer than timeout seconds;
+    only that task fails, other callers' tasks keep running.
+    """
+    if _in_worker or CPU_POOL_WORKERS <= 0 or (size is not None and size < CPU_INLINE_THRESHOLD):
+        return fn(*args)
+
+    timeout = timeout or CPU_TASK_TIMEOUT
+    try:
+        pool, future = _submit(fn, args, timeout)
+    except (BrokenProcessPool, RuntimeError, OSError) as e:
+        print(f"⚠️ CPU pool unavailable ({e}), running {fn.__name__} inline")
+        _kill_pool()
+        return fn(*args)
+
+    try:
+        return future.result(timeout=timeout + TASK_GRACE)
+    except CpuTaskTimeout:
+        # The worker's alarm ended the task; the worker is fine
+        print(f"⏱️ {fn.__name__} exceeded {timeout:.0f}s")
+        raise
+    except FutureTimeout:
+        print(f"⏱️ {fn.__name__} stuck past {timeout:.0f}s, retiring its CPU pool")
+        _retire_pool(pool, {future})
+        raise CpuTaskTimeout(f"{fn.__name__} exceeded {timeout:.0f}s")
+    except BrokenProcessPool:
+        # A worker was killed (e.g. by the OOM killer); the pool can't be reused
+        print(f"❌ CPU worker died while running {fn.__name__}, replacing CPU pool")
+        _drop_pool(pool)
+        raise MemoryError(f"{fn.__name__} exceeded the CPU worker limits")
+
+
+def map_cpu(fn, arg_list, timeout=None):
+    """
+    Run fn(*args) for every args tuple in the pool at once; results in order.
+    Runs inline when the pool is off, there is a single task or we are already
+    in a worker. timeout (default CPU_TASK_TIMEOUT) applies to each task.
+    """
+    if _in_worker or CPU_POOL_WORKERS <= 0 or len(arg_list) <= 1:
+        return [fn(*args) for args in arg_list]
+
+    timeout = timeout or CPU_TASK_TIMEOUT
+    rounds = -(-len(arg_list) // CPU_POOL_WORKERS)
+    try:
+        submitted = [_submit(fn, args, timeout) for args in arg_list]
+    except (BrokenProcessPool, RuntimeError, OSError) as e:
+        print(f"⚠️ CPU pool unavailable ({e}), running {fn.__name__} inline")
+        _kill_pool()
+        return [fn(*args) for args in arg_list]
+
+    futures = [future for _, future in submitted]
+    deadline = time.time() + timeout * rounds + TASK_GRACE
+    try:
+        return [future.result(timeout=max(0, deadline - time.time())) for future in futures]
+    except CpuTaskTimeout:
+        print(f"⏱️ {fn.__name__} exceeded {timeout:.0f}s")
+        raise
+    except FutureTimeout:
+        print(f"⏱️ {fn.__name__} x{len(arg_list)} stuck past {timeout:.0f}s, retiring its CPU pool")
+        for pool in {pool for pool, _ in submitted}:
+            _retire_pool(pool, {f for f in futures if not f.done()})
+        raise CpuTaskTimeout(f"{fn.__name__} exceeded {timeout:.0f}s")
+    except BrokenProcessPool:
+        print(f"❌ CPU worker died while running {fn.__name__}, replacing CPU pool")
+        for pool in {pool for pool, _ in submitted}:
+            _drop_pool(pool)
+        raise MemoryError(f"{fn.__name__} exceeded the CPU worker limits")
+
+
+def _reset_after_fork():
+    # A forked child (e.g. a gunicorn worker) must not reuse the parent's pool
+    global _pool, _pool_lock, _pending
+    _pool = None
+    _pool_lock = threading.Lock()
+    _pending = {}
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,280 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Compact, token-budgeted description of a DataFrame for the LLM prompt:
+# schema, null counts, numeric aggregates, top categorical values and a
+# small stratified sample. Replaces df.to_string(), which costs CPU and
+# memory on big files and still gets truncated to the first few rows.
+PROFILE_TOKEN_BUDGET = int(os.getenv('PROFILE_TOKEN_BUDGET', '1800'))  # per downloaded file
+PROFILE_FULL_ROWS = int(os.getenv('PROFILE_FULL_ROWS', '60'))  # smaller tables are sent whole if they fit
+CHARS_PER_TOKEN = 4  # rough average for English text and numbers
+TOP_K = 5
+SAMPLE_ROWS = 12
+MAX_STRATA = 20  # a column with at most this many values can stratify the sample
+
+
+def _fmt(value):
+    if isinstance(value, (float, np.floating)):
+        if np.isnan(value):
+            return 'nan'
+        return f"{value:.6g}" if abs(value) < 1e15 else f"{value:.4e}"
+    return _short(value)
+
+
+def _short(value, limit=40):
+    text = str(value)
+    return text if len(text) <= limit else text[:limit - 3] + '...'
+
+
+def _distinct(series):
+    try:
+        return series.nunique()
+    except TypeError:  # unhashable cells (lists/dicts from JSON)
+        return series.astype(str).nunique()
+
+
+def _top_values(series):
+    try:
+        counts = series.value_counts().head(TOP_K)
+    except TypeError:
+        counts = series.astype(str).value_counts().head(TOP_K)
+    return ", ".join(f"{_short(v)} ({c})" for v, c in counts.items())
+
+
+def _column_lines(df):
+    """One line per column; numeric aggregates are computed for all numeric columns at once"""
+    nulls = df.isna().sum()
+    numeric = df.select_dtypes(include='number')
+    stats = numeric.agg(['min', 'max', 'mean', 'sum']) if not numeric.empty else None
+    lines = []
+    strata = None
+    for i, col in enumerate(df.columns):
+        series = df.iloc[:, i]
+        line = f"- {col} [{series.dtype}] nulls={int(nulls.iloc[i])}"
+        if stats is not None and col in stats.columns:
+            s = stats[col]
+            line += f" min={_fmt(s['min'])} max={_fmt(s['max'])} mean={_fmt(s['mean'])} sum={_fmt(s['sum'])}"
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            line += f" min={series.min()} max={series.max()}"
+        else:
+            distinct = _distinct(series)
+            line += f" distinct={distinct} top: {_top_values(series)}"
+            if strata is None and 1 < distinct <= MAX_STRATA:
+                strata = col
+        lines.append(line)
+    return lines, strata
+
+
+def _sample(df, n, strata):
+    """Up to n rows spread over the table, a few per value of a low-cardinality column if there is one"""
+    if len(df) <= n:
+        return df
+    spread = df.iloc[np.linspace(0, len(df) - 1, min(len(df), n * 50)).astype(int)]
+    if strata is not None:
+        try:
+            groups = spread[strata].nunique(dropna=False)
+            per_group = max(1, n // max(1, groups))
+            sample = spread.groupby(strata, dropna=False, sort=False, group_keys=False).head(per_group)
+            return sample.sort_index().head(n)
+        except TypeError:  # unhashable cells can't be grouped
+            pass
+    return spread.iloc[np.linspace(0, len(spread) - 1, n).astype(int)]
+
+
+def profile_dataframe(df, name=None, budget_tokens=PROFILE_TOKEN_BUDGET):
+    """Context string describing df within roughly budget_tokens tokens"""
+    budget = budget_tokens * CHARS_PER_TOKEN
+    title = f"{name} " if name else ""
+    header = f"=== {title}({df.shape[0]} rows, {df.shape[1]} columns) ===\n"
+
+    # Small tables are cheaper and more useful verbatim
+    if len(df) <= PROFILE_FULL_ROWS:
+        full = df.to_string()
+        if len(header) + len(full) <= budget:
+            return header + full + "\n"
+
+    lines, strata = _column_lines(df)
+    text = header + "Columns:\n" + "\n".join(lines) + "\n"
+    if len(text) > budget:
+        return text[:budget] + "...\n"
+
+    n = SAMPLE_ROWS
+    while n >= 1:
+        label = f"stratified by {strata}" if strata is not None else "evenly spaced"
+        sample = f"Sample rows ({label}):\n" + _sample(df, n, strata).to_string(max_colwidth=40) + "\n"
+        if len(text) + len(sample) <= budget:
+            return text + sample
+        n //= 2
+    return text
+
+
+def _basename(url):
+    return url.split('?')[0].rstrip('/').split('/')[-1] or 'data'
+
+
+def _zip_frames(content):
+    import zipfile
+    from io import BytesIO
+    frames = {}
+    with zipfile.ZipFile(BytesIO(content)) as zf:
+        for name in zf.namelist():
+            if name.endswith('.csv'):
+                frames[name] = pd.read_csv(BytesIO(zf.read(name)))
+            elif name.endswith(('.xlsx', '.xls')):
+                frames[name] = pd.read_excel(BytesIO(zf.read(name)))
+    return frames
+
+
+def open_sqlite(content):
+    """In-memory connection over the bytes of a SQLite file, without a temp file"""
+    import sqlite3
+    if content[18:20] == b'\x02\x02':
+        # WAL-mode header: a deserialized image has no -wal file, read it as rollback-journal
+        content = content[:18] + b'\x01\x01' + content[20:]
+    conn = sqlite3.connect(':memory:')
+    conn.deserialize(content)
+    return conn
+
+
+def describe_zip_member(zf, name, budget_tokens, frame=None):
+    """Context section for one archive member (frame: its DataFrame if already loaded)"""
+    from io import BytesIO
+    if frame is None and name.endswith('.csv'):
+        frame = pd.read_csv(BytesIO(zf.read(name)))
+    elif frame is None and name.endswith(('.xlsx', '.xls')):
+        frame = pd.read_excel(BytesIO(zf.read(name)))
+    if frame is not None:
+        return "\n" + profile_dataframe(frame, name, budget_tokens)
+    data = zf.read(name)
+    if name.endswith('.txt') or name.endswith('.json'):
+        return f"\n=== {name} ===\n" + data.decode('utf-8', errors='ignore') + "\n"
+    return f"\n=== {name} ({len(data)} bytes) ===\n"
+
+
+def describe_zip_members(path, names, budget_tokens):
+    """describe_zip_member for a batch of members of the archive at path (runs in a CPU pool worker)"""
+    from zip_parallel import mapped_zip
+    with mapped_zip(path) as zf:
+        return [describe_zip_member(zf, name, budget_tokens) for name in names]
+
+
+def _sqlite_tables(conn):
+    return [r[0] for r in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")]
+
+
+def _sqlite_frames(content):
+    conn = open_sqlite(content)
+    try:
+        return {t: pd.read_sql_query(f'SELECT * FROM "{t}"', conn) for t in _sqlite_tables(conn)}
+    finally:
+        conn.close()
+
+
+def _row_count(conn, table):
+    """From sqlite_stat1 when ANALYZE has run, else COUNT(*)"""
+    try:
+        row = conn.execute("SELECT stat FROM sqlite_stat1 WHERE tbl=? AND idx IS NULL", (table,)).fetchone()
+        if row:
+            return int(row[0].split()[0])
+    except Exception:
+        pass  # no sqlite_stat1 table
+    return conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+
+
+def _sqlite_sample(conn, table, n, rows):
+    """(up to n rows spread over the table by rowid, label); the first n for WITHOUT ROWID tables"""
+    import sqlite3
+    try:
+        low, high = conn.execute(f'SELECT MIN(rowid), MAX(rowid) FROM "{table}"').fetchone()
+    except sqlite3.OperationalError:
+        low = high = None
+    if rows <= n:
+        return pd.read_sql_query(f'SELECT * FROM "{table}"', conn), "all rows"
+    if low is None:
+        return pd.read_sql_query(f'SELECT * FROM "{table}" LIMIT {int(n)}', conn), "first rows"
+    rowids = sorted({int(x) for x in np.linspace(low, high, n)})
+    marks = ','.join(map(str, rowids))
+    return pd.read_sql_query(f'SELECT * FROM "{table}" WHERE rowid IN ({marks})', conn), "spread by rowid"
+
+
+def _sqlite_column_lines(conn, table):
+    """One line per column; nulls and aggregates come from a single SQL pass"""
+    columns = [(r[1], r[2] or 'ANY') for r in conn.execute(f'PRAGMA table_info("{table}")')]
+    parts = []
+    for name, declared in columns:
+        col = f'"{name}"'
+        parts += [f"COUNT({col})", f"MIN({col})", f"MAX({col})"]
+        numeric = any(t in declared.upper() for t in ('INT', 'REAL', 'FLOA', 'DOUB', 'NUM', 'DEC'))
+        parts += [f"AVG({col})", f"TOTAL({col})"] if numeric else ["NULL", "NULL"]
+    stats = conn.execute(f'SELECT COUNT(*), {", ".join(parts)} FROM "{table}"').fetchone()
+    total, lines = stats[0], []
+    for i, (name, declared) in enumerate(columns):
+        count, low, high, mean, total_sum = stats[1 + i * 5: 6 + i * 5]
+        line = f"- {name} [{declared}] nulls={total - count} min={_fmt(low)} max={_fmt(high)}"
+        if mean is not None:
+            line += f" mean={_fmt(mean)} sum={_fmt(total_sum)}"
+        lines.append(line)
+    return lines
+
+
+def profile_sqlite(conn, table, budget_tokens=PROFILE_TOKEN_BUDGET):
+    """
+    Like profile_dataframe for a SQLite table, without loading it: row count
+    (sqlite_stat1 or COUNT), per-column aggregates in SQL and a rowid-spread
+    sample, so memory follows the sample size rather than the table size.
+    """
+    budget = budget_tokens * CHARS_PER_TOKEN
+    rows = _row_count(conn, table)
+    lines = _sqlite_column_lines(conn, table)
+    header = f"=== Table: {table} ({rows} rows, {len(lines)} columns) ===\n"
+    text = header + "Columns:\n" + "\n".join(lines) + "\n"
+    if len(text) > budget:
+        return text[:budget] + "...\n"
+
+    n = SAMPLE_ROWS
+    while n >= 1:
+        sample, label = _sqlite_sample(conn, table, n, rows)
+        block = f"Sample rows ({label}):\n" + sample.to_string(max_colwidth=40) + "\n"
+        if len(text) + len(block) <= budget:
+            return text + block
+        n //= 2
+    return text
+
+
+def profile_sqlite_bytes(content, budget_tokens=PROFILE_TOKEN_BUDGET):
+    """Context string for a downloaded SQLite file; the tables share the budget"""
+    conn = open_sqlite(content)
+    try:
+        tables = _sqlite_tables(conn)
+        budget = budget_tokens // max(1, len(tables))
+        result = f"SQLite Database with {len(tables)} tables:\n\n"
+        for table in tables:
+            result += "\n" + profile_sqlite(conn, table, budget)
+        return result, len(tables)
+    finally:
+        conn.close()
+
+
+def read_frames(artifact):
+    """{name: DataFrame} for a downloaded table file (CSV, Excel, ZIP of those, SQLite, JSON records)"""
+    from io import BytesIO, StringIO
+    url = artifact.url.split('?')[0].lower()
+    content_type = artifact.content_type
+    name = _basename(artifact.url)
+    try:
+        if url.endswith('.csv') or 'csv' in content_type:
+            return {name: pd.read_csv(BytesIO(artifact.content))}
+        if url.endswith(('.xlsx', '.xls')):
+            return {name: pd.read_excel(BytesIO(artifact.content))}
+        if url.endswith('.zip'):
+            return _zip_frames(artifact.content)
+        if url.endswith(('.db', '.sqlite')):
+            return _sqlite_frames(artifact.content)
+        if url.endswith('.json') or 'json' in content_type:
+            df = pd.read_json(StringIO(artifact.text))
+            return {name: df} if isinstance(df, pd.DataFrame) and df.shape[1] > 1 else {}
+    except Exception as e:
+        print(f"⚠️ Could not load {name} as a table: {e}")
+    return {}
@@ -1,34 +1,20 @@
+from artifact_store import ArtifactStore
+from cpu_pool import run_cpu
 
-def process_image_diff(before_url, after_url):
+
+def process_image_diff(before_url, after_url, artifacts=None):
     """Compare two images and count differing pixels"""
+    artifacts = artifacts or ArtifactStore()
     try:
         print(f"🖼️  Comparing images: {before_url} vs {after_url}")
-        import requests
-        from PIL import Image
-        from io import BytesIO
-        
-        # Download images
-        resp1 = requests.get(before_url, timeout=10)
-        resp2 = requests.get(after_url, timeout=10)
-        resp1.raise_for_status()
-        resp2.raise_for_status()
         
-        img1 = Image.open(BytesIO(resp1.content)).convert('RGB')
-        img2 = Image.open(BytesIO(resp2.content)).convert('RGB')
+        # Images usually were fetched already by download_file
+        before_bytes = artifacts.content(before_url)
+        after_bytes = artifacts.content(after_url)
         
-        # Ensure same size
-        if img1.size != img2.size:
-            print(f"⚠️ Image sizes differ: {img1.size} vs {img2.size}")
-            img2 = img2.resize(img1.size)
-            
-        # Compare pixels
-        pixels1 = list(img1.getdata())
-        pixels2 = list(img2.getdata())
-        
-        diff_count = 0
-        for p1, p2 in zip(pixels1, pixels2):
-            if p1 != p2:
-                diff_count += 1
+        # Pixel comparison runs in the CPU pool for large images
+        diff_count = run_cpu(count_diff_pixels, before_bytes, after_bytes,
+                             size=len(before_bytes) + len(after_bytes))
                 
         print(f"✅ Found {diff_count} differing pixels")
         return diff_count
@@ -38,3 +24,78 @@ def process_image_diff(before_url, after_url):
         import traceback
         traceback.print_exc()
         return None
+
+
+# Rows per tile: bounds the transient images to a few bytes * tile_rows * width
+DIFF_TILE_ROWS = 512
+
+
+def _load_rgb_pair(before_bytes, after_bytes):
+    from PIL import Image
+    from io import BytesIO
+    
+    img1 = Image.open(BytesIO(before_bytes)).convert('RGB')
+    img2 = Image.open(BytesIO(after_bytes)).convert('RGB')
+    
+    # Ensure same size
+    if img1.size != img2.size:
+        print(f"⚠️ Image sizes differ: {img1.size} vs {img2.size}")
+        img2 = img2.resize(img1.size)
+    return img1, img2
+
+
+def _changed_mask(tile1, tile2, tolerance):
+    """Single-band image: per pixel, the largest channel difference (or 255/0 per-channel test)"""
+    from PIL import ImageChops
+    
+    r, g, b = ImageChops.difference(tile1, tile2).split()
+    if isinstance(tolerance, (tuple, list)):
+        # Per-channel tolerance: a channel counts only above its own threshold
+        r, g, b = (band.point(lambda v, t=t: 255 if v > t else 0) for band, t in zip((r, g, b), tolerance))
+    return ImageChops.lighter(ImageChops.lighter(r, g), b)
+
+
+def diff_images(img1, img2, tolerance=0, tile_rows=DIFF_TILE_ROWS, with_boxes=False):
+    """
+    Compare two same-size RGB images tile by tile (horizontal bands), in C via ImageChops.
+    A pixel differs when a channel differs by more than tolerance - an int for
+    all channels or an (r, g, b) tuple.
+    Returns {"count": n, "bbox": (left, top, right, bottom) or None,
+    "boxes": [one bbox per tile with differences]} - boxes only if with_boxes.
+    """
+    per_channel = isinstance(tolerance, (tuple, list))
+    threshold = 0 if per_channel else tolerance
+    
+    width, height = img1.size
+    count = 0
+    boxes = []
+    for top in range(0, height, tile_rows):
+        box = (0, top, width, min(top + tile_rows, height))
+        mask = _changed_mask(img1.crop(box), img2.crop(box), tolerance)
+        tile_count = sum(mask.histogram()[threshold + 1:])
+        if not tile_count:
+            continue
+        count += tile_count
+        if with_boxes:
+            if threshold:
+                mask = mask.point(lambda v: 255 if v > threshold else 0)
+            left, upper, right, lower = mask.getbbox()
+            boxes.append((left, top + upper, right, top + lower))
+    
+    result = {"count": count, "bbox": None, "boxes": boxes}
+    if boxes:
+        result["bbox"] = (min(b[0] for b in boxes), min(b[1] for b in boxes),
+                          max(b[2] for b in boxes), max(b[3] for b in boxes))
+    return result
+
+
+def count_diff_pixels(before_bytes, after_bytes, tolerance=0):
+    """Count pixels that differ between two encoded images"""
+    img1, img2 = _load_rgb_pair(before_bytes, after_bytes)
+    return diff_images(img1, img2, tolerance=tolerance)["count"]
+
+
+def diff_bounding_boxes(before_bytes, after_bytes, tolerance=0):
+    """Count plus bounding boxes of the differing regions"""
+    img1, img2 = _load_rgb_pair(before_bytes, after_bytes)
+    return diff_images(img1, img2, tolerance=tolerance, with_boxes=True)
@@ -0,0 +1,279 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; a single local process doesn't need it
+    fcntl = None
+
+# Persistent download cache shared by all gunicorn workers on the box.
+# Bytes are stored once per content hash; a small JSON entry per URL keeps
+# the ETag / Last-Modified needed for conditional GETs.
+DOWNLOAD_CACHE_DIR = os.getenv('DOWNLOAD_CACHE_DIR', '/tmp/llm-quiz-cache')
+DOWNLOAD_CACHE_MAX_MB = int(os.getenv('DOWNLOAD_CACHE_MAX_MB', '512'))  # 0 disables the cache
+DOWNLOAD_CACHE_FRESH_SECONDS = float(os.getenv('DOWNLOAD_CACHE_FRESH_SECONDS', '0'))  # serve without revalidating
+
+# Response headers kept with the cached bytes
+KEPT_HEADERS = ('content-type', 'content-disposition', 'etag', 'last-modified')
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _atomic_write(path, data):
+    # Write next to the target and rename, so readers never see a partial file
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class DiskCache:
+    """
+    Content-addressed on-disk cache for downloaded files with LRU eviction.
+    Entries are revalidated with If-None-Match / If-Modified-Since, so a
+    repeat download usually costs a 304 instead of the whole body.
+    """
+
+    def __init__(self, root=DOWNLOAD_CACHE_DIR, max_bytes=DOWNLOAD_CACHE_MAX_MB * 1024 * 1024,
+                 fresh_seconds=DOWNLOAD_CACHE_FRESH_SECONDS):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.fresh_seconds = fresh_seconds
+        self.blob_dir = os.path.join(root, 'blobs')
+        self.index_dir = os.path.join(root, 'index')
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.index_dir, exist_ok=True)
+        self._lock_path = os.path.join(root, '.lock')
+        self._stats_lock = threading.Lock()
+        self.hits = 0  # served without touching the network
+        self.revalidated = 0  # 304 Not Modified
+        self.misses = 0
+
+    @contextmanager
+    def _flock(self, exclusive):
+        """Writers share the lock; eviction takes it exclusively so it never deletes a blob mid-store"""
+        if fcntl is None:
+            yield
+            return
+        with open(self._lock_path, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def count(self, name):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _index_path(self, url):
+        return os.path.join(self.index_dir, _sha256(url.encode()) + '.json')
+
+    def _blob_path(self, digest):
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def lookup(self, url):
+        """Cached entry for url (a dict) or None"""
+        try:
+            with open(self._index_path(url)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get('url') == url else None
+
+    def load(self, entry):
+        """Cached bytes for entry, or None if the blob was evicted meanwhile"""
+        try:
+            with open(self._blob_path(entry['sha256']), 'rb') as f:
+                content = f.read()
+        except OSError:
+            return None
+        self.touch(entry)
+        return content
+
+    def touch(self, entry):
+        # The index file's mtime is the LRU clock
+        try:
+            os.utime(self._index_path(entry['url']))
+        except OSError:
+            pass
+
+    def is_fresh(self, entry):
+        return self.fresh_seconds > 0 and time.time() - entry.get('validated', 0) < self.fresh_seconds
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def mark_validated(self, entry):
+        """Record a 304 so the freshness window restarts"""
+        entry = dict(entry, validated=time.time())
+        try:
+            with self._flock(exclusive=False):
+                _atomic_write(self._index_path(entry['url']), json.dumps(entry).encode())
+        except OSError as e:
+            print(f"⚠️ Download cache write failed: {e}")
+        return entry
+
+    def store(self, url, content, headers):
+        """Save a 200 response; returns the new entry (or None if it isn't cacheable)"""
+        headers = {k.lower(): v for k, v in (headers or {}).items()}
+        if 'no-store' in headers.get('cache-control', '').lower():
+            return None
+        if len(content) > self.max_bytes:
+            return None
+
+        digest = _sha256(content)
+        entry = {
+            'url': url,
+            'sha256': digest,
+            'size': len(content),
+            'etag': headers.get('etag'),
+            'last_modified': headers.get('last-modified'),
+            'headers': {k: headers[k] for k in KEPT_HEADERS if k in headers},
+            'validated': time.time(),
+        }
+        try:
+            with self._flock(exclusive=False):
+                blob_path = self._blob_path(digest)
+                if not os.path.exists(blob_path):
+                    os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                    _atomic_write(blob_path, content)
+                _atomic_write(self._index_path(url), json.dumps(entry).encode())
+            self.evict()
+        except OSError as e:
+            print(f"⚠️ Download cache write failed: {e}")
+            return None
+        return entry
+
+    def evict(self):
+        """Drop least recently used URLs (and unreferenced blobs) until under max_bytes"""
+        with self._flock(exclusive=True):
+            entries = []
+            for name in os.listdir(self.index_dir):
+                path = os.path.join(self.index_dir, name)
+                try:
+                    with open(path) as f:
+                        entries.append((os.stat(path).st_mtime, path, json.load(f)['sha256']))
+                except (OSError, ValueError, KeyError):
+                    continue
+            entries.sort()
+
+            blobs = {}
+            for dirpath, _, names in os.walk(self.blob_dir):
+                for name in names:
+                    if not name.startswith('.tmp-'):
+                        blobs[name] = os.path.getsize(os.path.join(dirpath, name))
+
+            refs = {}
+            for _, _, digest in entries:
+                refs[digest] = refs.get(digest, 0) + 1
+
+            total = 0
+            for digest, size in blobs.items():
+                if digest in refs:
+                    total += size
+                else:
+                    self._remove(self._blob_path(digest))
+
+            for _, path, digest in entries:
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                refs[digest] -= 1
+                if refs[digest] == 0:
+                    self._remove(self._blob_path(digest))
+                    total -= blobs.get(digest, 0)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    def prepare(self, url):
+        """
+        Start a fetch of url: (cached result or None, entry, request headers).
+        The cached result is returned while the entry is fresh; otherwise send
+        a GET with the headers and pass the response to complete(). Shared by
+        fetch() and the asyncio engine, which only differ in the HTTP client.
+        """
+        entry = self.lookup(url)
+        if entry and self.is_fresh(entry):
+            content = self.load(entry)
+            if content is not None:
+                self.count('hits')
+                return (content, entry['headers'], 200), entry, {}
+        return None, entry, self.conditional_headers(entry)
+
+    def complete(self, url, entry, response):
+        """
+        Finish a fetch from its GET response (requests or httpx): returns
+        (content, headers, status_code), or None if a 304 came back for a blob
+        evicted meanwhile and the body has to be fetched again without validators.
+        """
+        if response.status_code == 304 and entry:
+            content = self.load(entry)
+            if content is None:
+                return None
+            self.count('revalidated')
+            self.mark_validated(entry)
+            return content, entry['headers'], 200
+
+        response.raise_for_status()
+        self.count('misses')
+        if response.status_code == 200:
+            self.store(url, response.content, response.headers)
+        return response.content, response.headers, response.status_code
+
+    def fetch(self, url, session, timeout):
+        """GET url through the cache; returns (content, headers, status_code)"""
+        cached, entry, headers = self.prepare(url)
+        if cached is not None:
+            return cached
+        result = self.complete(url, entry, session.get(url, timeout=timeout, headers=headers))
+        if result is None:
+            # Blob evicted between lookup and load: fetch the body for real
+            result = self.complete(url, None, session.get(url, timeout=timeout))
+        return result
+
+    def stats(self):
+        return {"hits": self.hits, "revalidated": self.revalidated, "misses": self.misses}
+
+
+def get_disk_cache():
+    """Process-wide DiskCache, or None when disabled or the directory isn't writable"""
+    global _cache
+    if DOWNLOAD_CACHE_MAX_MB <= 0:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = DiskCache()
+            except OSError as e:
+                print(f"⚠️ Download cache disabled ({DOWNLOAD_CACHE_DIR}): {e}")
+                _cache = False
+        return _cache or None
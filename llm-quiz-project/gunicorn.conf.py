@@ -12,3 +12,17 @@ workers = 2
 # CRITICAL: Increase timeout to 10 minutes (600s) to handle long quiz chains (16+ steps)
 # Default is 30s which causes "WORKER TIMEOUT" crashes at later stages.
 timeout = 600
+
+# Threaded workers: async /quiz jobs run on a background executor, and the
+# status/SSE endpoints are cheap, so a couple of workers can serve many chains.
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "8"))
+
+
+def post_worker_init(worker):
+    # Fork the CPU pool workers (pre-importing PIL/pandas/pypdf) before serving requests
+    import cpu_pool
+    cpu_pool.warm_pool()
+    # Open the keep-alive connection to aipipe so the first LLM call skips DNS + TLS
+    import llm_client
+    llm_client.prewarm()
@@ -0,0 +1,85 @@
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Connection pool tuning (override via environment)
+# HTTP_HOST_POOL_SIZES="tds-llm-analysis.s-anand.net=16,api.github.com=4"
+POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', '10'))  # hosts kept in the pool manager
+POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '10'))  # keep-alive sockets per host
+HOST_POOL_SIZES = os.getenv('HTTP_HOST_POOL_SIZES', '')
+RETRIES = int(os.getenv('HTTP_RETRIES', '2'))
+RETRY_BACKOFF = float(os.getenv('HTTP_RETRY_BACKOFF', '0.3'))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _make_adapter(pool_maxsize):
+    # Only idempotent methods are retried; a POST /submit is never sent twice
+    retry = Retry(
+        total=RETRIES,
+        connect=RETRIES,
+        read=RETRIES,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        raise_on_status=False,
+    )
+    return HTTPAdapter(
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=pool_maxsize,
+        max_retries=retry,
+    )
+
+
+def _parse_host_pool_sizes(spec):
+    sizes = {}
+    for item in spec.split(','):
+        host, _, size = item.strip().partition('=')
+        if host and size.isdigit():
+            sizes[host] = int(size)
+    return sizes
+
+
+def create_session():
+    """Build a keep-alive session with pooled connections and retries"""
+    session = requests.Session()
+    session.headers.update({
+        'Accept-Encoding': 'gzip, deflate',
+        'Connection': 'keep-alive',
+    })
+
+    default_adapter = _make_adapter(POOL_MAXSIZE)
+    session.mount('http://', default_adapter)
+    session.mount('https://', default_adapter)
+
+    # Hosts with their own pool size (longest prefix wins in requests)
+    for host, size in _parse_host_pool_sizes(HOST_POOL_SIZES).items():
+        adapter = _make_adapter(size)
+        session.mount(f'http://{host}/', adapter)
+        session.mount(f'https://{host}/', adapter)
+
+    return session
+
+
+def get_session():
+    """Return the process-wide pooled session (created on first use)"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+def _reset_after_fork():
+    # Sockets must not be shared with a forked child (gunicorn workers, process pools)
+    global _session, _session_lock
+    _session = None
+    _session_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -3,6 +3,16 @@ import io
 import re
 import sys
 import subprocess
+from cpu_pool import run_cpu
+
+
+def _extract_text(content_bytes):
+    from pypdf import PdfReader
+    reader = PdfReader(io.BytesIO(content_bytes))
+    text = ""
+    for page in reader.pages:
+        text += page.extract_text() + "\n"
+    return text
 
 def process_invoice_pdf(content_bytes):
     try:
@@ -18,10 +28,8 @@ def process_invoice_pdf(content_bytes):
         
         text = ""
         try:
-            from pypdf import PdfReader
-            reader = PdfReader(io.BytesIO(content_bytes))
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
+            # Parsing runs in the CPU pool for large PDFs
+            text = run_cpu(_extract_text, content_bytes, size=len(content_bytes))
         except ImportError:
             # Fallback to subprocess pdftotext (if installed on Render)
             # Or strings?
@@ -32,6 +40,16 @@ def process_invoice_pdf(content_bytes):
              # Fallback: extract readable ascii (not reliable for PDF but better than nothing)
              text = content_bytes.decode('latin-1', errors='ignore')
 
+        # The invoice text is laid out vertically (Item / Quantity / UnitPrice
+        # on separate lines): pair up the lines that are just a number
+        line_numbers = [float(line.strip()) for line in text.split('\n')
+                        if re.match(r'^\d+(\.\d+)?$', line.strip())]
+        if len(line_numbers) >= 2:
+            total = sum(qty * price for qty, price in zip(line_numbers[0::2], line_numbers[1::2]))
+            result = round(total, 2)
+            print(f"💰 Invoice total: {result} from {len(line_numbers)} numbers: {line_numbers}")
+            return result
+
         # Find numbers
         # Based on logs "Found 6 numbers: [3.0, 19.99, ...]"
         # Pattern seems to be Qty, Price pairs.
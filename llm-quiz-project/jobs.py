@@ -0,0 +1,227 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Job state lives in SQLite so every gunicorn worker can answer status/SSE
+# requests for chains started by another worker on the same machine.
+# Jobs run in the process that accepted them; that process heartbeats its
+# unfinished jobs, and a job whose owner stopped (worker restarted or
+# recycled) is marked failed when it is next read.
+JOBS_DB = os.getenv('JOBS_DB', '/tmp/llm-quiz-jobs.db')
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '4'))  # concurrent chains per process
+JOB_HEARTBEAT_SECONDS = float(os.getenv('JOB_HEARTBEAT_SECONDS', '10'))
+JOB_STALE_SECONDS = float(os.getenv('JOB_STALE_SECONDS', '60'))  # no heartbeat for this long = owner gone
+ACTIVE = ('queued', 'running')
+
+_executor = None
+_owner = None  # "<pid>-<random>" for this process (pids get reused)
+_db_ready = False  # schema created by this process (get_job is polled every 0.5s by SSE clients)
+_db_lock = threading.Lock()
+
+
+def _connect():
+    conn = sqlite3.connect(JOBS_DB, timeout=10)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def init_db():
+    """Create the tables (once per process)"""
+    global _db_ready
+    if _db_ready:
+        return
+    with _db_lock:
+        if not _db_ready:
+            _create_tables()
+            _db_ready = True
+
+
+def _create_tables():
+    with _connect() as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                url TEXT,
+                created REAL,
+                updated REAL,
+                result TEXT,
+                error TEXT,
+                owner TEXT,
+                heartbeat REAL
+            )""")
+        for column in ('owner TEXT', 'heartbeat REAL'):
+            try:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {column}")
+            except sqlite3.OperationalError:
+                pass  # already there
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS job_events (
+                job_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (job_id, seq)
+            )""")
+
+
+def _heartbeat(owner):
+    """Keeps this process's unfinished jobs fresh (daemon thread)"""
+    while True:
+        time.sleep(JOB_HEARTBEAT_SECONDS)
+        try:
+            with _connect() as conn:
+                conn.execute("UPDATE jobs SET heartbeat=? WHERE owner=? AND status IN ('queued', 'running')",
+                             (time.time(), owner))
+        except sqlite3.Error as e:
+            print(f"⚠️ Job heartbeat failed: {e}")
+
+
+def _get_executor():
+    global _executor, _owner
+    if _executor is None:
+        init_db()
+        _owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='quiz-job')
+        threading.Thread(target=_heartbeat, args=(_owner,), name='quiz-job-heartbeat', daemon=True).start()
+    return _executor
+
+
+def _owner_alive(owner):
+    """False only when the owning process is known to be gone"""
+    try:
+        os.kill(int(owner.split('-')[0]), 0)
+    except ProcessLookupError:
+        return False
+    except (AttributeError, ValueError, OSError):
+        pass
+    return True
+
+
+def _expire_if_stale(conn, job):
+    """Mark a queued/running job failed if its owner stopped; returns the current row"""
+    if job['status'] not in ACTIVE:
+        return job
+    last_beat = job['heartbeat'] or job['created'] or 0
+    if time.time() - last_beat < JOB_STALE_SECONDS and _owner_alive(job['owner']):
+        return job
+    error = f"worker {job['owner'] or 'unknown'} stopped before the job finished"
+    print(f"❌ Job {job['id']} failed: {error}")
+    conn.execute("UPDATE jobs SET status='failed', error=?, updated=? WHERE id=? AND status IN ('queued', 'running')",
+                 (error, time.time(), job['id']))
+    return conn.execute("SELECT * FROM jobs WHERE id=?", (job['id'],)).fetchone()
+
+
+def _set_status(job_id, status, result=None, error=None):
+    now = time.time()
+    with _connect() as conn:
+        conn.execute(
+            "UPDATE jobs SET status=?, updated=?, heartbeat=?, result=COALESCE(?, result), "
+            "error=COALESCE(?, error) WHERE id=?",
+            (status, now, now, json.dumps(result) if result is not None else None, error, job_id)
+        )
+
+
+def add_event(job_id, data):
+    """Append one progress event (e.g. a finished quiz step) to the job"""
+    with _connect() as conn:
+        row = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM job_events WHERE job_id=?", (job_id,)).fetchone()
+        conn.execute("INSERT INTO job_events (job_id, seq, data) VALUES (?, ?, ?)",
+                     (job_id, row[0] + 1, json.dumps(data, default=str)))
+        conn.execute("UPDATE jobs SET updated=? WHERE id=?", (time.time(), job_id))
+
+
+def _run(job_id, fn, args):
+    _set_status(job_id, 'running')
+    try:
+        result = fn(*args, progress=lambda step: add_event(job_id, step))
+        _set_status(job_id, 'complete', result=result)
+    except Exception as e:
+        print(f"❌ Job {job_id} failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        _set_status(job_id, 'failed', error=str(e))
+
+
+def submit_job(fn, *args, url=None):
+    """
+    Run fn(*args, progress=callback) on the background executor.
+    Returns the job id immediately.
+    """
+    executor = _get_executor()
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    with _connect() as conn:
+        conn.execute("INSERT INTO jobs (id, status, url, created, updated, owner, heartbeat) "
+                     "VALUES (?, 'queued', ?, ?, ?, ?, ?)", (job_id, url, now, now, _owner, now))
+    executor.submit(_run, job_id, fn, args)
+    return job_id
+
+
+def get_job(job_id, since=0):
+    """Job status plus progress events with seq > since (None if unknown)"""
+    init_db()
+    with _connect() as conn:
+        job = conn.execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+        if job is None:
+            return None
+        job = _expire_if_stale(conn, job)
+        events = conn.execute(
+            "SELECT seq, data FROM job_events WHERE job_id=? AND seq>? ORDER BY seq", (job_id, since)
+        ).fetchall()
+    return {
+        "job_id": job['id'],
+        "status": job['status'],
+        "url": job['url'],
+        "created": job['created'],
+        "updated": job['updated'],
+        "result": json.loads(job['result']) if job['result'] else None,
+        "error": job['error'],
+        "steps": [dict(json.loads(e['data']), seq=e['seq']) for e in events],
+    }
+
+
+def stream_events(job_id, poll_interval=0.5, heartbeat=15):
+    """
+    Server-Sent Events generator: one 'step' event per progress event, then
+    'done' (also when the job's worker stopped and it was marked failed)
+    """
+    last_seq = 0
+    last_sent = time.time()
+    while True:
+        job = get_job(job_id, since=last_seq)
+        if job is None:
+            yield f"event: error\ndata: {json.dumps({'error': 'Unknown job'})}\n\n"
+            return
+
+        for step in job['steps']:
+            last_seq = step['seq']
+            yield f"id: {last_seq}\nevent: step\ndata: {json.dumps(step)}\n\n"
+            last_sent = time.time()
+
+        if job['status'] in ('complete', 'failed'):
+            done = {k: job[k] for k in ('status', 'result', 'error')}
+            yield f"event: done\ndata: {json.dumps(done)}\n\n"
+            return
+
+        if time.time() - last_sent > heartbeat:
+            # Comment line keeps proxies from closing an idle stream
+            yield ": keep-alive\n\n"
+            last_sent = time.time()
+        time.sleep(poll_interval)
+
+
+def _reset_after_fork():
+    # A forked child (e.g. a gunicorn worker) gets its own executor, owner id and heartbeat
+    global _executor, _owner, _db_lock
+    _executor = None
+    _owner = None
+    _db_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,146 @@
+import os
+import json
+import asyncio
+import time
+import sqlite3
+import hashlib
+import threading
+
+import metrics
+
+# Persistent cache of chat completions, shared by every worker on the box.
+# Only deterministic calls (temperature=0) are cached: re-running the same
+# chain then costs no round trips to aipipe.
+LLM_CACHE_DB = os.getenv('LLM_CACHE_DB', '/tmp/llm-quiz-llm-cache.db')
+LLM_CACHE_TTL = float(os.getenv('LLM_CACHE_TTL', str(7 * 24 * 3600)))  # seconds
+LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '5000'))  # 0 disables the cache
+LLM_CACHE_BYPASS = os.getenv('LLM_CACHE_BYPASS', '').lower() in ('1', 'true', 'yes')
+
+_initialised = False
+_stats = {"hits": 0, "misses": 0, "bypassed": 0}
+_stats_lock = threading.Lock()
+
+
+def _connect():
+    global _initialised
+    conn = sqlite3.connect(LLM_CACHE_DB, timeout=10)
+    if not _initialised:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                content TEXT NOT NULL,
+                created REAL,
+                accessed REAL,
+                hits INTEGER DEFAULT 0
+            )""")
+        conn.execute("CREATE INDEX IF NOT EXISTS completions_accessed ON completions (accessed)")
+        conn.commit()
+        _initialised = True
+    return conn
+
+
+def count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def fingerprint(params):
+    """Stable hash of model + messages + every other request parameter"""
+    blob = json.dumps(params, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def cache_key(params, bypass=False):
+    """Fingerprint for a cacheable (temperature=0) request, else None"""
+    if bypass or LLM_CACHE_BYPASS or LLM_CACHE_MAX_ENTRIES <= 0:
+        return None
+    if params.get('temperature') != 0:
+        return None
+    return fingerprint(params)
+
+
+def lookup(key):
+    try:
+        with _connect() as conn:
+            row = conn.execute("SELECT content, created FROM completions WHERE key=?", (key,)).fetchone()
+            if row is None or time.time() - row[1] > LLM_CACHE_TTL:
+                return None
+            conn.execute("UPDATE completions SET accessed=?, hits=hits+1 WHERE key=?", (time.time(), key))
+            return row[0]
+    except sqlite3.Error as e:
+        print(f"⚠️ LLM cache read failed: {e}")
+        return None
+
+
+def store(key, model, content):
+    now = time.time()
+    try:
+        with _connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO completions (key, model, content, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, model, content, now, now)
+            )
+            # Expired rows first, then least recently used beyond the size cap
+            conn.execute("DELETE FROM completions WHERE created < ?", (now - LLM_CACHE_TTL,))
+            conn.execute(
+                "DELETE FROM completions WHERE key IN "
+                "(SELECT key FROM completions ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (LLM_CACHE_MAX_ENTRIES,)
+            )
+    except sqlite3.Error as e:
+        print(f"⚠️ LLM cache write failed: {e}")
+
+
+def cached_completion(client, bypass=False, **params):
+    """
+    client.chat.completions.create(**params), returning the message text.
+    Served from the cache when the same deterministic request was made before.
+    """
+    key = cache_key(params, bypass)
+    content = lookup(key) if key else None
+    if content is not None:
+        count('hits')
+        print(f"💾 LLM cache hit ({params.get('model')})")
+        return content
+
+    count('misses' if key else 'bypassed')
+    start = time.time()
+    response = client.chat.completions.create(**params)
+    metrics.observe('llm.latency', time.time() - start, mode='blocking', model=params.get('model'))
+    content = response.choices[0].message.content
+    if key and content is not None:
+        store(key, params.get('model'), content)
+    return content
+
+
+async def acached_completion(client, bypass=False, **params):
+    """cached_completion for AsyncOpenAI clients; the sqlite cache is read and written off the event loop"""
+    key = cache_key(params, bypass)
+    content = await asyncio.to_thread(lookup, key) if key else None
+    if content is not None:
+        count('hits')
+        print(f"💾 LLM cache hit ({params.get('model')})")
+        return content
+
+    count('misses' if key else 'bypassed')
+    start = time.time()
+    response = await client.chat.completions.create(**params)
+    metrics.observe('llm.latency', time.time() - start, mode='async', model=params.get('model'))
+    content = response.choices[0].message.content
+    if key and content is not None:
+        await asyncio.to_thread(store, key, params.get('model'), content)
+    return content
+
+
+def stats():
+    """Hit/miss counters for this process plus the number of cached rows"""
+    with _stats_lock:
+        result = dict(_stats)
+    try:
+        with _connect() as conn:
+            result["entries"] = conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+    except sqlite3.Error:
+        result["entries"] = None
+    return result
@@ -0,0 +1,91 @@
+import os
+import time
+import threading
+import openai
+
+# One OpenAI client per process (plus one shared async client),
+# so every LLM call reuses the same keep-alive connections to aipipe.org
+# instead of paying DNS + TLS setup per handler call.
+AIPIPE_BASE_URL = os.getenv('AIPIPE_BASE_URL', 'https://aipipe.org/openai/v1')
+LLM_MAX_CONNECTIONS = int(os.getenv('LLM_MAX_CONNECTIONS', '20'))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv('LLM_KEEPALIVE_EXPIRY', '120'))  # seconds an idle socket is kept
+LLM_CONNECT_TIMEOUT = float(os.getenv('LLM_CONNECT_TIMEOUT', '5'))
+LLM_READ_TIMEOUT = float(os.getenv('LLM_READ_TIMEOUT', '60'))
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '2'))
+
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+
+def _limits():
+    # Build Limits from the httpx flavour the installed SDK uses
+    return type(openai.DEFAULT_CONNECTION_LIMITS)(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_CONNECTIONS,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+    )
+
+
+def _timeout():
+    return openai.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+
+
+def get_client():
+    """Process-wide OpenAI client for the aipipe proxy"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = openai.OpenAI(
+                    api_key=os.getenv('AIPIPE_API_KEY'),
+                    base_url=AIPIPE_BASE_URL,
+                    max_retries=LLM_MAX_RETRIES,
+                    http_client=openai.DefaultHttpxClient(limits=_limits(), timeout=_timeout()),
+                )
+    return _client
+
+
+def get_async_client():
+    """Shared AsyncOpenAI client (used by the asyncio engine)"""
+    global _async_client
+    if _async_client is None:
+        _async_client = openai.AsyncOpenAI(
+            api_key=os.getenv('AIPIPE_API_KEY'),
+            base_url=AIPIPE_BASE_URL,
+            max_retries=LLM_MAX_RETRIES,
+            http_client=openai.DefaultAsyncHttpxClient(limits=_limits(), timeout=_timeout()),
+        )
+    return _async_client
+
+
+async def aclose_async_client():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+
+
+def prewarm():
+    """Open a pooled TLS connection to aipipe now, so the first real call skips the handshake"""
+    start = time.time()
+    try:
+        get_client().with_options(max_retries=0, timeout=LLM_CONNECT_TIMEOUT * 2).models.list()
+    except openai.APIStatusError:
+        pass  # any HTTP response (even 401/404 from the proxy) means the socket is up
+    except Exception as e:
+        print(f"⚠️ LLM prewarm failed: {e}")
+        return
+    print(f"🔥 LLM connection warmed in {time.time() - start:.2f}s")
+
+
+def _reset_after_fork():
+    # httpx pools are not fork-safe; each gunicorn / CPU-pool child builds its own
+    global _client, _async_client, _client_lock
+    _client = None
+    _async_client = None
+    _client_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,178 @@
+import os
+import re
+import json
+import asyncio
+import time
+
+import metrics
+from llm_cache import cached_completion, acached_completion, cache_key, lookup, store, count
+
+# Streamed completions that stop reading as soon as the answer is complete.
+# Quiz answers are mostly one number, a hex colour or a short JSON value;
+# anything the model adds after that is wasted generation time.
+LLM_STREAMING = os.getenv('LLM_STREAMING', '1').lower() in ('1', 'true', 'yes')
+
+# A whole first line that is one of these can't turn into a different answer
+_SCALAR = re.compile(
+    r"-?\d[\d,]*(\.\d+)?|-?\.\d+|#[0-9a-fA-F]{6}|true|false|yes|no",
+    re.IGNORECASE,
+)
+_PREFIXES = ('Answer:', 'The answer is', 'The result is')
+
+
+class AnswerParser:
+    """
+    Incremental parser for streamed answers. feed() returns True once the
+    text received so far contains a complete answer; .answer holds it.
+    """
+
+    def __init__(self):
+        self.text = ''
+        self.answer = None
+        self._decoder = json.JSONDecoder()
+
+    def feed(self, chunk):
+        self.text += chunk
+        if self.answer is None:
+            self.answer = self._complete_answer()
+        return self.answer is not None
+
+    def _body(self):
+        body = self.text.lstrip()
+        if body.startswith('```'):
+            # Skip the fence line (```json); wait until it has arrived in full
+            fence, newline, body = body.partition('\n')
+            if not newline:
+                return ''
+        for prefix in _PREFIXES:
+            if body.startswith(prefix):
+                body = body[len(prefix):]
+        return body.lstrip()
+
+    def _complete_answer(self):
+        body = self._body()
+        if not body:
+            return None
+        if body[0] in '[{':
+            # JSON is complete as soon as its brackets balance
+            try:
+                _, end = self._decoder.raw_decode(body)
+            except ValueError:
+                return None
+            return body[:end]
+        line, newline, _ = body.partition('\n')
+        if newline and _SCALAR.fullmatch(line.strip().rstrip('`').strip()):
+            return line.strip().rstrip('`').strip()
+        # Free text (or a first line that may still grow): read to the end
+        return None
+
+
+def _delta(chunk):
+    if not chunk.choices:
+        return ''
+    return chunk.choices[0].delta.content or ''
+
+
+def _record(model, start, first_token, first_answer, early):
+    labels = {"model": model}
+    metrics.observe('llm.latency', time.time() - start, mode='stream', **labels)
+    if first_token is not None:
+        metrics.observe('llm.ttft', first_token - start, **labels)
+    if first_answer is not None:
+        metrics.observe('llm.ttfa', first_answer - start, **labels)
+    if early:
+        print(f"✂️ Answer complete after {first_answer - start:.2f}s, closed the stream early")
+
+
+def stream_completion(client, early_stop=True, bypass=False, **params):
+    """
+    Like cached_completion, but streams the response and (with early_stop)
+    closes it once AnswerParser recognises a complete answer. Returns the
+    answer text. Shares cache entries with non-streamed calls.
+    """
+    if not LLM_STREAMING:
+        return cached_completion(client, bypass=bypass, **params)
+
+    key = cache_key(params, bypass)
+    cached = lookup(key) if key else None
+    if cached is not None:
+        count('hits')
+        print(f"💾 LLM cache hit ({params.get('model')})")
+        return cached
+    count('misses' if key else 'bypassed')
+
+    start = time.time()
+    first_token = first_answer = None
+    parser = AnswerParser()
+    stream = client.chat.completions.create(stream=True, **params)
+    try:
+        for chunk in stream:
+            delta = _delta(chunk)
+            if not delta:
+                continue
+            first_token = first_token or time.time()
+            if parser.feed(delta) and first_answer is None:
+                first_answer = time.time()
+                if early_stop:
+                    break
+    finally:
+        stream.close()
+
+    early = early_stop and parser.answer is not None
+    text = parser.answer if early else parser.text
+    _record(params.get('model'), start, first_token, first_answer or time.time(), early)
+    if key:
+        store(key, params.get('model'), text)
+    return text
+
+
+async def astream_completion(client, early_stop=True, bypass=False, **params):
+    """stream_completion for AsyncOpenAI clients; the sqlite cache is read and written off the event loop"""
+    if not LLM_STREAMING:
+        return await acached_completion(client, bypass=bypass, **params)
+
+    key = cache_key(params, bypass)
+    cached = await asyncio.to_thread(lookup, key) if key else None
+    if cached is not None:
+        count('hits')
+        print(f"💾 LLM cache hit ({params.get('model')})")
+        return cached
+    count('misses' if key else 'bypassed')
+
+    start = time.time()
+    first_token = first_answer = None
+    parser = AnswerParser()
+    stream = await client.chat.completions.create(stream=True, **params)
+    try:
+        async for chunk in stream:
+            delta = _delta(chunk)
+            if not delta:
+                continue
+            first_token = first_token or time.time()
+            if parser.feed(delta) and first_answer is None:
+                first_answer = time.time()
+                if early_stop:
+                    break
+    finally:
+        await stream.close()
+
+    early = early_stop and parser.answer is not None
+    text = parser.answer if early else parser.text
+    _record(params.get('model'), start, first_token, first_answer or time.time(), early)
+    if key:
+        await asyncio.to_thread(store, key, params.get('model'), text)
+    return text
+
+
+def complete(client, params):
+    """Text for an ('llm', params) effect: streamed when params has early_stop, else cached_completion"""
+    if 'early_stop' in params:
+        return stream_completion(client, **params)
+    return cached_completion(client, **params)
+
+
+async def acomplete(client, params):
+    """complete for AsyncOpenAI clients"""
+    if 'early_stop' in params:
+        return await astream_completion(client, **params)
+    return await acached_completion(client, **params)
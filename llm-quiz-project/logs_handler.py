@@ -1,81 +1,136 @@
-
 import zipfile
 import io
 import re
+from zip_parallel import use_parallel, map_members, mapped_zip
+
+# Streaming log aggregation: zip members are read one at a time in chunks and
+# matched with precompiled byte patterns (no per-line decode), so memory stays
+# at about one chunk whatever the archive size.
+CHUNK_SIZE = 1024 * 1024
+
+# Per format: a line counts if it is a download event, and its bytes value is added.
+# The lookahead keeps both conditions on the same line.
+PATTERNS = {
+    'jsonl': re.compile(rb'^(?=[^\n]*"event"\s*:\s*"download")[^\n]*?"bytes"\s*:\s*(\d+)', re.MULTILINE),
+    'kv': re.compile(rb'^(?=[^\n]*download)[^\n]*?\bbytes=(\d+)', re.MULTILINE),
+}
+# When the archive has this member only it is read
+PREFERRED_MEMBER = 'logs.jsonl'
+
+
+class LogTotals:
+    """Partial aggregate over some log data; merge() combines results from several members"""
+
+    def __init__(self, download_bytes=0, downloads=0, members=0):
+        self.download_bytes = download_bytes
+        self.downloads = downloads
+        self.members = members
+
+    def merge(self, other):
+        self.download_bytes += other.download_bytes
+        self.downloads += other.downloads
+        self.members += other.members
+        return self
+
+
+def member_format(name, head):
+    """'jsonl' or 'kv', from the member name or its first byte"""
+    if name.endswith(('.jsonl', '.json', '.ndjson')):
+        return 'jsonl'
+    return 'jsonl' if head.lstrip()[:1] == b'{' else 'kv'
+
+
+def scan_stream(stream, name=''):
+    """LogTotals for one member read from a binary stream"""
+    totals = LogTotals(members=1)
+    pattern = None
+    rest = b''
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        if pattern is None:
+            pattern = PATTERNS[member_format(name, chunk)]
+        data = rest + chunk
+        cut = data.rfind(b'\n') + 1  # complete lines only; the tail waits for the next chunk
+        values = pattern.findall(data, 0, cut)
+        rest = data[cut:]
+        totals.download_bytes += sum(map(int, values))
+        totals.downloads += len(values)
+    if rest and pattern is not None:
+        values = pattern.findall(rest + b'\n')
+        totals.download_bytes += sum(map(int, values))
+        totals.downloads += len(values)
+    return totals
+
+
+def select_members(names):
+    """logs.jsonl if the archive has it, else every file member"""
+    if PREFERRED_MEMBER in names:
+        return [PREFERRED_MEMBER]
+    return [n for n in names if not n.endswith('/')]
+
+
+def _open_zip(source):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return zipfile.ZipFile(io.BytesIO(source))
+    return zipfile.ZipFile(source)  # path or binary file object
+
+
+def _scan_zip(z, names):
+    totals = LogTotals()
+    for name in names:
+        with z.open(name) as f:
+            totals.merge(scan_stream(f, name))
+    return totals
+
+
+def scan_members(path, names):
+    """LogTotals for some members of the archive at path (runs in a CPU pool worker)"""
+    with mapped_zip(path) as z:
+        return _scan_zip(z, names)
+
+
+def aggregate_logs(source, members=None):
+    """
+    LogTotals over the selected members of a zip (bytes, path or file object).
+    Archives with many members are scanned in parallel in the CPU pool.
+    """
+    with _open_zip(source) as z:
+        members = members or select_members(z.namelist())
+        if not use_parallel(len(members)) or not isinstance(source, (bytes, bytearray, str)):
+            return _scan_zip(z, members)
+
+    try:
+        partials = map_members(scan_members, source, members)
+    except OSError as e:
+        print(f"⚠️ Parallel scan unavailable ({e}), scanning serially")
+        with _open_zip(source) as z:
+            return _scan_zip(z, members)
+    totals = LogTotals()
+    for _, partial in partials:
+        totals.merge(partial)
+    return totals
+
 
 def process_logs_zip(content_bytes, email):
+    """Sum bytes of download events in logs.zip, plus offset = len(email) % 5"""
     try:
-        total_bytes = 0
-        with zipfile.ZipFile(io.BytesIO(content_bytes)) as z:
-            for filename in z.namelist():
-                # Only process logs/ directory or .log files if needed?
-                # The quiz says "Download logs.zip and sum bytes where event=='download'"
-                # Usually implies checking all files in zip
-                with z.open(filename) as f:
-                    # check if file is directory
-                    if filename.endswith('/'):
-                        continue
-                        
-                    for line in f:
-                        line_str = line.decode('utf-8', errors='ignore')
-                        if 'download' in line_str:
-                            match = re.search(r'bytes=(\d+)', line_str)
-                            if match:
-                                total_bytes += int(match.group(1))
-        
-        # Calculate offset
-        # "offset = (length of your email) mod 5" ? 
-        # Actually the logs from Q9 show: "Email length: 30, Offset (mod 5): 0".
-        # But the ANSWER submitted was just total_bytes sum (335).
-        # Wait. Q9 logs say: "Final answer: 335".
-        # It seems the offset logic might be used for selecting WHICH files to read?
-        # Re-reading Q9 prompt from log in Step 6:
-        # "Compute offset = (length of your email) mod 5. Read only the file logs/log_{offset}.txt" ???
-        # NO! The prompt in Step 1981 (Q9) says:
-        # "Compute offset = (length of your email) mod ..." implies SELECTION.
-        # But then "Download logs.zip and sum bytes where event=='download'".
-        # Wait, if I read ALL files, I might overcount?
-        
-        # Let's re-read the Q9 prompt CAREFULLY from Step 1981 logs
-        # "Compute offset = (length of your email) mod ... (cutoff)"
-        # "Read only the file logs/log_{offset}.txt"?
-        # Or "logs/file_{offset}..."
-        
-        # In my previous successful attempt for Q9 (logs in Step 1981), I got 335.
-        # It says "Download bytes sum: 335".
-        # And "Email length: 30, Offset (mod 5): 0".
-        # So maybe I processed `logs/log_0.txt`?
-        # Or maybe I processed EVERYTHING and it happened to be 335?
-        
-        # To be safe, I should implement the OFFSET logic if I can recall it.
-        # Usually these quizzes use offset to pick ONE file.
-        # "log_{offset}.txt" is common.
-        
-        # Strategy: Look for files matching the offset.
-        # If I can't be sure, I'll count everything?
-        # But wait, 335 is quite small. 
-        # If I count everything in a big zip, it might be huge.
-        
+        totals = aggregate_logs(content_bytes)
+
+        # Add offset (email length mod 5)
         offset = len(email) % 5
-        target_suffix = f"_{offset}.txt" # Guessing filename pattern
-        # Or maybe "log{offset}.txt"?
-        
-        # Let's inspect the file list if possible.
-        # I'll modify the loop to sum everything but PRINT the filenames to debug if needed.
-        # But since I need to write the file NOW...
-        
-        # I will implement summing EVERYTHING, because in my previous log, I did "Final answer: 335" and it was CORRECT.
-        # And the log snippet "Email length: 30, Offset: 0" suggests my previous code DID calculate it.
-        # So I will replicate that logic: calculate offset, but sum everything? 
-        # Or did I filter?
-        # "Logs processing: Download bytes sum: 335"
-        
-        # I'll stick to summing everything. If it fails, I'll debug.
-        # But wait, if Q9 passed before with 335, and I am recreating the handler...
-        # I should try to make it smart.
-        
-        return total_bytes
-        
+        result = totals.download_bytes + offset
+
+        print(f"📊 Logs processing:")
+        print(f"  Download bytes sum: {totals.download_bytes} ({totals.downloads} events, {totals.members} files)")
+        print(f"  Email length: {len(email)}, Offset (mod 5): {offset}")
+        print(f"  Final answer: {result}")
+
+        return result
+
     except Exception as e:
-        print(f"❌ Error processing logs: {str(e)}")
-        return 0
+        print(f"❌ Logs processing error: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return None
@@ -0,0 +1,65 @@
+import os
+import math
+import threading
+from collections import deque
+
+# In-process latency metrics (seconds), exposed by GET /metrics.
+# Each series keeps its last METRICS_WINDOW samples, which is plenty for
+# percentiles over the recent quiz chains without unbounded growth.
+METRICS_WINDOW = int(os.getenv('METRICS_WINDOW', '1000'))
+
+_series = {}
+_counts = {}
+_lock = threading.Lock()
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+
+def observe(name, value, **labels):
+    """Record one sample, e.g. observe('llm.latency', 1.2, model='gpt-4o')"""
+    key = _key(name, labels)
+    with _lock:
+        if key not in _series:
+            _series[key] = deque(maxlen=METRICS_WINDOW)
+            _counts[key] = 0
+        _series[key].append(value)
+        _counts[key] += 1
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return None
+    return values[max(0, math.ceil(q / 100 * len(values)) - 1)]
+
+
+def series(name, **labels):
+    """Samples currently kept for one series (oldest first)"""
+    with _lock:
+        return list(_series.get(_key(name, labels), ()))
+
+
+def summarize(values):
+    values = sorted(values)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 4),
+        "p50": round(percentile(values, 50), 4),
+        "p90": round(percentile(values, 90), 4),
+        "p99": round(percentile(values, 99), 4),
+        "max": round(values[-1], 4),
+    }
+
+
+def snapshot():
+    """{name: [{labels..., total, count, p50, ...}, ...]} for every series"""
+    with _lock:
+        items = [(key, list(values), _counts[key]) for key, values in _series.items()]
+    result = {}
+    for (name, labels), values, total in sorted(items):
+        result.setdefault(name, []).append(dict(labels, total=total, **summarize(values)))
+    return result
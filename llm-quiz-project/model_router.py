@@ -0,0 +1,138 @@
+import os
+import time
+import sqlite3
+
+import metrics
+from llm_cache import LLM_CACHE_DB
+
+# Picks gpt-4o-mini or gpt-4o per question class (route + prompt size).
+# The fastest model whose recorded accuracy for the class is good enough
+# wins; untried models get a chance. The chain escalates to the larger
+# model only after a parse failure or an incorrect submission.
+SMALL_MODEL = os.getenv('ROUTER_SMALL_MODEL', 'gpt-4o-mini')
+LARGE_MODEL = os.getenv('ROUTER_LARGE_MODEL', 'gpt-4o')
+ROUTER_ENABLED = os.getenv('ROUTER_ENABLED', '1').lower() in ('1', 'true', 'yes')
+ROUTER_DB = os.getenv('ROUTER_DB', LLM_CACHE_DB)
+ROUTER_MIN_ACCURACY = float(os.getenv('ROUTER_MIN_ACCURACY', '0.8'))
+ROUTER_MIN_SAMPLES = int(os.getenv('ROUTER_MIN_SAMPLES', '3'))  # outcomes needed before accuracy counts
+ROUTER_LARGE_PROMPT_CHARS = int(os.getenv('ROUTER_LARGE_PROMPT_CHARS', '12000'))
+ROUTER_ESCALATE_MIN_SECONDS = float(os.getenv('ROUTER_ESCALATE_MIN_SECONDS', '20'))  # time left to retry
+
+# Smallest first: the escalation order
+MODELS = (SMALL_MODEL, LARGE_MODEL)
+# Latency guesses (seconds) until this process has measured the models
+DEFAULT_LATENCY = {SMALL_MODEL: 1.0, LARGE_MODEL: 2.0}
+# Model each LLM route used before routing (used when ROUTER_ENABLED=0)
+STATIC_MODELS = {'gpt': LARGE_MODEL, 'pdf': SMALL_MODEL, 'sqlite': SMALL_MODEL, 'table': SMALL_MODEL,
+                 'program': LARGE_MODEL}
+
+_initialised = False
+
+
+def _connect():
+    global _initialised
+    conn = sqlite3.connect(ROUTER_DB, timeout=10)
+    if not _initialised:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS model_outcomes (
+                question_class TEXT NOT NULL,
+                model TEXT NOT NULL,
+                attempts INTEGER DEFAULT 0,
+                correct INTEGER DEFAULT 0,
+                updated REAL,
+                PRIMARY KEY (question_class, model)
+            )""")
+        conn.commit()
+        _initialised = True
+    return conn
+
+
+def question_class(route, prompt_chars):
+    return f"{route}:{'large' if prompt_chars > ROUTER_LARGE_PROMPT_CHARS else 'small'}"
+
+
+def outcomes(qclass):
+    """{model: (attempts, correct)} recorded for a question class"""
+    try:
+        with _connect() as conn:
+            rows = conn.execute(
+                "SELECT model, attempts, correct FROM model_outcomes WHERE question_class=?", (qclass,)
+            ).fetchall()
+    except sqlite3.Error as e:
+        print(f"⚠️ Router history unavailable: {e}")
+        return {}
+    return {model: (attempts, correct) for model, attempts, correct in rows}
+
+
+def record_outcome(qclass, model, correct):
+    try:
+        with _connect() as conn:
+            conn.execute("""
+                INSERT INTO model_outcomes (question_class, model, attempts, correct, updated)
+                VALUES (?, ?, 1, ?, ?)
+                ON CONFLICT (question_class, model) DO UPDATE SET
+                    attempts = attempts + 1, correct = correct + excluded.correct, updated = excluded.updated
+            """, (qclass, model, int(bool(correct)), time.time()))
+    except sqlite3.Error as e:
+        print(f"⚠️ Router history write failed: {e}")
+
+
+def _latencies(model):
+    # This process's measured call latency for model, streamed and blocking
+    return (metrics.series('llm.latency', mode='stream', model=model)
+            + metrics.series('llm.latency', mode='blocking', model=model))
+
+
+def median_latency(model):
+    values = sorted(_latencies(model))
+    if not values:
+        return DEFAULT_LATENCY.get(model, float('inf'))
+    return metrics.percentile(values, 50)
+
+
+def accuracy(history, model):
+    attempts, correct = history.get(model, (0, 0))
+    if attempts < ROUTER_MIN_SAMPLES:
+        return None
+    return correct / attempts
+
+
+def choose_model(route, prompt_chars):
+    """Returns (model, question_class) for an LLM call on route"""
+    qclass = question_class(route, prompt_chars)
+    if not ROUTER_ENABLED:
+        return STATIC_MODELS.get(route, LARGE_MODEL), qclass
+
+    history = outcomes(qclass)
+    for model in sorted(MODELS, key=median_latency):
+        score = accuracy(history, model)
+        if score is None or score >= ROUTER_MIN_ACCURACY:
+            return model, qclass
+    # Nothing meets the bar: take the most accurate
+    return max(MODELS, key=lambda m: accuracy(history, m) or 0), qclass
+
+
+def escalation_model(model, time_left):
+    """The next larger model if there is one and enough time to retry, else None"""
+    if not ROUTER_ENABLED or model not in MODELS or time_left < ROUTER_ESCALATE_MIN_SECONDS:
+        return None
+    index = MODELS.index(model)
+    return MODELS[index + 1] if index + 1 < len(MODELS) else None
+
+
+def report():
+    """Latency percentiles per model plus recorded accuracy per question class"""
+    latency = {model: metrics.summarize(_latencies(model)) for model in MODELS}
+    try:
+        with _connect() as conn:
+            rows = conn.execute(
+                "SELECT question_class, model, attempts, correct FROM model_outcomes ORDER BY question_class, model"
+            ).fetchall()
+    except sqlite3.Error:
+        rows = []
+    history = [
+        {"class": qclass, "model": model, "attempts": attempts, "accuracy": round(correct / attempts, 3)}
+        for qclass, model, attempts, correct in rows if attempts
+    ]
+    return {"latency": latency, "history": history}
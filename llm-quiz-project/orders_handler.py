@@ -17,6 +17,9 @@ def process_orders_csv(content_bytes):
         else:
              # Fallback to looking for numeric column
             total_col = df.select_dtypes(include=['number']).columns[0]
+        
+        # Ensure numeric amounts (a column read as strings would sort and sum as text)
+        df[total_col] = pd.to_numeric(df[total_col])
             
         res = df.groupby('customer_id')[total_col].sum().reset_index()
         res.rename(columns={total_col: 'total'}, inplace=True)
@@ -24,7 +27,12 @@ def process_orders_csv(content_bytes):
         # Sort by total desc and take top 3
         res = res.sort_values(by='total', ascending=False).head(3)
         
-        return json.dumps(res.to_dict(orient='records'))
+        result = json.dumps(res.to_dict(orient='records'))
+        print(f"📊 Top 3 customers: {result}")
+        return result
     except Exception as e:
+        # None (not an empty list) so the chain's placeholder / retry path runs
         print(f"❌ Error processing orders: {str(e)}")
-        return json.dumps([])
+        import traceback
+        traceback.print_exc()
+        return None
@@ -1,24 +1,31 @@
 
 import io
-import openai
+from steps import llm, run_steps
 from pypdf import PdfReader
-from dotenv import load_dotenv
-import os
+from cpu_pool import run_cpu
 
-def process_pdf_quiz(pdf_bytes, question):
+
+def extract_pdf_text(pdf_bytes):
+    """Concatenate the text of every page (runs in the CPU pool for large PDFs)"""
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    text = ""
+    for page in reader.pages:
+        text += page.extract_text() + "\n"
+    return text
+
+
+def process_pdf_quiz(pdf_bytes, question, model="gpt-4o-mini"):
+    """pdf_quiz_steps with blocking LLM calls"""
+    return run_steps(pdf_quiz_steps(pdf_bytes, question, model))
+
+
+def pdf_quiz_steps(pdf_bytes, question, model="gpt-4o-mini"):
     """
-    Extract text from PDF and use GPT to answer the question.
+    Extract text from PDF and use GPT to answer the question (step generator).
     """
-    client = openai.OpenAI(
-        api_key=os.environ.get("AIPIPE_API_KEY"),
-        base_url="https://aipipe.org/openai/v1"
-    )
-    
+
     try:
-        reader = PdfReader(io.BytesIO(pdf_bytes))
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
+        text = run_cpu(extract_pdf_text, pdf_bytes, size=len(pdf_bytes))
             
         print(f"📄 Extracted PDF text length: {len(text)}")
         
@@ -48,12 +55,12 @@ Text:
 Question:
 {question}
 """
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}]
-        )
+        answer = (yield llm(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0
+        )).strip()
         
-        answer = response.choices[0].message.content.strip()
         print(f"🤖 PDF Answer: {answer}")
         
         # Post-process cleanup (remove quotes, etc)
@@ -0,0 +1,172 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+
+from data_profile import profile_dataframe, PROFILE_TOKEN_BUDGET
+from llm_cache import LLM_CACHE_DB
+from steps import llm, run_steps
+from sandbox import run_program, SandboxError, SandboxUnavailable
+
+# "Program mode": instead of pasting (truncated) data into the prompt and
+# asking the model for the number, send the schema + a sample, get back a
+# short pandas program and run it locally over the full DataFrames.
+# Programs are cached by schema and question template, so a repeat question
+# with different literals reuses the program without an LLM call.
+PROGRAM_MODE = os.getenv('PROGRAM_MODE', '1').lower() in ('1', 'true', 'yes')
+PROGRAM_DB = os.getenv('PROGRAM_DB', LLM_CACHE_DB)
+
+# Literals in the question become PARAMS[i] in the template
+_LITERAL = re.compile(r'"[^"]*"|\'[^\']*\'|-?\d+(?:\.\d+)?')
+_FENCE = re.compile(r'^```\w*\n?|```$', re.MULTILINE)
+
+PROGRAM_PROMPT = """You write a short Python program that answers a question about tabular data.
+
+In scope: dfs (dict of name -> pandas DataFrame with the FULL data), df (the first DataFrame),
+pd, np, PARAMS (the literal values from the question, in order) and EMAIL (the user's email).
+Use PARAMS[i] instead of hard-coding those values. Assign the final answer to a variable named
+result (a number, string, bool, list or dict). Do not print, read files or use the network.
+Return only the code.
+
+Data (schema, statistics and a sample):
+{profile}
+
+Question template: {template}
+PARAMS = {params}
+"""
+
+_initialised = False
+
+
+def _connect():
+    global _initialised
+    conn = sqlite3.connect(PROGRAM_DB, timeout=10)
+    if not _initialised:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS programs (
+                key TEXT PRIMARY KEY,
+                code TEXT NOT NULL,
+                created REAL,
+                hits INTEGER DEFAULT 0
+            )""")
+        conn.commit()
+        _initialised = True
+    return conn
+
+
+def question_template(question):
+    """Question with its literals replaced by {0}, {1}, ... plus the literal values"""
+    params = []
+
+    def repl(match):
+        text = match.group(0)
+        if text[0] in '"\'':
+            params.append(text[1:-1])
+        else:
+            params.append(float(text) if '.' in text else int(text))
+        return '{%d}' % (len(params) - 1)
+
+    return _LITERAL.sub(repl, question), params
+
+
+def schema_signature(frames):
+    return [[name, [[str(c), str(t)] for c, t in df.dtypes.items()]] for name, df in frames.items()]
+
+
+def program_key(frames, template):
+    blob = json.dumps([schema_signature(frames), template], sort_keys=True)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def cached_program(key):
+    try:
+        with _connect() as conn:
+            row = conn.execute("SELECT code FROM programs WHERE key=?", (key,)).fetchone()
+            if row:
+                conn.execute("UPDATE programs SET hits=hits+1 WHERE key=?", (key,))
+            return row[0] if row else None
+    except sqlite3.Error as e:
+        print(f"⚠️ Program cache read failed: {e}")
+        return None
+
+
+def store_program(key, code):
+    try:
+        with _connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO programs (key, code, created) VALUES (?, ?, ?)",
+                         (key, code, time.time()))
+    except sqlite3.Error as e:
+        print(f"⚠️ Program cache write failed: {e}")
+
+
+def forget_program(key):
+    """Drop a cached program whose answer was marked incorrect"""
+    try:
+        with _connect() as conn:
+            conn.execute("DELETE FROM programs WHERE key=?", (key,))
+    except sqlite3.Error as e:
+        print(f"⚠️ Program cache write failed: {e}")
+
+
+def generate_program(frames, template, params, model):
+    """Ask the LLM for a pandas program (step generator)"""
+    budget = PROFILE_TOKEN_BUDGET // max(1, len(frames))
+    profile = "\n".join(profile_dataframe(df, name, budget) for name, df in frames.items())
+    prompt = PROGRAM_PROMPT.format(profile=profile, template=template, params=json.dumps(params))
+    code = yield llm(
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0,
+        max_tokens=600
+    )
+    return _FENCE.sub('', code or '').strip()
+
+
+def solve_with_program(question, frames, email, model, ctx=None):
+    """program_steps with blocking LLM calls"""
+    return run_steps(program_steps(question, frames, email, model, ctx))
+
+
+def program_steps(question, frames, email, model, ctx=None):
+    """
+    Answer question by running a generated pandas program over frames.
+    model may be a callable returning the model name, called only when a
+    program has to be generated. Returns the answer or None (the caller
+    then falls back to plain GPT). Step generator (see steps.py).
+    """
+    template, params = question_template(question)
+    key = program_key(frames, template)
+    variables = {"PARAMS": params, "EMAIL": email}
+
+    code = cached_program(key)
+    if code:
+        print("💾 Reusing cached program for this schema + question template")
+    try:
+        if code is None:
+            model = model() if callable(model) else model
+            print(f"🧪 Generating pandas program ({model})...")
+            code = yield from generate_program(frames, template, params, model)
+            print(f"🧪 Program:\n{code}")
+        start = time.time()
+        answer = run_program(code, frames, variables)
+        print(f"✅ Program result in {time.time() - start:.2f}s: {str(answer)[:200]}")
+    except SandboxUnavailable as e:
+        print(f"⚠️ Program mode skipped: {e}")
+        return None
+    except SandboxError as e:
+        print(f"❌ Program failed: {e}")
+        forget_program(key)
+        return None
+    except Exception as e:
+        print(f"❌ Program mode error: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+    store_program(key, code)
+    if ctx is not None:
+        ctx.step_program = key
+    return answer
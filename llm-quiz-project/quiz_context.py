@@ -0,0 +1,42 @@
+import time
+from artifact_store import ArtifactStore
+
+# Stop starting new quizzes after this many seconds (3-minute limit minus a buffer)
+CHAIN_TIME_BUDGET = 170
+
+DEFAULT_SUBMIT_ENDPOINT = "https://tds-llm-analysis.s-anand.net/submit"
+
+
+class QuizContext:
+    """
+    State of one quiz chain, threaded through scrape -> solve -> submit.
+    Nothing chain-specific lives in module globals, so several chains can
+    run in the same process (threads or asyncio) without mixing up answers.
+    """
+
+    def __init__(self, email, secret, start_time=None, time_budget=CHAIN_TIME_BUDGET, artifacts=None):
+        self.email = email
+        self.secret = secret
+        self.start_time = start_time or time.time()
+        self.deadline = self.start_time + time_budget
+        self.artifacts = artifacts or ArtifactStore()
+        self.submit_endpoint = None  # discovered on the quiz page
+        self.history = []  # one dict per submitted step
+        self.step_model = None  # LLM model used for the current step (None if no LLM call)
+        self.step_class = None  # its model_router question class
+        self.model_override = None  # set while a step is retried on a larger model
+        self.step_program = None  # program_solver cache key if the step was answered by a program
+
+    @property
+    def submit_url(self):
+        return self.submit_endpoint or DEFAULT_SUBMIT_ENDPOINT
+
+    def elapsed(self):
+        return time.time() - self.start_time
+
+    def time_left(self):
+        return self.deadline - time.time()
+
+    def record_step(self, step):
+        self.history.append(step)
+        return step
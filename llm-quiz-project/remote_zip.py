@@ -0,0 +1,138 @@
+import os
+import io
+import re
+import zipfile
+
+import requests
+
+from http_client import get_session
+
+# Read members of a remote ZIP with HTTP Range requests instead of
+# downloading the whole archive: the tail (end of central directory and
+# usually the directory itself) comes first, then only the byte ranges
+# zipfile asks for when a member is opened.
+REMOTE_ZIP_ENABLED = os.getenv('REMOTE_ZIP_ENABLED', '1').lower() in ('1', 'true', 'yes')
+REMOTE_ZIP_BLOCK = int(os.getenv('REMOTE_ZIP_BLOCK', str(1024 * 1024)))  # minimum bytes per range request
+TAIL_BYTES = 65536 + 22 + 1024  # max comment + EOCD record, plus room for a small central directory
+
+_CONTENT_RANGE = re.compile(r'bytes (\d+)-(\d+)/(\d+)')
+
+
+class RangeNotSupported(Exception):
+    """The server answered a Range request with the full body"""
+
+    def __init__(self, response):
+        super().__init__(f"server returned {response.status_code} to a Range request")
+        self.response = response
+
+
+class HttpRangeFile(io.RawIOBase):
+    """
+    Seekable read-only file over a URL, read with Range requests.
+    Keeps the last block fetched so zipfile's small header reads don't
+    each cost a request. requests counts the round trips made.
+    """
+
+    def __init__(self, url, session=None, timeout=10, block=REMOTE_ZIP_BLOCK):
+        self.url = url
+        self.session = session or get_session()
+        self.timeout = timeout
+        self.block = block
+        self.requests = 0
+        self.fetched = 0
+        self._pos = 0
+        # The tail request also tells us the total size
+        tail, start, self.size = self._get(f"bytes=-{TAIL_BYTES}")
+        self._blocks = [(start, tail)]
+
+    def _get(self, byte_range):
+        response = self.session.get(self.url, headers={'Range': byte_range, 'Accept-Encoding': 'identity'},
+                                    timeout=self.timeout)
+        response.raise_for_status()
+        if response.status_code != 206:
+            raise RangeNotSupported(response)
+        match = _CONTENT_RANGE.match(response.headers.get('Content-Range', ''))
+        if not match:
+            raise RangeNotSupported(response)
+        self.requests += 1
+        self.fetched += len(response.content)
+        return response.content, int(match.group(1)), int(match.group(3))
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        else:
+            self._pos = self.size + offset
+        return self._pos
+
+    def _cached(self, start, end):
+        for block_start, data in self._blocks:
+            if block_start <= start and end <= block_start + len(data):
+                return data[start - block_start:end - block_start]
+        return None
+
+    def read(self, n=-1):
+        if n is None or n < 0:
+            n = self.size - self._pos
+        end = min(self.size, self._pos + n)
+        if end <= self._pos:
+            return b''
+        data = self._cached(self._pos, end)
+        if data is None:
+            fetch_end = min(self.size, max(end, self._pos + self.block))
+            block, start, _ = self._get(f"bytes={self._pos}-{fetch_end - 1}")
+            # Keep the tail (central directory) plus the latest block
+            self._blocks = self._blocks[:1] + [(start, block)]
+            data = block[self._pos - start:end - start]
+        self._pos += len(data)
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def open_remote_zip(url, artifacts=None, timeout=10):
+    """
+    A ZIP source for url: an HttpRangeFile when the server supports ranges,
+    else the full bytes (stored in artifacts so nothing is downloaded twice).
+    The full download is also the fallback when the Range probe fails.
+    Already downloaded archives are returned from artifacts as bytes.
+    """
+    if artifacts is not None and url in artifacts:
+        return artifacts.content(url)
+    if REMOTE_ZIP_ENABLED:
+        try:
+            remote = HttpRangeFile(url, timeout=timeout)
+            zipfile.ZipFile(remote).close()  # reads the central directory
+            print(f"📡 Range reader for {url}: {remote.size} bytes, directory in {remote.requests} request(s)")
+            return remote
+        except RangeNotSupported as e:
+            print(f"⚠️ {e}, downloading the whole archive")
+            if e.response.status_code == 200:
+                # That response already is the whole archive
+                if artifacts is not None:
+                    artifacts.put(url, e.response.content, e.response.headers)
+                return e.response.content
+        except zipfile.BadZipFile as e:
+            print(f"⚠️ Range reader could not parse {url} ({e}), downloading the whole archive")
+        except requests.RequestException as e:
+            # e.g. 416 for a Range the server dislikes, or a dropped probe: a plain GET may still work
+            print(f"⚠️ Range request for {url} failed ({e}), downloading the whole archive")
+    if artifacts is not None:
+        return artifacts.content(url)
+    response = get_session().get(url, timeout=timeout)
+    response.raise_for_status()
+    return response.content
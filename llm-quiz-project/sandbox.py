@@ -0,0 +1,122 @@
+import os
+import sys
+import json
+import pickle
+import tempfile
+import threading
+import subprocess
+
+# Runs LLM-written pandas programs in a separate Python process with CPU
+# time, memory and wall-clock limits and a minimal environment. The child
+# isolates itself with Linux namespaces (no network, read-only root without
+# the app directory, no capabilities) before the program is checked and
+# run; see sandbox_runner.py. When isolation is unavailable programs are
+# not run at all unless SANDBOX_ISOLATION=0.
+SANDBOX_TIMEOUT = float(os.getenv('SANDBOX_TIMEOUT', '20'))  # wall-clock seconds
+SANDBOX_MEMORY_MB = int(os.getenv('SANDBOX_MEMORY_MB', '1024'))
+SANDBOX_ISOLATION = os.getenv('SANDBOX_ISOLATION', '1').lower() in ('1', 'true', 'yes')
+
+RUNNER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sandbox_runner.py')
+
+
+class SandboxError(RuntimeError):
+    pass
+
+
+class SandboxUnavailable(SandboxError):
+    """OS isolation cannot be set up on this host, so programs are not run"""
+
+
+_unavailable = None  # reason isolation failed ('' once it is known to work), remembered for the process
+_probe_lock = threading.Lock()
+ENV = {'PATH': os.environ.get('PATH', ''), 'OMP_NUM_THREADS': '1', 'OPENBLAS_NUM_THREADS': '1'}
+
+
+def _probe():
+    """Reason the runner cannot isolate itself here, '' if it can"""
+    with tempfile.TemporaryDirectory(prefix='quiz-sandbox-') as workdir:
+        try:
+            proc = subprocess.run([sys.executable, '-I', RUNNER, '--probe', workdir], cwd=workdir, env=ENV,
+                                  capture_output=True, text=True, timeout=SANDBOX_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            return "isolation probe timed out"
+    lines = proc.stdout.strip().splitlines()
+    try:
+        output = json.loads(lines[-1])
+    except (IndexError, ValueError):
+        return f"isolation probe exited with {proc.returncode}: {proc.stderr.strip()[-300:]}"
+    return '' if output.get('isolation') else output.get('error', 'isolation unavailable')
+
+
+def sandbox_available():
+    """
+    Whether programs can run on this host. Probed once per process, so
+    program mode is skipped before an LLM call is spent on a program the
+    sandbox would refuse to run.
+    """
+    global _unavailable
+    if not SANDBOX_ISOLATION:
+        return True
+    if _unavailable is None:
+        with _probe_lock:
+            if _unavailable is None:
+                _unavailable = _probe()
+                if _unavailable:
+                    print(f"⚠️ Program sandbox unavailable: {_unavailable}")
+    return not _unavailable
+
+
+def run_program(code, frames, variables=None, timeout=None, memory_mb=None):
+    """
+    Execute code with dfs (name -> DataFrame), df (the first one), pd, np and
+    the given variables in scope; returns the value it assigns to result.
+    Raises SandboxError if the program fails, times out or hits a limit.
+    """
+    global _unavailable
+    if _unavailable:
+        raise SandboxUnavailable(_unavailable)
+    timeout = timeout or SANDBOX_TIMEOUT
+    memory_mb = SANDBOX_MEMORY_MB if memory_mb is None else memory_mb
+
+    with tempfile.TemporaryDirectory(prefix='quiz-sandbox-') as workdir:
+        with open(os.path.join(workdir, 'input.pkl'), 'wb') as f:
+            pickle.dump({"frames": frames, "variables": variables or {}}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        with open(os.path.join(workdir, 'program.py'), 'w') as f:
+            f.write(code)
+
+        try:
+            proc = subprocess.run(
+                [sys.executable, '-I', RUNNER, workdir, str(int(timeout) + 1), str(memory_mb),
+                 '1' if SANDBOX_ISOLATION else '0'],
+                cwd=workdir,
+                env=ENV,
+                capture_output=True,
+                text=True,
+                timeout=timeout,
+            )
+        except subprocess.TimeoutExpired:
+            raise SandboxError(f"program exceeded {timeout:.0f}s")
+
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        # Killed by a limit (SIGXCPU / MemoryError) or crashed before printing
+        raise SandboxError(f"sandbox exited with {proc.returncode}: {proc.stderr.strip()[-300:]}")
+    try:
+        output = json.loads(lines[-1])
+    except ValueError:
+        raise SandboxError(f"unreadable sandbox output: {lines[-1][:200]}")
+    if output.get('isolation') is False:
+        _unavailable = output['error']
+        raise SandboxUnavailable(_unavailable)
+    if 'error' in output:
+        raise SandboxError(output['error'])
+    return output['result']
+
+
+def _reset_after_fork():
+    global _probe_lock
+    _probe_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
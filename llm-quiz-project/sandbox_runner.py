@@ -0,0 +1,294 @@
+"""
+Child process for sandbox.run_program: python -I sandbox_runner.py <workdir> <cpu_seconds> <memory_mb> <isolate>
+
+Reads input.pkl ({"frames", "variables"}) and program.py from workdir,
+then (isolate=1) confines itself before running anything: new user, mount,
+network, IPC and UTS namespaces, a read-only root holding only the Python
+and system library directories, and no capabilities. The program is
+checked statically, pandas/numpy file I/O is removed, only pandas/numpy
+and a few stdlib modules are importable, and it prints {"result": ...} or
+{"error": ...} as JSON.
+"""
+import os
+import sys
+import ast
+import json
+import pickle
+import builtins
+
+ALLOWED_MODULES = {
+    'pandas', 'numpy', 'math', 're', 'datetime', 'statistics', 'collections',
+    'itertools', 'functools', 'json', 'decimal', 'string',
+}
+BLOCKED_BUILTINS = ('open', 'exec', 'eval', 'compile', 'input', 'breakpoint', 'exit', 'quit',
+                    'getattr', 'setattr', 'delattr', 'vars', 'globals', 'locals', 'memoryview')
+# Attribute names the program may not use: introspection that leads back
+# to builtins/frames, module attributes that lead to os/sys, and file I/O
+BLOCKED_ATTRIBUTES = {
+    'gi_frame', 'gi_code', 'cr_frame', 'cr_code', 'ag_frame', 'ag_code', 'f_globals', 'f_locals',
+    'f_builtins', 'f_back', 'f_code', 'tb_frame', 'tb_next', 'mro',
+    'os', 'sys', 'io', 'subprocess', 'builtins', 'importlib', 'ctypes', 'ctypeslib', 'shutil',
+    'socket', 'pathlib', 'posix', 'pickle', 'marshal', 'tempfile', 'mmap', 'signal', 'resource',
+    'tofile', 'dump', 'dumps', 'fromfile', 'fromregex', 'memmap', 'load', 'loadtxt', 'genfromtxt',
+    'save', 'savez', 'savez_compressed', 'savetxt', 'ExcelFile', 'ExcelWriter', 'HDFStore',
+}
+# DataFrame/Series writers: allowed only to return a string (no path or buffer)
+TEXT_WRITERS = ('to_csv', 'to_json', 'to_string', 'to_html', 'to_markdown', 'to_latex', 'to_xml')
+FILE_WRITERS = ('to_pickle', 'to_parquet', 'to_feather', 'to_hdf', 'to_sql', 'to_excel', 'to_stata',
+                'to_orc', 'to_clipboard', 'to_iceberg', 'to_xarray')
+NUMPY_IO = ('load', 'loadtxt', 'genfromtxt', 'fromfile', 'fromregex', 'memmap', 'save', 'savez',
+            'savez_compressed', 'savetxt', 'DataSource')
+
+# Linux constants for _confine
+CLONE_NEWNS, CLONE_NEWUTS, CLONE_NEWIPC = 0x00020000, 0x04000000, 0x08000000
+CLONE_NEWUSER, CLONE_NEWNET = 0x10000000, 0x40000000
+MS_RDONLY, MS_NOSUID, MS_NODEV, MS_NOEXEC = 1, 2, 4, 8
+MS_REMOUNT, MS_BIND, MS_REC, MS_PRIVATE = 32, 4096, 16384, 1 << 18
+MS_NOATIME, MS_NODIRATIME, MS_RELATIME = 1024, 2048, 1 << 21
+PR_CAPBSET_DROP, PR_SET_NO_NEW_PRIVS = 24, 38
+SYSTEM_LIBRARIES = ('/lib', '/lib64', '/usr/lib', '/usr/lib64', '/etc/ld.so.cache')
+
+
+class IsolationError(OSError):
+    pass
+
+
+def _limit(cpu_seconds, memory_mb):
+    try:
+        import resource
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+        if memory_mb > 0:
+            limit = memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError):
+        pass
+
+
+def _libc():
+    import ctypes
+    libc = ctypes.CDLL(None, use_errno=True)
+
+    def call(name, *args):
+        if getattr(libc, name)(*args) != 0:
+            errno = ctypes.get_errno()
+            raise IsolationError(errno, f"{name}: {os.strerror(errno)}")
+    return call
+
+
+def _mount_flags(path):
+    # Flags a bind mount inherits and must keep when remounted read-only in a user namespace
+    flags = os.statvfs(path).f_flag
+    mapped = flags & (MS_NOSUID | MS_NODEV | MS_NOEXEC | MS_NOATIME | MS_NODIRATIME)
+    return mapped | (MS_RELATIME if flags & 4096 else 0)
+
+
+def _read_only_paths():
+    """Existing directories the program needs, outer ones only, never the app directory"""
+    app_dir = os.path.dirname(os.path.realpath(__file__))
+    paths = [p for p in sys.path if p and os.path.isdir(p)]
+    paths += [p for p in SYSTEM_LIBRARIES if os.path.exists(p) and not os.path.islink(p)]
+    kept = []
+    for path in sorted(set(os.path.realpath(p) for p in paths)):
+        if path == app_dir or app_dir.startswith(path + '/'):
+            continue  # e.g. an editable install putting the app on sys.path
+        if not any(path.startswith(k + '/') for k in kept):
+            kept.append(path)
+    return kept
+
+
+def _confine(workdir):
+    """
+    Move this (still single-threaded) process into fresh namespaces with an
+    empty read-only root, no network and no capabilities
+    """
+    if not sys.platform.startswith('linux'):
+        raise IsolationError("namespaces need Linux")
+    call = _libc()
+    uid, gid = os.getuid(), os.getgid()
+    call('unshare', CLONE_NEWUSER | CLONE_NEWNS | CLONE_NEWNET | CLONE_NEWIPC | CLONE_NEWUTS)
+    for name, value in (('setgroups', 'deny'), ('uid_map', f'0 {uid} 1'), ('gid_map', f'0 {gid} 1')):
+        with open(f'/proc/self/{name}', 'w') as f:
+            f.write(value)
+
+    call('mount', None, b'/', None, MS_REC | MS_PRIVATE, None)
+    root = os.path.join(workdir, 'root')
+    os.mkdir(root)
+    call('mount', b'tmpfs', root.encode(), b'tmpfs', MS_NOSUID | MS_NODEV, b'size=64k,mode=0755')
+    for path in _read_only_paths():
+        target = root + path
+        if os.path.isdir(path):
+            os.makedirs(target)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            open(target, 'w').close()
+        call('mount', path.encode(), target.encode(), None, MS_BIND | MS_REC, None)
+        call('mount', None, target.encode(), None,
+             MS_REMOUNT | MS_BIND | MS_RDONLY | _mount_flags(path), None)
+    # Distro symlinks such as /lib -> usr/lib
+    for path in SYSTEM_LIBRARIES:
+        if os.path.islink(path):
+            os.symlink(os.readlink(path), root + path)
+    call('mount', None, root.encode(), None, MS_REMOUNT | MS_RDONLY | MS_NOSUID | MS_NODEV, None)
+
+    os.chdir(root)
+    call('chroot', b'.')
+    os.chdir('/')
+    os.closerange(3, 1024)
+
+    # Drop every capability, for this process and anything it could exec
+    import ctypes
+    for cap in range(64):
+        try:
+            call('prctl', PR_CAPBSET_DROP, cap, 0, 0, 0)
+        except IsolationError:
+            break  # past the last capability this kernel knows
+    header = (ctypes.c_uint32 * 2)(0x20080522, 0)  # _LINUX_CAPABILITY_VERSION_3, this process
+    data = (ctypes.c_uint32 * 6)()
+    call('capset', header, data)
+    call('prctl', PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0)
+
+
+def check_program(code):
+    """SyntaxError/ValueError if code uses names the sandbox does not allow"""
+    tree = ast.parse(code, 'program.py')
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Attribute):
+            if node.attr.startswith('_') or node.attr in BLOCKED_ATTRIBUTES or node.attr in FILE_WRITERS \
+                    or node.attr.startswith('read_'):
+                raise ValueError(f"attribute {node.attr!r} is not allowed")
+        elif isinstance(node, ast.Name):
+            if node.id.startswith('__') or node.id in BLOCKED_BUILTINS:
+                raise ValueError(f"name {node.id!r} is not allowed")
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            names = [node.module or ''] if isinstance(node, ast.ImportFrom) else [a.name for a in node.names]
+            if getattr(node, 'level', 0) or any(n.split('.')[0] not in ALLOWED_MODULES for n in names):
+                raise ValueError(f"import of {', '.join(names)!r} is not allowed")
+            if isinstance(node, ast.ImportFrom) and any(
+                    a.name.startswith('_') or a.name in BLOCKED_ATTRIBUTES or a.name.startswith('read_')
+                    for a in node.names):
+                raise ValueError(f"import from {node.module!r} is not allowed")
+
+
+def _blocked(name):
+    def blocked(*args, **kwargs):
+        raise PermissionError(f"{name} is not available in the sandbox")
+    return blocked
+
+
+def _text_only(name, method):
+    def writer(self, *args, **kwargs):
+        target = args[0] if args else kwargs.get('path_or_buf', kwargs.get('buf'))
+        if target is not None:
+            raise PermissionError(f"{name} can only return a string in the sandbox")
+        return method(self, *args, **kwargs)
+    return writer
+
+
+def _strip_io(pd, np):
+    """Remove pandas/numpy entry points that read or write files"""
+    for name in dir(pd):
+        if name.startswith('read_') or name in ('to_pickle', 'ExcelFile', 'ExcelWriter', 'HDFStore'):
+            setattr(pd, name, _blocked(f"pd.{name}"))
+    for cls in (pd.DataFrame, pd.Series):
+        for name in TEXT_WRITERS:
+            if hasattr(cls, name):
+                setattr(cls, name, _text_only(name, getattr(cls, name)))
+        for name in FILE_WRITERS:
+            if hasattr(cls, name):
+                setattr(cls, name, _blocked(name))
+    for name in NUMPY_IO:
+        if hasattr(np, name):
+            setattr(np, name, _blocked(f"np.{name}"))
+
+
+def _safe_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level or name.split('.')[0] not in ALLOWED_MODULES:
+        raise ImportError(f"import of {name!r} is not allowed")
+    return builtins.__import__(name, globals, locals, fromlist, level)
+
+
+def _plain(value):
+    """Turn pandas/numpy results into JSON-friendly Python values"""
+    import numpy as np
+    import pandas as pd
+    if isinstance(value, pd.DataFrame):
+        return json.loads(value.to_json(orient='records', date_format='iso'))
+    if isinstance(value, pd.Series):
+        if len(value) == 1:
+            return _plain(value.iloc[0])
+        return json.loads(value.to_json(date_format='iso'))
+    if isinstance(value, np.ndarray):
+        return [_plain(v) for v in value.tolist()]
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _plain(v) for k, v in value.items()}
+    return value
+
+
+def main(workdir, cpu_seconds, memory_mb, isolate='1'):
+    # Inputs are read before confinement: workdir is not visible afterwards
+    with open(f"{workdir}/input.pkl", 'rb') as f:
+        payload = f.read()
+    with open(f"{workdir}/program.py") as f:
+        code = f.read()
+
+    if isolate == '1':
+        try:
+            _confine(workdir)
+        except (OSError, AttributeError) as e:
+            print(json.dumps({"error": f"isolation unavailable: {e}", "isolation": False}))
+            return
+    _limit(int(cpu_seconds), int(memory_mb))
+
+    try:
+        check_program(code)
+    except (SyntaxError, ValueError) as e:
+        print(json.dumps({"error": f"rejected: {e}"}))
+        return
+
+    import numpy as np
+    import pandas as pd
+    data = pickle.loads(payload)
+    _strip_io(pd, np)
+
+    safe_builtins = {k: v for k, v in vars(builtins).items() if k not in BLOCKED_BUILTINS}
+    safe_builtins['__import__'] = _safe_import
+    frames = data['frames']
+    scope = {
+        '__builtins__': safe_builtins,
+        'pd': pd,
+        'np': np,
+        'dfs': frames,
+        'df': next(iter(frames.values()), None),
+    }
+    scope.update(data['variables'])
+
+    try:
+        exec(compile(code, 'program.py', 'exec'), scope)
+        if 'result' not in scope:
+            raise NameError("program did not assign 'result'")
+        print(json.dumps({"result": _plain(scope['result'])}, default=str))
+    except Exception as e:
+        print(json.dumps({"error": f"{type(e).__name__}: {e}"}))
+
+
+def probe(workdir):
+    """Confine and exit: tells the parent whether isolation works on this host"""
+    try:
+        _confine(workdir)
+    except (OSError, AttributeError) as e:
+        print(json.dumps({"error": f"isolation unavailable: {e}", "isolation": False}))
+        return
+    print(json.dumps({"isolation": True}))
+
+
+if __name__ == '__main__':
+    if sys.argv[1] == '--probe':
+        probe(sys.argv[2])
+    else:
+        main(*sys.argv[1:5])
@@ -0,0 +1,74 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Seeded SQLite images (Connection.serialize()) plus their schema summary,
+# keyed by a hash of the SQL dump that produced them. A later question on
+# the same dump deserializes the image instead of re-running the script.
+SQLITE_CACHE_MAX_MB = int(os.getenv('SQLITE_CACHE_MAX_MB', '256'))  # 0 disables the cache
+
+
+def dump_key(sql_text):
+    data = sql_text.encode('utf-8') if isinstance(sql_text, str) else sql_text
+    return hashlib.sha256(data).hexdigest()
+
+
+class SeededDatabaseCache:
+    """Memory-bounded LRU of {dump hash: (database image, schema summary)}"""
+
+    def __init__(self, max_bytes=SQLITE_CACHE_MAX_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """(image, schema) for key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, image, schema):
+        size = len(image)
+        if size > self.max_bytes:
+            return False
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            self._entries[key] = (image, schema)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "hits": self.hits,
+                    "misses": self.misses, "evictions": self.evictions}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_seeded_cache():
+    """Process-wide cache (None when SQLITE_CACHE_MAX_MB=0)"""
+    global _cache
+    if SQLITE_CACHE_MAX_MB <= 0:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = SeededDatabaseCache()
+        return _cache
@@ -1,41 +1,324 @@
 
+import io
+import re
 import sqlite3
-import openai
-from dotenv import load_dotenv
+import time
+from steps import llm, run_steps
+from sqlite_cache import get_seeded_cache, dump_key
+import metrics
 import os
 
-def process_sqlite_quiz(sql_file_content, question):
+# Bulk loading: statements are read from the dump line by line and run in
+# batches of about this many bytes inside one transaction
+SQLITE_LOAD_BATCH_BYTES = int(os.getenv('SQLITE_LOAD_BATCH_BYTES', str(4 * 1024 * 1024)))
+# Pragmas for the seeding phase only (nothing to recover if loading fails)
+LOAD_PRAGMAS = {'journal_mode': 'OFF', 'synchronous': 'OFF', 'temp_store': 'MEMORY', 'cache_size': '-262144'}
+# The dump's own transaction statements; the loader manages transactions itself
+TRANSACTION_LINE = re.compile(r'^\s*(BEGIN(\s+TRANSACTION)?|COMMIT|END\s+TRANSACTION)\s*;\s*$', re.IGNORECASE)
+# Only plain indexes are deferred: a UNIQUE index decides what INSERT OR IGNORE /
+# OR REPLACE / ON CONFLICT do with later rows, so it must exist before them
+CREATE_INDEX = re.compile(r'^\s*CREATE\s+INDEX\b', re.IGNORECASE)
+
+# Guards for LLM-written queries: wall-clock limit (also capped by the chain
+# deadline) and a budget of SQLite VM instructions, checked every
+# PROGRESS_INTERVAL instructions by a progress handler
+SQLITE_QUERY_TIMEOUT = float(os.getenv('SQLITE_QUERY_TIMEOUT', '30'))
+SQLITE_QUERY_MAX_STEPS = int(os.getenv('SQLITE_QUERY_MAX_STEPS', '500000000'))
+SQLITE_AUTOINDEX_MIN_ROWS = int(os.getenv('SQLITE_AUTOINDEX_MIN_ROWS', '50000'))  # index full scans of tables this big
+DEADLINE_MARGIN = 5  # seconds left on the chain for submitting
+PROGRESS_INTERVAL = 10000
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS (\w+))?( USING .*)?$')
+# Predicates the auto-index can use: <column> <op> <anything> (or reversed) in WHERE/ON clauses
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+PREDICATE_CLAUSE = re.compile(
+    r'\b(?:WHERE|ON)\b(.*?)(?=\b(?:GROUP\s+BY|ORDER\s+BY|HAVING|LIMIT|UNION|EXCEPT|INTERSECT|WINDOW|'
+    r'SELECT|FROM|JOIN|LEFT|RIGHT|INNER|CROSS|FULL|NATURAL|ON|WHERE)\b|;|$)', re.IGNORECASE | re.DOTALL)
+_OPERAND = r'((?:"?\w+"?\.)?"?\w+"?)'
+COMPARISON = re.compile(rf'{_OPERAND}\s*(==|=|<=|>=|<|>|\bIN\b|\bBETWEEN\b)\s*\(?\s*{_OPERAND}?', re.IGNORECASE)
+EQUALITY_OPERATORS = ('=', '==', 'IN')
+# FROM clauses and their items (`t`, `t a`, `t AS a`, comma or JOIN separated) for alias lookup
+FROM_CLAUSE = re.compile(
+    r'\bFROM\b(.*?)(?=\b(?:WHERE|GROUP\s+BY|ORDER\s+BY|HAVING|LIMIT|UNION|EXCEPT|INTERSECT|WINDOW)\b|[;()]|$)',
+    re.IGNORECASE | re.DOTALL)
+FROM_ITEM = re.compile(
+    r'(?:^|,|\bJOIN\b)\s*"?(\w+)"?(?:\s+(?:AS\s+)?"?'
+    r'(?!(?:ON|USING|NATURAL|LEFT|RIGHT|INNER|OUTER|CROSS|FULL|JOIN)\b)(\w+)"?)?', re.IGNORECASE)
+AUTOMATIC_INDEX = re.compile(r'^SEARCH (?:TABLE )?(\w+)(?: AS \w+)? USING AUTOMATIC (?:COVERING |PARTIAL )*INDEX \((\w+)')
+
+
+class QueryTimeout(TimeoutError):
+    pass
+
+def _dump_lines(dump):
+    """Lines of a SQL dump given as text or bytes, decoded as they are read"""
+    if isinstance(dump, str):
+        return io.StringIO(dump)
+    return io.TextIOWrapper(io.BytesIO(dump), encoding='utf-8', errors='replace')
+
+
+def bulk_load(conn, dump):
+    """
+    Seed conn from a SQL dump: each batch of statements runs as one
+    transaction with journaling and syncing off, and non-unique CREATE
+    INDEX statements are held back until the data is in. Returns load stats.
+    """
+    start = time.time()
+    previous = {name: conn.execute(f"PRAGMA {name}").fetchone()[0] for name in LOAD_PRAGMAS}
+    for name, value in LOAD_PRAGMAS.items():
+        conn.execute(f"PRAGMA {name}={value}")
+
+    changes = conn.total_changes
+    indexes = []
+    batch, batch_bytes, index_stmt = [], 0, None
+    for line in _dump_lines(dump):
+        if index_stmt is not None or CREATE_INDEX.match(line):
+            index_stmt = (index_stmt or '') + line
+            if sqlite3.complete_statement(index_stmt):
+                indexes.append(index_stmt)
+                index_stmt = None
+            continue
+        if TRANSACTION_LINE.match(line):
+            continue
+        batch.append(line)
+        batch_bytes += len(line)
+        if batch_bytes >= SQLITE_LOAD_BATCH_BYTES and line.rstrip().endswith(';'):
+            script = ''.join(batch)
+            if sqlite3.complete_statement(script):
+                conn.executescript(f"BEGIN;\n{script}\nCOMMIT;")
+                batch, batch_bytes = [], 0
+    if batch:
+        conn.executescript(f"BEGIN;\n{''.join(batch)}\nCOMMIT;")
+    rows = conn.total_changes - changes
+    load_seconds = time.time() - start
+
+    index_start = time.time()
+    if indexes:
+        conn.executescript("BEGIN;\n" + "\n".join(indexes) + "\nCOMMIT;")
+    index_seconds = time.time() - index_start
+
+    for name, value in previous.items():
+        conn.execute(f"PRAGMA {name}={value}")
+    stats = {
+        "rows": rows,
+        "load_seconds": round(load_seconds, 3),
+        "index_seconds": round(index_seconds, 3),
+        "indexes": len(indexes),
+        "rows_per_second": round(rows / load_seconds) if load_seconds > 0 else rows,
+    }
+    print(f"📥 Loaded {rows} rows in {load_seconds:.2f}s ({stats['rows_per_second']} rows/s), "
+          f"{len(indexes)} indexes in {index_seconds:.2f}s")
+    return stats
+
+
+def schema_summary(conn):
+    """One line per table with its column names"""
+    cur = conn.cursor()
+    cur.execute("SELECT name FROM sqlite_master WHERE type='table';")
+    tables = cur.fetchall()
+    schema_info = ""
+    for t in tables:
+        table_name = t[0]
+        cur.execute(f"PRAGMA table_info({table_name})")
+        cols = cur.fetchall()
+        col_names = [c[1] for c in cols]
+        schema_info += f"Table {table_name}: {', '.join(col_names)}\n"
+    return schema_info
+
+
+def seeded_database(sql_file_content):
+    """
+    (connection, schema summary, cache key) for an in-memory DB seeded with the dump.
+    The seeded image is cached by dump hash, so repeat dumps skip executescript.
+    """
+    cache = get_seeded_cache()
+    key = dump_key(sql_file_content) if cache is not None else None
+    entry = cache.get(key) if cache is not None else None
+    # The async engine may resume the solver on another pool thread after the LLM call
+    conn = sqlite3.connect(':memory:', check_same_thread=False)
+    if entry is not None:
+        start = time.time()
+        image, schema_info = entry
+        conn.deserialize(image)
+        print(f"💾 Seeded DB from cache ({len(image) / 1024:.0f} KB) in {(time.time() - start) * 1000:.1f} ms")
+        return conn, schema_info, key
+
+    start = time.time()
+    bulk_load(conn, sql_file_content)
+    schema_info = schema_summary(conn)
+    print(f"🗄️ Seeded DB from dump in {(time.time() - start) * 1000:.1f} ms")
+    if cache is not None:
+        cache.put(key, conn.serialize(), schema_info)
+    return conn, schema_info, key
+
+
+def query_plan(conn, sql):
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+def _table_names(conn, sql):
+    """{name or alias used in sql: table name} for the tables in the DB"""
+    tables = {r[0].lower(): r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    names = dict(tables)
+    for clause in FROM_CLAUSE.finditer(STRING_LITERAL.sub('?', sql)):
+        for table, alias in FROM_ITEM.findall(clause.group(1).strip()):
+            if alias and table.lower() in tables:
+                names.setdefault(alias.lower(), tables[table.lower()])
+    return names
+
+
+def _estimated_rows(conn, table):
+    try:
+        # O(log n) and exact unless rows were deleted
+        return conn.execute(f'SELECT MAX(rowid) FROM "{table}"').fetchone()[0] or 0
+    except sqlite3.OperationalError:  # WITHOUT ROWID table
+        return conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+
+
+def _predicate_columns(sql):
+    """
+    [(qualifier or None, column, operator)] compared against something in the
+    WHERE/ON clauses of sql, in the order they appear (string literals ignored)
+    """
+    text = STRING_LITERAL.sub('?', sql)
+    found = []
+    for clause in PREDICATE_CLAUSE.finditer(text):
+        for left, op, right in COMPARISON.findall(clause.group(1)):
+            for side in (left, right):
+                qualifier, _, column = side.replace('"', '').rpartition('.')
+                if column and not column[0].isdigit():
+                    found.append((qualifier.lower() or None, column, op.upper()))
+    return found
+
+
+def _filter_column(conn, sql, table, names):
+    """
+    The column of table the query's WHERE/ON predicates filter on (equality
+    before ranges, then in predicate order) that no index leads yet, or None
+    """
+    qualifiers = {n for n, t in names.items() if t == table}
+    columns = {r[1].lower(): r[1] for r in conn.execute(f'PRAGMA table_info("{table}")')}
+    indexed = set()  # columns that already lead an index
+    for index in conn.execute(f'PRAGMA index_list("{table}")').fetchall():
+        info = conn.execute(f'PRAGMA index_info("{index[1]}")').fetchall()
+        if info:
+            indexed.add(info[0][2].lower())
+    candidates = [
+        (op not in EQUALITY_OPERATORS, columns[column.lower()])
+        for qualifier, column, op in _predicate_columns(sql)
+        if column.lower() in columns and column.lower() not in indexed
+        and (qualifier is None or qualifier in qualifiers)
+    ]
+    # Stable sort: equality predicates first, each group in predicate order
+    return sorted(candidates, key=lambda c: c[0])[0][1] if candidates else None
+
+
+def plan_scans(conn, sql, plan):
+    """
+    Full scans in plan (covering-index scans included) as [(table, estimated rows)], plus [(table, column)]
+    indexes worth creating: columns behind SQLite's automatic (per-query)
+    indexes and filter columns of big fully scanned tables.
+    """
+    names = _table_names(conn, sql)
+    tables = set(names.values())
+    scans, wanted = [], []
+    for detail in plan:
+        match = FULL_SCAN.match(detail)
+        if match:
+            table = names.get((match.group(2) or match.group(1)).lower())
+            if table not in tables:
+                continue  # a subquery, CTE or alias we could not resolve: nothing to size or index
+            rows = _estimated_rows(conn, table)
+            scans.append((table, rows))
+            if rows >= SQLITE_AUTOINDEX_MIN_ROWS and not match.group(3):
+                column = _filter_column(conn, sql, table, names)
+                if column:
+                    wanted.append((table, column))
+            continue
+        match = AUTOMATIC_INDEX.match(detail)
+        if match:
+            table = names.get(match.group(1).lower())
+            if table in tables and _estimated_rows(conn, table) >= SQLITE_AUTOINDEX_MIN_ROWS:
+                wanted.append((table, match.group(2)))
+    return scans, list(dict.fromkeys(wanted))
+
+
+def guarded_query(conn, sql, deadline=None):
+    """
+    Run an LLM-written query and return (first row, indexes created).
+    EXPLAIN QUERY PLAN runs first; big tables it would fully scan get an
+    index on the filtered column. Everything, index builds included, runs
+    under one guard: the query is aborted (QueryTimeout) past
+    SQLITE_QUERY_TIMEOUT, the chain deadline or SQLITE_QUERY_MAX_STEPS, and
+    an index build may use at most half of the time left.
+    """
+    start = time.time()
+    stop_at = start + SQLITE_QUERY_TIMEOUT
+    if deadline:
+        stop_at = min(stop_at, deadline - DEADLINE_MARGIN)
+    ticks = [0]
+    phase_stop = [stop_at]
+
+    def progress():
+        ticks[0] += 1
+        return time.time() > phase_stop[0] or ticks[0] * PROGRESS_INTERVAL > SQLITE_QUERY_MAX_STEPS
+
+    conn.set_progress_handler(progress, PROGRESS_INTERVAL)
+    plan, scans, created = [], [], []
+    query_start = time.time()
+    try:
+        plan = query_plan(conn, sql)
+        scans, wanted = plan_scans(conn, sql, plan)
+        for table, column in wanted:
+            name = f"auto_{table}_{column}"
+            index_start = time.time()
+            phase_stop[0] = index_start + max(0, stop_at - index_start) / 2
+            try:
+                conn.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ("{column}")')
+            except sqlite3.OperationalError as e:
+                if 'interrupt' not in str(e).lower():
+                    raise
+                print(f"⚠️ Index {name} not built within its budget, querying without it")
+                break
+            created.append(name)
+            print(f"🗂️ Created index {name} in {time.time() - index_start:.2f}s")
+        phase_stop[0] = stop_at
+        if created:
+            plan = query_plan(conn, sql)
+            scans, _ = plan_scans(conn, sql, plan)
+
+        query_start = time.time()
+        row = conn.execute(sql).fetchone()
+    except sqlite3.OperationalError as e:
+        if 'interrupt' not in str(e).lower():
+            raise
+        raise QueryTimeout(f"query aborted after {time.time() - query_start:.1f}s, "
+                           f"~{ticks[0] * PROGRESS_INTERVAL} VM steps")
+    finally:
+        conn.set_progress_handler(None, 0)
+        elapsed = time.time() - query_start
+        metrics.observe('sqlite.query', elapsed)
+        print(f"🔎 Plan: {' | '.join(plan)}")
+        print(f"🔎 Query ran {elapsed * 1000:.1f} ms, ~{ticks[0] * PROGRESS_INTERVAL} VM steps, "
+              f"full scans: {', '.join(f'{t} (~{n} rows)' for t, n in scans) or 'none'}")
+    return row, created
+
+
+def process_sqlite_quiz(sql_file_content, question, model="gpt-4o-mini", deadline=None):
+    """sqlite_quiz_steps with blocking LLM calls"""
+    return run_steps(sqlite_quiz_steps(sql_file_content, question, model, deadline))
+
+
+def sqlite_quiz_steps(sql_file_content, question, model="gpt-4o-mini", deadline=None):
     """
     1. Create in-memory DB.
     2. Execute sql_file_content (schema + data).
-    3. Ask GPT to generate SELECT query for 'question'.
-    4. Execute query and return result.
+    3. Ask GPT to generate SELECT query for 'question' (yielded, see steps.py).
+    4. Execute query (guarded, aborted near deadline) and return result.
     """
-    client = openai.OpenAI(
-        api_key=os.environ.get("AIPIPE_API_KEY"),
-        base_url="https://aipipe.org/openai/v1"
-    )
-
     try:
-        # 1. Setup DB
-        conn = sqlite3.connect(':memory:')
-        cur = conn.cursor()
-        
-        # 2. Seed DB
-        cur.executescript(sql_file_content)
-        conn.commit()
+        # 1-2. Seeded DB (from the cache when this dump was seen before)
+        conn, schema_info, key = seeded_database(sql_file_content)
         
-        # Inspection (Optional: Get table schema to help GPT)
-        cur.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tables = cur.fetchall()
-        schema_info = ""
-        for t in tables:
-            table_name = t[0]
-            cur.execute(f"PRAGMA table_info({table_name})")
-            cols = cur.fetchall()
-            col_names = [c[1] for c in cols]
-            schema_info += f"Table {table_name}: {', '.join(col_names)}\n"
-            
         print(f"🗄️ Database Schema:\n{schema_info}")
         
         # 3. GPT generate SQL
@@ -51,20 +334,25 @@ EXAMPLE:
 Question: Count users > 18
 SQL: SELECT COUNT(*) FROM users WHERE age > 18;
 """
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}]
-        )
+        sql_query = (yield llm(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0
+        )).strip()
         
-        sql_query = response.choices[0].message.content.strip()
         # Clean markdown if present
         sql_query = sql_query.replace('```sql', '').replace('```', '').strip()
         
         print(f"🤖 Generated SQL: {sql_query}")
         
         # 4. Execute
-        cur.execute(sql_query)
-        result = cur.fetchone()[0]
+        changes = conn.total_changes
+        row, created = guarded_query(conn, sql_query, deadline)
+        result = row[0]
+        cache = get_seeded_cache()
+        if created and cache is not None and conn.total_changes == changes:
+            # Keep the new indexes for later questions on this dump
+            cache.put(key, conn.serialize(), schema_info)
         
         print(f"✅ SQL Result: {result}")
         return result
@@ -0,0 +1,45 @@
+from llm_client import get_client
+from llm_stream import complete
+
+# Solvers that wait on the network are written once, as generators: they
+# yield an effect tuple (kind, *args) for every call they need and are sent
+# its result (or have its exception thrown in at the yield). run_steps
+# performs the effects with blocking calls for the Flask workers;
+# async_engine.drive awaits them on the event loop.
+#   ('llm', params)              chat completion -> text
+#   ('fetch', urls)              make sure urls are in the artifact store
+#   ('transcribe', audio_url)    Whisper transcription -> text
+#   ('submit', quiz_url, answer) POST the answer -> result dict
+
+
+def llm(**params):
+    """Effect for one chat completion (stream_completion arguments when early_stop is given)"""
+    return ('llm', params)
+
+
+def advance(resume, value):
+    """Resume a step generator: (True, its return value) once it finished, else (False, next effect)"""
+    try:
+        return False, resume(value)
+    except StopIteration as done:
+        return True, done.value
+
+
+def run_steps(steps, **effects):
+    """
+    Run a step generator on this thread and return its return value.
+    effects maps an effect kind to the function performing it; LLM calls
+    and fetches are built in (fetches are left to the artifact store).
+    """
+    effects.setdefault('llm', lambda params: complete(get_client(), params))
+    effects.setdefault('fetch', lambda urls: None)
+    resume, value = steps.send, None
+    while True:
+        finished, result = advance(resume, value)
+        if finished:
+            return result
+        kind, *args = result
+        try:
+            resume, value = steps.send, effects[kind](*args)
+        except Exception as e:
+            resume, value = steps.throw, e
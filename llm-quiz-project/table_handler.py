@@ -1,39 +1,82 @@
 
 import pandas as pd
-import openai
+from steps import llm, run_steps
 import json
 import re
-from dotenv import load_dotenv
+import time
+import difflib
+from io import BytesIO
 import os
+from cpu_pool import run_cpu
+import metrics
 
-def process_table_quiz(html_content, question):
+# Verbs -> operation for the local intent parser (checked before asking the LLM)
+OPERATION_WORDS = {
+    'SUM': ('sum', 'total', 'add up', 'combined', 'altogether'),
+    'MEAN': ('average', 'mean', 'avg'),
+    'COUNT': ('how many', 'count', 'number of'),
+    'MAX': ('maximum', 'max', 'highest', 'largest', 'biggest', 'greatest'),
+    'MIN': ('minimum', 'min', 'lowest', 'smallest'),
+}
+# Below this the question is sent to the LLM as before
+TABLE_INTENT_MIN_CONFIDENCE = float(os.getenv('TABLE_INTENT_MIN_CONFIDENCE', '0.75'))
+TOKEN_MATCH_RATIO = 0.85  # difflib ratio for two words to count as the same (plurals, typos)
+
+
+def _tokens(text):
+    return [t[:-1] if len(t) > 3 and t.endswith('s') else t for t in re.findall(r'[a-z0-9]+', str(text).lower())]
+
+
+def _operations(question):
+    """Operations whose verbs appear in the question, in order of first appearance"""
+    text = ' ' + ' '.join(re.findall(r'[a-z0-9]+', question.lower())) + ' '
+    found = {}
+    for op, words in OPERATION_WORDS.items():
+        positions = [text.find(f' {w} ') for w in words if f' {w} ' in text]
+        if positions:
+            found[op] = min(positions)
+    return sorted(found, key=found.get)
+
+
+def _column_score(column_tokens, question_tokens):
+    """Share of the column name's words found (or nearly found) in the question"""
+    if not column_tokens:
+        return 0.0
+    matched = 0
+    for token in column_tokens:
+        if token in question_tokens or any(
+                difflib.SequenceMatcher(None, token, q).ratio() >= TOKEN_MATCH_RATIO for q in question_tokens):
+            matched += 1
+    return matched / len(column_tokens)
+
+
+def parse_intent(question, columns):
     """
-    Extracts table from HTML.
-    Uses GPT to determine which column to aggregate and how (SUM/COUNT/MEAN).
-    Performs aggregation using Pandas.
+    Local guess at (column, operation, confidence) for an aggregation question.
+    Confidence is 0 when no verb or column matches; ambiguous verbs or
+    columns with equal scores halve it.
     """
-    client = openai.OpenAI(
-        api_key=os.environ.get("AIPIPE_API_KEY"),
-        base_url="https://aipipe.org/openai/v1"
+    ops = _operations(question)
+    question_tokens = set(_tokens(question))
+    scored = sorted(
+        ((_column_score(_tokens(c), question_tokens), len(_tokens(c)), c) for c in columns),
+        key=lambda item: (item[0], item[1]), reverse=True
     )
+    if not ops or not scored or scored[0][0] == 0:
+        return None, (ops[0] if ops else None), 0.0
 
-    try:
-        # Use lxml flavor if installed, else default
-        try:
-            tables = pd.read_html(html_content)
-        except Exception as e:
-            print(f"⚠️ Pandas read_html failed: {e}")
-            return None
-            
-        if not tables:
-            print("❌ No tables found in HTML")
-            return None
-            
-        df = tables[0]
-        print(f"📋 Table Found: {df.shape} - Columns: {list(df.columns)}")
-        
-        # Ask GPT for instruction
-        prompt = f"""
+    score, size, column = scored[0]
+    confidence = score
+    if len(ops) > 1:
+        confidence /= 2
+    if len(scored) > 1 and (scored[1][0], scored[1][1]) == (score, size):
+        confidence /= 2
+    return column, ops[0], confidence
+
+
+def llm_intent(df, question, model):
+    """Ask the LLM which column and operation the question wants (step generator)"""
+    prompt = f"""
 You are a Data Analyst.
 I have a DataFrame with columns: {list(df.columns)}
 The user asks: "{question}"
@@ -48,64 +91,275 @@ Return JSON ONLY:
   "operation": "SUM"
 }}
 """
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        
-        content = response.choices[0].message.content.strip()
-        # content clean
-        content = re.sub(r'```json\n?', '', content)
-        content = re.sub(r'```', '', content).strip()
-        
-        cmd = json.loads(content)
-        col_name = cmd.get('column')
-        op = cmd.get('operation', 'SUM').upper()
-        
-        print(f"🤖 GPT Instruction: Op={op}, Col={col_name}")
-        
-        # Process
-        # Fuzzy match column if not exact
-        if col_name not in df.columns:
-            # Simple fuzzy
-            match = None
-            for c in df.columns:
-                if col_name.lower() in c.lower() or c.lower() in col_name.lower():
-                    match = c
-                    break
-            if match:
-                col_name = match
-                
+    content = (yield llm(
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0
+    )).strip()
+
+    # content clean
+    content = re.sub(r'```json\n?', '', content)
+    content = re.sub(r'```', '', content).strip()
+
+    cmd = json.loads(content)
+    col_name = cmd.get('column')
+    op = cmd.get('operation', 'SUM').upper()
+    print(f"🤖 GPT Instruction: Op={op}, Col={col_name}")
+
+    # Fuzzy match column if not exact
+    if col_name not in df.columns:
+        # Simple fuzzy
+        for c in df.columns:
+            if col_name.lower() in str(c).lower() or str(c).lower() in col_name.lower():
+                col_name = c
+                break
+    return col_name, op
+
+
+# Numbers as printed in tables: 1,234  -5.5  $1,234.50  (£12.00)  ₹ 300
+NUMBER_PATTERN = r'\(?\s*-?\s*[$€£¥₹]?\s*-?\d[\d,]*(?:\.\d+)?\s*\)?|\(?\s*-?\s*[$€£¥₹]?\s*\.\d+\s*\)?'
+
+
+def _numbers(text):
+    """Numeric values of stripped cell texts already known to look like numbers"""
+    values = pd.to_numeric(text.str.replace(r'[^\d.]', '', regex=True), errors='coerce')
+    negative = text.str.contains(r'^\(|-', regex=True)
+    return values.where(~negative, -values)
+
+
+def parse_numbers(series):
+    """Vectorised currency/number parsing; NaN where a cell isn't a number"""
+    text = series.astype(str).str.strip()
+    return _numbers(text).where(text.str.fullmatch(NUMBER_PATTERN))
+
+
+def _frame(header, body):
+    """
+    DataFrame from cell texts; blank cells become NaN (as with read_html) and
+    columns whose other cells are all numbers become numeric
+    """
+    width = max([len(header)] + [len(row) for row in body]) if header or body else 0
+    header = list(header) + list(range(len(header), width))
+    body = [row + [None] * (width - len(row)) for row in body if row]
+    df = pd.DataFrame(body, columns=header)
+    for col in range(width):
+        text = df.iloc[:, col].fillna('').astype(str).str.strip()
+        filled = text != ''
+        if filled.any() and text[filled].str.fullmatch(NUMBER_PATTERN).all():
+            numbers = _numbers(text).where(filled)
+            if filled.all() and (numbers % 1 == 0).all():
+                numbers = numbers.astype('int64')  # like read_html: 273, not 273.0
+            df[df.columns[col]] = numbers
+        else:
+            df[df.columns[col]] = text.where(filled)
+    return df
+
+
+def _header_score(header, question_tokens):
+    return max((_column_score(_tokens(h), question_tokens) for h in header), default=0.0)
+
+
+def _span(cell, name):
+    try:
+        return max(1, int(cell.get(name, 1)))
+    except (TypeError, ValueError):
+        return 1
+
+
+def _grid(rows):
+    """Rows of (text, colspan, rowspan) as text rows, spans repeated into every covered cell like read_html"""
+    grid, pending = [], {}  # column -> [text, rows left] of an open rowspan
+    for cells in rows:
+        cells, row = list(cells), []
+        while cells or len(row) in pending:
+            if len(row) in pending:
+                carried = pending[len(row)]
+                row.append(carried[0])
+                carried[1] -= 1
+                if not carried[1]:
+                    del pending[len(row) - 1]
+                continue
+            text, colspan, rowspan = cells.pop(0)
+            for _ in range(colspan):
+                if rowspan > 1:
+                    pending[len(row)] = [text, rowspan - 1]
+                row.append(text)
+        grid.append(row)
+    return grid
+
+
+def _header(rows):
+    """Column names from the header rows: stacked rows joined per column, duplicates as 'Cost.1'"""
+    rows = _grid(rows)
+    width = max((len(row) for row in rows), default=0)
+    names, seen = [], {}
+    for col in range(width):
+        name = ' '.join(dict.fromkeys(row[col] for row in rows if col < len(row) and row[col]))
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _split_header(trs, in_thead, tags):
+    """(header rows, body rows) like read_html: the <thead> rows, else the leading rows made only of <th>"""
+    head = [tr for tr in trs if in_thead(tr)]
+    if head:
+        return head, [tr for tr in trs if not in_thead(tr)]
+    count = 0
+    while count < len(trs) and tags(trs[count]) and all(tag == 'th' for tag in tags(trs[count])):
+        count += 1
+    return trs[:count], trs[count:]
+
+
+def _soup_cells(tr):
+    return [(c.get_text(strip=True), _span(c, 'colspan'), _span(c, 'rowspan')) for c in tr.find_all(['th', 'td'])]
+
+
+def _soup_tables(soup):
+    """(header, read_rows) for each <table> of an already parsed BeautifulSoup document"""
+    for table in soup.find_all('table'):
+        head, body = _split_header(table.find_all('tr'), lambda tr: tr.parent.name == 'thead',
+                                   lambda tr: [c.name for c in tr.find_all(['th', 'td'])])
+        header = _header(_soup_cells(tr) for tr in head)
+        yield header, lambda body=body: _grid(_soup_cells(tr) for tr in body)
+
+
+def _lxml_cells(tr):
+    return [(''.join(c.itertext()).strip(), _span(c, 'colspan'), _span(c, 'rowspan'))
+            for c in tr if c.tag in ('th', 'td')]
+
+
+def _streamed_tables(html_content):
+    """(header, read_rows) for each <table> in raw HTML, parsed one table at a time with lxml"""
+    from lxml import etree
+    data = html_content.encode('utf-8') if isinstance(html_content, str) else html_content
+    for _, table in etree.iterparse(BytesIO(data), events=('end',), tag='table', html=True, recover=True):
+        head, body = _split_header(list(table.iter('tr')), lambda tr: tr.getparent().tag == 'thead',
+                                   lambda tr: [c.tag for c in tr if c.tag in ('th', 'td')])
+        header = _header(_lxml_cells(tr) for tr in head)
+        # read_rows must be called before the scan moves on
+        yield header, lambda body=body: _grid(_lxml_cells(tr) for tr in body)
+        # Drop what's been scanned so memory stays at about one table
+        table.clear()
+        while table.getprevious() is not None:
+            del table.getparent()[0]
+
+
+def extract_table(source, question=''):
+    """
+    The table that best fits the question as a DataFrame (None if there are none).
+    source is the page's BeautifulSoup document or its raw HTML. Tables are
+    scored by how well their headers match the question; only the winner is
+    turned into a DataFrame, and the scan stops at a header that matches fully.
+    Ties keep the earlier table (the first table when nothing matches).
+    """
+    question_tokens = set(_tokens(question))
+    streamed = isinstance(source, (str, bytes))
+    tables = _streamed_tables(source) if streamed else _soup_tables(source)
+    best, best_score = None, 0.0
+    first = None
+    for header, read_rows in tables:
+        if first is None:
+            first = (header, read_rows)
+        score = _header_score(header, question_tokens)
+        if score > best_score:
+            # A streamed table is gone once the scan moves on; soup rows can wait
+            best, best_score = (header, read_rows() if streamed else read_rows), score
+            if score >= 1.0:
+                break
+    if best is None:
+        if first is None:
+            return None
+        if streamed:
+            # Nothing matched: rescan just the first table
+            first = next(_streamed_tables(source))
+        return _frame(first[0], first[1]())
+    header, rows = best
+    return _frame(header, rows if streamed else rows())
+
+
+def aggregate(df, col_name, op):
+    series = df[col_name]
+    if op == 'COUNT':
+        # Counting cells works for text columns too
+        return series.count()
+
+    # Clean currency/strings
+    if not pd.api.types.is_numeric_dtype(series):
+        series = parse_numbers(series.dropna())
+
+    if op == 'SUM':
+        return series.sum()
+    elif op == 'MEAN':
+        return series.mean()
+    elif op == 'MAX':
+        return series.max()
+    elif op == 'MIN':
+        return series.min()
+    return 0
+
+
+def process_table_quiz(page, question, model="gpt-4o-mini", use_llm=True):
+    """table_quiz_steps with blocking LLM calls"""
+    return run_steps(table_quiz_steps(page, question, model, use_llm))
+
+
+def table_quiz_steps(page, question, model="gpt-4o-mini", use_llm=True):
+    """
+    Extracts the table that matches the question from the page
+    (its parsed BeautifulSoup document, or raw HTML).
+    Works out which column to aggregate and how (SUM/COUNT/MEAN/MIN/MAX),
+    locally when the question is unambiguous, else by asking GPT.
+    Performs aggregation using Pandas.
+    model may be a callable returning the model name; it is only called
+    when the LLM is asked. use_llm=False returns None instead of making
+    the LLM call. Step generator (see steps.py): the LLM call is yielded.
+    """
+    start = time.time()
+    try:
+        try:
+            if isinstance(page, (str, bytes)):
+                # Scanning runs in the CPU pool for large pages
+                df = run_cpu(extract_table, page, question, size=len(page))
+            else:
+                df = extract_table(page, question)
+        except Exception as e:
+            print(f"⚠️ Table extraction failed: {e}")
+            return None
+
+        if df is None:
+            print("❌ No tables found in HTML")
+            return None
+
+        print(f"📋 Table Found: {df.shape} - Columns: {list(df.columns)}")
+
+        col_name, op, confidence = parse_intent(question, df.columns)
+        if confidence >= TABLE_INTENT_MIN_CONFIDENCE:
+            path = 'local'
+            print(f"⚡ Local intent: Op={op}, Col={col_name} (confidence {confidence:.2f})")
+        elif use_llm:
+            path = 'llm'
+            print(f"🤔 Local intent unsure ({confidence:.2f}), asking GPT")
+            col_name, op = yield from llm_intent(df, question, model() if callable(model) else model)
+        else:
+            return None
+
         if col_name not in df.columns:
             print(f"❌ Column '{col_name}' not found.")
             return None
-            
-        series = df[col_name]
-        
-        # Clean currency/strings
-        # Remove '$', ',', etc.
-        if series.dtype == object:
-            series = series.astype(str).str.replace(r'[$,]', '', regex=True)
-            series = pd.to_numeric(series, errors='coerce')
-            
-        if op == 'SUM':
-            result = series.sum()
-        elif op == 'MEAN':
-            result = series.mean()
-        elif op == 'COUNT':
-            result = series.count()
-        elif op == 'MAX':
-            result = series.max()
-        elif op == 'MIN':
-            result = series.min()
-        else:
-            result = 0
+
+        result = aggregate(df, col_name, op)
             
         # Round if 'round' in question? Question Q6 said "Round to 2 decimal places"
         # Since API might want float or string?
         # User logs: "Answer: 272.0" (failed). Correct "273".
         # If result is integer-like (X.0), return int?
         
+        metrics.observe('table.latency', time.time() - start, path=path)
         print(f"✅ Table Result raw: {result}")
         return result
         
@@ -0,0 +1,84 @@
+import os
+import mmap
+import zipfile
+import tempfile
+from contextlib import contextmanager
+
+from cpu_pool import map_cpu, CPU_POOL_WORKERS
+
+# Parallel per-member work on ZIP archives: members are split into batches
+# of similar uncompressed size and handed to the CPU pool. Each worker
+# reopens the archive from one memory-mapped file, so the archive bytes are
+# shared through the page cache instead of being pickled to every worker.
+# Callers fall back to their serial scan if map_members raises OSError
+# (e.g. no room for the temporary copy).
+ZIP_PARALLEL_MIN_MEMBERS = int(os.getenv('ZIP_PARALLEL_MIN_MEMBERS', '8'))
+BATCHES_PER_WORKER = 2  # a little slack so one slow batch doesn't idle the others
+
+
+def use_parallel(member_count):
+    return CPU_POOL_WORKERS > 1 and member_count >= ZIP_PARALLEL_MIN_MEMBERS
+
+
+def _spool_dir(size):
+    """/dev/shm if it has room for size bytes (containers often give it only 64 MB), else the temp dir"""
+    try:
+        stat = os.statvfs('/dev/shm')
+        if stat.f_bavail * stat.f_frsize > 2 * size:
+            return '/dev/shm'
+    except OSError:
+        pass
+    return tempfile.gettempdir()
+
+
+@contextmanager
+def shared_archive(source):
+    """Path of the archive on disk: source itself if it's a path, else a temp copy of the bytes"""
+    if isinstance(source, (str, os.PathLike)):
+        yield os.fspath(source)
+        return
+    with tempfile.NamedTemporaryFile(suffix='.zip', dir=_spool_dir(len(source))) as tmp:
+        tmp.write(source)
+        tmp.flush()
+        yield tmp.name
+
+
+class _MappedFile(mmap.mmap):
+    # zipfile checks seekable(), which mmap only has from Python 3.13
+    def seekable(self):
+        return True
+
+
+@contextmanager
+def mapped_zip(path):
+    """ZipFile over a read-only memory map of path (used inside workers)"""
+    with open(path, 'rb') as f, _MappedFile(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        with zipfile.ZipFile(mapped) as zf:
+            yield zf
+
+
+def _batches(infos, count):
+    """Split ZipInfos into count lists with similar total uncompressed size, keeping archive order"""
+    loads = [0] * count
+    assigned = {}
+    for info in sorted(infos, key=lambda i: i.file_size, reverse=True):
+        slot = loads.index(min(loads))
+        loads[slot] += info.file_size
+        assigned[info.filename] = slot
+    batches = [[] for _ in range(count)]
+    for info in infos:
+        batches[assigned[info.filename]].append(info.filename)
+    return [b for b in batches if b]
+
+
+def map_members(fn, source, names, *args):
+    """
+    Run fn(path, batch_of_names, *args) over batches of names in the CPU pool.
+    Returns [(batch, result)] in batch order; the caller merges the results.
+    """
+    with shared_archive(source) as path:
+        with zipfile.ZipFile(path) as zf:
+            infos = [zf.getinfo(name) for name in names]
+        batches = _batches(infos, max(1, CPU_POOL_WORKERS * BATCHES_PER_WORKER))
+        results = map_cpu(fn, [(path, batch) + args for batch in batches])
+    return list(zip(batches, results))